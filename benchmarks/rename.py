@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+rename.py - Rename benchmark of the pyRenamer mass file renamer
+
+Files are created on a temporary directory and renamed, one by one, in two
+ways:
+
+    renames  the old rename_file: os.path.exists on the new name and
+             os.renames, which tries to create the directories of the new
+             name and to remove the ones of the old name on every call
+    rename   filetools.rename_file: renameat2 with RENAME_NOREPLACE, or
+             os.rename, creating directories only when they're missing
+
+Usage: python3 benchmarks/rename.py [--files N] [--runs N]
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+SOURCE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyrenamer"
+)
+sys.path.insert(0, SOURCE_DIR)
+
+# Local Imports
+from tools import filetools
+
+
+def rename_file_renames(ori, new):
+    """rename_file as it was before the rename fast path"""
+    if os.path.exists(new):
+        return False, None
+    try:
+        os.renames(ori, new)
+        return True, None
+    except Exception as e:
+        return False, e
+
+
+def time_renames(rename, files):
+    """Create the given number of files on a temporary directory and rename
+    all of them with rename. Returns the seconds the renames took"""
+
+    with tempfile.TemporaryDirectory() as dir:
+        paths = [os.path.join(dir, "file%d" % i) for i in range(files)]
+        for path in paths:
+            open(path, "w").close()
+
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                for path in paths:
+                    if not rename(path, path + ".new")[0]:
+                        raise RuntimeError("Could not rename %s" % path)
+                return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyRenamer rename benchmark")
+    parser.add_argument(
+        "--files", type=int, default=100000, help="Files renamed on every run"
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Runs of every way, the best one counts"
+    )
+    args = parser.parse_args()
+
+    ways = [
+        ("renames", rename_file_renames),
+        ("rename", filetools.rename_file),
+    ]
+    best = {}
+    for way, rename in ways:
+        best[way] = min([time_renames(rename, args.files) for run in range(args.runs)])
+        print("%-8s %7.3fs  %8.0f files/s" % (way, best[way], args.files / best[way]))
+    print("speedup  %.2fx" % (best["renames"] / best["rename"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+startup.py - Cold start benchmark of the pyRenamer mass file renamer
+
+Every step is timed in a new interpreter, so imports are not cached:
+
+    core   import the rename core (tools) without GTK
+    batch  start pyrenamer.py in batch mode on an empty directory
+    gui    import GTK and build the main window, without running the main
+           loop. Skipped if GTK or a display are not available
+
+The best time of every step is compared with its budget, and the exit status
+is 1 if any step went over it.
+
+Usage: python3 benchmarks/startup.py [--runs N] [--budget STEP SECONDS]
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+
+SOURCE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyrenamer"
+)
+
+# Seconds every step may take, at most
+BUDGETS = {
+    "core": 0.15,
+    "batch": 0.3,
+    "gui": 1.5,
+}
+
+CORE = """
+import sys, time
+start = time.perf_counter()
+from tools import filetools, filetable, plan, batch, patterns
+elapsed = time.perf_counter() - start
+assert "gi" not in sys.modules, "the rename core imported gi"
+print(elapsed)
+"""
+
+BATCH = """
+import sys, time, runpy
+start = time.perf_counter()
+sys.argv = ["pyrenamer.py", "--batch", "--dry_run", "-a", %r]
+try:
+    runpy.run_path("pyrenamer.py", run_name="__main__")
+except SystemExit:
+    pass
+print(time.perf_counter() - start)
+"""
+
+GUI = """
+import sys, time
+start = time.perf_counter()
+import pyrenamer
+try:
+    pyrenamer.load_gui()
+    from gi.repository import Gtk
+    if not Gtk.init_check(sys.argv)[0]:
+        raise ImportError("no display")
+except (ImportError, ValueError):
+    print("skip")
+    sys.exit(0)
+window = pyrenamer.pyRenamer(None, %r)
+while Gtk.events_pending():
+    Gtk.main_iteration()
+print(time.perf_counter() - start)
+window.populate_stop()
+"""
+
+
+def time_step(code):
+    """Run code in a new interpreter, from the source directory. Returns the
+    seconds it printed, or None if the step was skipped"""
+
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SOURCE_DIR,
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout.split()
+    if not output or output[-1] == "skip":
+        return None
+    return float(output[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyRenamer startup benchmark")
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Runs of every step, the best one counts"
+    )
+    parser.add_argument(
+        "--budget",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("STEP", "SECONDS"),
+        help="Change the budget of a step",
+    )
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for step, seconds in args.budget:
+        budgets[step] = float(seconds)
+
+    over = False
+    with tempfile.TemporaryDirectory() as empty_dir:
+        steps = [
+            ("core", CORE),
+            ("batch", BATCH % empty_dir),
+            ("gui", GUI % empty_dir),
+        ]
+        for step, code in steps:
+            times = [time_step(code) for run in range(args.runs)]
+            if None in times:
+                print("%-6s skipped" % step)
+                continue
+            best = min(times)
+            status = "ok"
+            if best > budgets[step]:
+                status = "OVER BUDGET"
+                over = True
+            print("%-6s %7.3fs  budget %.3fs  %s" % (step, best, budgets[step], status))
+
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
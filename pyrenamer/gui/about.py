@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""
+about.py - Create the About dialog of the pyRenamer mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk
+from gi.repository import GdkPixbuf
+from gettext import gettext as _
+
+
+def run_about_dialog(icon, version, authors, artists, license, comments, copyright):
+    """Display the About dialog until it's closed"""
+
+    about = Gtk.AboutDialog()
+    about.set_name("pyRenamer")
+    about.set_version(version)
+    about.set_authors(authors)
+    about.set_artists(artists)
+    about.set_translator_credits(_("translator-credits"))
+    about.set_logo(GdkPixbuf.Pixbuf.new_from_file(icon))
+    about.set_license(license)
+    about.set_wrap_license(True)
+    about.set_comments(comments)
+    about.set_copyright(copyright)
+    about.set_website("https://github.com/tfree87/pyRenamer")
+    about.set_icon_from_file(icon)
+    about.run()
+    about.destroy()
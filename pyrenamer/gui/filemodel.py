@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+filemodel.py - Flat tree model for the selected files view of the pyRenamer
+mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk
+from gi.repository import GObject
+
+# Local Imports
+from tools import filetable
+
+
+class FileListModel(GObject.Object, Gtk.TreeModel):
+    """A list model that serves the rows of a FileTable to a TreeView.
+    Columns are [file, /path/to/file, newfilename, /path/to/newfilename],
+    and paths are built from the table when the view asks for them.
+
+    Iters store the row number plus one, so no iter has a NULL user_data.
+    They point to another row once rows before it are removed."""
+
+    columns = 4
+
+    def __init__(self, table=None):
+        GObject.Object.__init__(self)
+        if table is None:
+            table = filetable.FileTable()
+        self.table = table
+
+    def get_row(self, iter):
+        """Returns the table row of an iter"""
+        return iter.user_data - 1
+
+    def create_iter(self, row):
+        iter = Gtk.TreeIter()
+        iter.user_data = row + 1
+        return iter
+
+    def append(self, name, path):
+        """Add a file and tell the views about it"""
+        row = self.table.append(name, path)
+        self.row_inserted(Gtk.TreePath.new_from_indices([row]), self.create_iter(row))
+
+    def extend(self, listing):
+        """Add a list of [file,/path/to/file] without telling the views. Only
+        use it while the model is not set on any view."""
+        self.table.extend(listing)
+
+    def remove_rows(self, rows):
+        """Remove the given rows and tell the views about it. Rows are
+        removed from the table first, so a view never finds a row it was
+        told is gone, and then the views are told one row at a time from
+        the last one up"""
+        rows = sorted(set(rows), reverse=True)
+        self.table.remove_rows(rows)
+        for row in rows:
+            self.row_deleted(Gtk.TreePath.new_from_indices([row]))
+
+    def set_newname(self, iter, newname):
+        """Set the new name of a row and tell the views about it"""
+        row = self.get_row(iter)
+        self.table.set_newname(row, newname)
+        self.row_changed(Gtk.TreePath.new_from_indices([row]), iter)
+
+    # ---------------------------------------------------------------------------------------
+    # Gtk.TreeModel interface
+
+    def do_get_flags(self):
+        return Gtk.TreeModelFlags.LIST_ONLY
+
+    def do_get_n_columns(self):
+        return self.columns
+
+    def do_get_column_type(self, column):
+        return GObject.TYPE_STRING
+
+    def do_get_iter(self, path):
+        indices = path.get_indices()
+        if len(indices) != 1 or not 0 <= indices[0] < len(self.table):
+            return False, None
+        return True, self.create_iter(indices[0])
+
+    def do_get_path(self, iter):
+        return Gtk.TreePath.new_from_indices([self.get_row(iter)])
+
+    def do_get_value(self, iter, column):
+        row = self.get_row(iter)
+        if column == 0:
+            return self.table.get_name(row)
+        elif column == 1:
+            return self.table.get_path(row)
+        elif column == 2:
+            return self.table.get_newname(row)
+        elif column == 3:
+            return self.table.get_newpath(row)
+        return None
+
+    def do_iter_next(self, iter):
+        row = self.get_row(iter) + 1
+        if row >= len(self.table):
+            return False
+        iter.user_data = row + 1
+        return True
+
+    def do_iter_previous(self, iter):
+        row = self.get_row(iter) - 1
+        if row < 0:
+            return False
+        iter.user_data = row + 1
+        return True
+
+    def do_iter_children(self, parent):
+        if parent is None and len(self.table) > 0:
+            return True, self.create_iter(0)
+        return False, None
+
+    def do_iter_has_child(self, iter):
+        return False
+
+    def do_iter_n_children(self, iter):
+        if iter is None:
+            return len(self.table)
+        return 0
+
+    def do_iter_nth_child(self, parent, n):
+        if parent is None and 0 <= n < len(self.table):
+            return True, self.create_iter(n)
+        return False, None
+
+    def do_iter_parent(self, child):
+        return False, None
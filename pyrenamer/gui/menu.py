@@ -32,16 +32,10 @@ class Menu:
     def on_menu_undo_activate(self, widget):
         """ Assign the undo function to Edit > Undo option in the menu"""
 
-        self.main.undo_manager.undo()
-        self.main.dir_reload_current()
-        self.main.menu_undo.set_sensitive(False)
-        self.main.menu_redo.set_sensitive(True)
+        self.main.undo_replay(redo=False)
 
     def on_menu_redo_activate(self, widget):
-        self.main.undo_manager.redo()
-        self.main.dir_reload_current()
-        self.main.menu_undo.set_sensitive(True)
-        self.main.menu_redo.set_sensitive(False)
+        self.main.undo_replay(redo=True)
 
     def on_menu_refresh_activate(self, widget):
         self.main.file_browser.create_new()
@@ -27,7 +27,9 @@ gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
 from gi.repository import GObject
 from gettext import gettext as _
-import os
+
+# Local Imports
+from tools import patterns
 
 
 class PyrenamerPatternEditor:
@@ -40,74 +42,30 @@ class PyrenamerPatternEditor:
         self.main = main
         # XML definition for the pattern renamer window
         self.glade_file = glade_file
-
-        # Check if config directory exists
-        self.config_dir = os.path.join(config_dir, 'patterns')
-        if not os.path.isdir(self.config_dir):
-            os.makedirs(self.config_dir)
+        self.config_dir = config_dir
 
 
     def get_patterns(self, selector):
         """ Obtain a list of pre-saved patterns from the configuration file for
         populating the combo boxes in the main window """
-        patterns = []
-
-        default_patterns = {
-            "main_ori": "{X}\n",
-            "main_dest": "{1}\n",
-        }
-
-        config_file = os.path.join(self.config_dir, selector)
-
-        # If the config file doesn't exist, create it with default options
-        if not os.path.isfile(config_file):
-            f = open(config_file, 'w')
-            try:
-                f.write(default_patterns[selector])
-            finally:
-                f.close()
-
-        # Read patterns from file
-        f = open(config_file, 'r')
-        try:
-            for line in f:
-                line = line.rstrip("\r\n")
-                patterns.append(line)
-        finally:
-            f.close()
-
-        # Return found patterns
-        if patterns == []:
-            if "ori" in selector: patterns.append('{X}')
-            else: patterns.append('{1}')
-        return patterns
+        return patterns.get_patterns(self.config_dir, selector)
 
 
     def save_patterns(self, selector):
         """ Write user-defined patterns into file in the configuration
         directory for later recall."""
 
-        config_file = os.path.join(self.config_dir, selector)
-        f = open(config_file, 'w')
+        data = []
         iter = self.model.get_iter_first()
-        try:
-            while iter != None:
-                val = self.model.get_value(iter, 0)
-                f.write(val + "\n")
-                iter = self.model.iter_next(iter)
-        finally:
-            f.close()
+        while iter != None:
+            data.append(self.model.get_value(iter, 0))
+            iter = self.model.iter_next(iter)
+        patterns.save_patterns(self.config_dir, selector, data)
 
 
     def add_pattern(self, selector, pattern):
         """ Append user-defined patterns to the configuration file """
-
-        config_file = os.path.join(self.config_dir, selector)
-        f = open(config_file, 'a')
-        try:
-            f.write(pattern + "\n")
-        finally:
-            f.close()
+        patterns.add_pattern(self.config_dir, selector, pattern)
 
 
     def create_window(self, selector):
@@ -48,7 +48,8 @@ class Preferences:
                 'FileDir' : '0',
                 'Recursive' : 'False',
                 'KeepExt' : 'False',
-                'AutoPreview' : 'False'
+                'AutoPreview' : 'False',
+                'Watch' : 'True'
             }
 
     def create_preferences_dialog(self, glade_file, icon):
@@ -224,3 +225,4 @@ class Preferences:
         self.main.keepext = self.config['DEFAULT'].getboolean('KeepExt', False)
         self.main.autopreview = self.config['DEFAULT'].getboolean(
             'AutoPreview', False)
+        self.main.watch = self.config['DEFAULT'].getboolean('Watch', True)
@@ -40,15 +40,10 @@ __status__ = "Beta"
 
 # Global Imports
 import argparse
-import gi
-
-gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk
-from gi.repository import Gdk
-from gi.repository import GLib
-from gi.repository import GObject
-from gi.repository import GdkPixbuf
+import sys
 import threading
+import queue
+import time
 import os
 from os import path as ospath
 from os.path import dirname
@@ -58,16 +53,79 @@ from gettext import gettext as _
 
 
 # Local Imports
-from gui import preferences
-from gui import pattern_editor
-from gui import menu
-from treefilebrowser import treefilebrowser
 from tools import filetools as renamerfilefuncs
 from tools import undo
+from tools import plan
+from tools import batch
+from tools import planner
+from tools import executor
+from tools import journal
+from tools import log
+from tools import patterns
+from tools import preview
+from tools import watcher
+
+
+def load_gui():
+    """Import GTK and the gui modules the main window needs. Batch mode runs
+    without them, so it works without a display or GTK installed. Windows
+    that are not shown at startup (pattern editor, About dialog) import
+    their modules when they're first opened"""
+
+    global gi, Gtk, Gdk, GLib, GObject
+    global preferences, menu, filemodel, treefilebrowser
+
+    import gi
+
+    gi.require_version("Gtk", "3.0")
+    from gi.repository import Gtk
+    from gi.repository import Gdk
+    from gi.repository import GLib
+    from gi.repository import GObject
+
+    from gui import preferences
+    from gui import menu
+    from gui import filemodel
+    from treefilebrowser import treefilebrowser
 
 
 config_dir = os.path.join(os.path.expanduser("~"), ".config/pyRenamer")
 
+# Seconds spent adding rows to the view on every main loop iteration, and
+# seconds between refreshes of the view, progress bar and statusbar
+POPULATE_TIME_SLICE = 0.008
+POPULATE_REFRESH = 0.5
+
+# Rows added to the model between checks of the time slice
+POPULATE_CHUNK = 256
+
+# Milliseconds the rename options must stay unchanged before autopreview
+AUTOPREVIEW_DELAY = 250
+
+# Most directories of a recursive listing watched for changes
+WATCH_MAX_DIRS = 1024
+
+# Files that can't be renamed listed one by one before renaming
+CONFLICTS_SHOWN = 10
+
+
+def queue_put(items, item, stopped):
+    """Put item on a bounded queue read by the gui, waiting for room until
+    stopped() is true. Once stopped, nothing may read the queue anymore, so
+    item is only put if there's room for it. Returns True if it was put"""
+
+    while not stopped():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    try:
+        items.put_nowait(item)
+        return True
+    except queue.Full:
+        return False
+
 
 class pyRenamer:
     """The main class for the pyRenamer program"""
@@ -83,8 +141,23 @@ class pyRenamer:
         # Main variables
         self.count = 0
         self.populate_id = []
-        self.listing = []
+        self.listing_queue = None
         self.listing_thread = None
+        self.preview_id = None
+        self.preview_queue = None
+        self.preview_thread = None
+        self.preview_done = None
+        self.preview_stop = threading.Event()
+        self.autopreview_id = None
+        self.rename_executor = None
+        self.rename_view = None
+        self.rename_id = None
+        self.watcher = None
+        self.watch_id = None
+        self.tree_watched = set()
+        self.list_watched = set()
+        self.watch_pending = []
+        self.watch_renamed = set()
         self.ignore_errors = False
 
         # Patterns saving variables
@@ -101,6 +174,7 @@ class pyRenamer:
         self.filedir = 0  # 0: Files; 1: Dirs; 2: Both
         self.keepext = False
         self.autopreview = False
+        self.watch = True
 
         # Read preferences
         self.prefs = preferences.Preferences(self, config_dir)
@@ -269,6 +343,10 @@ class pyRenamer:
         file_browser_scrolled = self.file_browser.get_scrolled()
         signal = self.file_browser.connect("cursor-changed", self.dir_selected)
 
+        # Watch the shown directories for changes made outside pyRenamer
+        if self.watch:
+            self.watch_start()
+
         # Add dirs and files to main window
         self.builder.get_object("browser_box").pack_end(
             file_browser_scrolled, True, True, 0
@@ -315,6 +393,9 @@ class pyRenamer:
         self.builder.get_object("menu_undo").set_sensitive(False)
         self.builder.get_object("menu_redo").set_sensitive(False)
 
+        # Offer to recover a run interrupted by a crash, once the window shows
+        GLib.idle_add(self.journal_check)
+
     def create_selected_files_treeview(self):
         """Create the TreeView and the ScrolledWindow for the selected
         files"""
@@ -326,6 +407,10 @@ class pyRenamer:
         view.get_selection().set_mode(Gtk.SelectionMode.MULTIPLE)
         view.connect("cursor-changed", self.on_selected_files_cursor_changed)
 
+        # Every row has the same height, so the view doesn't need to read
+        # every row (and preview it) to know its size
+        view.set_fixed_height_mode(True)
+
         # Create scrollbars around the view
         scrolled = Gtk.ScrolledWindow()
         scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
@@ -338,8 +423,7 @@ class pyRenamer:
     def create_model(self):
         """Create the model to hold the needed data
         Model = [file, /path/to/file, newfilename, /path/to/newfilename]"""
-        self.file_selected_model = Gtk.TreeStore(str, str, str, str, GdkPixbuf.Pixbuf)
-        self.selected_files.set_model(self.file_selected_model)
+        self.reset_model()
 
         # renderer0 = Gtk.CellRendererPixbuf()
         # column0 = Gtk.TreeViewColumn('', renderer0, pixbuf=4)
@@ -347,112 +431,258 @@ class pyRenamer:
 
         renderer0 = Gtk.CellRendererText()
         column0 = Gtk.TreeViewColumn("Original File Name", renderer0, text=0)
+        column0.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+        column0.set_fixed_width(300)
         column0.set_resizable(True)
         self.selected_files.append_column(column0)
 
         renderer1 = Gtk.CellRendererText()
         column1 = Gtk.TreeViewColumn("Renamed File Name", renderer1, text=2)
+        column1.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+        column1.set_fixed_width(300)
         column1.set_resizable(True)
         self.column_preview = column1
         self.selected_files.append_column(column1)
 
         self.selected_files.show()
 
-    def rename_rows(self, model, path, iter, user_data):
-        """This function is called by foreach to rename files on every row"""
-        ori = model.get_value(iter, 1)
-        new = model.get_value(iter, 3)
-
-        if new != None and new != "":
-            result, error = renamerfilefuncs.rename_file(ori, new)
-            if not result:
-                if not self.ignore_errors:
-                    self.display_error_dialog(
-                        _("Could not rename file %s to %s\n%s") % (ori, new, error)
-                    )
-            else:
-                self.undo_manager.add(ori, new)
+    def reset_model(self):
+        """Set a new empty model on the selected files view"""
+        self.file_selected_model = filemodel.FileListModel()
+        self.selected_files.set_model(self.file_selected_model)
+
+    def get_selected_rows(self):
+        """Returns the selected rows of the selected files view, or every row
+        if there's nothing selected"""
+        model, paths = self.selected_files.get_selection().get_selected_rows()
+        if paths:
+            return sorted([path.get_indices()[0] for path in paths])
+        return range(len(self.file_selected_model.table))
+
+    def plan_rows(self):
+        """Check the new names of every row, and order their renames with
+        planner.plan_renames, before any file is renamed. Every row must be
+        previewed already, see rename_when_previewed. Returns (rows,
+        renames, steps), or None if some files can't be renamed and the user
+        doesn't want to rename the rest"""
+        table = self.file_selected_model.table
+
+        rows = []
+        renames = []
+        for row in range(len(table)):
+            new = table.get_newpath(row)
+            if new != None:
+                ori = table.get_path(row)
+                if new != ori:
+                    rows.append(row)
+                    renames.append((ori, new))
+        if not renames:
+            self.builder.get_object("statusbar").push(
+                self.statusbar_context, _("Nothing to rename")
+            )
+            self.enable_rename_and_clean()
+            return None
+
+        steps, conflicts = planner.plan_renames(renames)
+        if conflicts and not self.ignore_errors:
+            if not self.display_conflicts_dialog(conflicts, len(steps) > 0):
+                return None
+        return rows, renames, steps
+
+    def rename_start(self, rows, renames, steps, use_journal=True, on_finish=None):
+        """Do the renames planned by plan_rows on the background, with a
+        RenameExecutor, while the view shows the progress. If rows is None
+        the renames are not of the rows of the view, so no row is updated
+        and nothing is added to the undo history. on_finish(done, failures,
+        stopped) is called once it's over, instead of telling which renames
+        failed, where done are the indexes of the renames that were done"""
+
+        rename_journal = None
+        if use_journal:
+            rename_journal = journal.open_journal(config_dir)
+        self.rename_executor = executor.RenameExecutor(steps, journal=rename_journal)
+        self.rename_executor.start()
+
+        self.stop_button.show()
+        self.rename_view = self.rename_add_to_view(
+            self.rename_executor, rows, renames, on_finish
+        )
+        self.rename_id = GLib.idle_add(self.rename_view.__next__)
+
+    def rename_add_to_view(self, rename_executor, rows, renames, on_finish=None):
+        """Point the rows to the renamed files as they're renamed, so the
+        directory doesn't need to be read again, in slices of
+        POPULATE_TIME_SLICE seconds. Rows that don't match the file pattern
+        anymore are removed once every rename is over"""
+
+        table = self.file_selected_model.table
+        match = renamerfilefuncs.compile_file_pattern(
+            self.builder.get_object("file_pattern").get_text()
+        )
+        removed = []
+        done = []
+        failures = []
+        finished = False
+        last_refresh = time.monotonic()
+
+        while not finished:
+            start = time.monotonic()
+            while time.monotonic() - start < POPULATE_TIME_SLICE:
+                try:
+                    result = rename_executor.results.get_nowait()
+                except queue.Empty:
+                    break
+                if result is None:
+                    finished = True
+                    break
+
+                renamed, task_failures = result
+                done.extend([step.index for step in renamed if step.index is not None])
+                failures.extend(task_failures)
+                if rows is None:
+                    continue
+                for step in renamed:
+                    # The rows are updated here, so the watcher must skip
+                    # these exact renames when it sees them
+                    if self.watcher is not None:
+                        self.watch_renamed.add((step.ori, step.new))
+
+                    # Renames to temporary names are only half of a rename
+                    if step.index is None:
+                        continue
+                    row = rows[step.index]
+                    ori, new = renames[step.index]
+
+                    # A polling watcher only sees where a file ended up, so
+                    # it sees the whole rename, not the steps through a
+                    # temporary name
+                    if self.watcher is not None:
+                        self.watch_renamed.add((ori, new))
+                    self.undo_manager.add(ori, new)
+
+                    # Rows inside a renamed directory move with it
+                    if self.filedir != 0 and ospath.isdir(new):
+                        table.rename_dir(ori, new)
+                    table.rename_row(row, new)
+                    if match is not None and not match(ospath.basename(new)):
+                        removed.append(row)
+
+            now = time.monotonic()
+            if not finished and now - last_refresh >= POPULATE_REFRESH:
+                last_refresh = now
+                self.selected_files.queue_draw()
+                self.progressbar.set_fraction(
+                    rename_executor.done / max(rename_executor.total, 1)
+                )
+                status = _("Renaming file %s of %s") % (
+                    rename_executor.done,
+                    rename_executor.total,
+                )
+                eta = rename_executor.get_eta()
+                if eta is not None:
+                    status += " - " + _("%s left") % executor.format_eta(eta)
+                self.builder.get_object("statusbar").push(
+                    self.statusbar_context, status
+                )
+            yield True
+
+        self.rename_id = None
+        self.rename_finish(
+            removed,
+            done,
+            failures,
+            rename_executor.stop.is_set(),
+            on_finish,
+            rename_executor.kept,
+        )
+        yield False
+
+    def rename_finish(
+        self, removed, done, failures, stopped, on_finish=None, kept=()
+    ):
+        """Remove the rows left out by the renames, tell which renames
+        failed, and which ones couldn't be put back, and apply the changes
+        found by the watcher meanwhile"""
+
+        self.rename_executor = None
+        self.rename_view = None
+        table = self.file_selected_model.table
+        table.clear_newnames()
+        self.file_selected_model.remove_rows(removed)
+
+        self.progressbar.set_fraction(0)
+        self.selected_files.queue_draw()
+        self.selected_files.columns_autosize()
+        self.builder.get_object("statusbar").push(
+            self.statusbar_context,
+            _("Directory: %s - Files: %s") % (self.active_dir, len(table)),
+        )
+        if not self.populate_id:
+            self.stop_button.hide()
 
-    def preview_rename_rows(self, model, path, iter, paths):
-        """Called when Preview button is clicked.
-        Get new names and paths and add it to the model"""
+        if on_finish is None and failures and not self.ignore_errors:
+            self.display_error_dialog(executor.get_summary(failures, kept=kept))
+        self.ignore_errors = False
+
+        events = self.watch_pending
+        self.watch_pending = []
+        if [event for event in events if event.kind == watcher.OVERFLOW]:
+            self.dir_reload_current()
+        elif events:
+            self.watch_apply_to_list(events)
 
-        ext = ""
+        if on_finish is not None:
+            on_finish(done, failures, stopped)
 
-        if (paths != None) and (path not in paths) and (paths != []):
-            # Preview only selected rows (if we're not on manual rename)
+    def rename_cancel(self):
+        """Stop renaming, once the chains being renamed are over, and point
+        their rows to the renamed files"""
+
+        if self.rename_executor is None:
             return
 
-        # Get current values
-        name = model.get_value(iter, 0)
-        path = model.get_value(iter, 1)
-        newname = name
-        newpath = path
+        self.rename_executor.cancel()
+        GLib.source_remove(self.rename_id)
+        for running in self.rename_view:
+            pass
+
+    def build_rename_plan(self):
+        """Read the rename options of the current tab from the gui and return
+        them as a RenamePlan. Options are read only once for every preview"""
 
-        # Keep extension (not valid on manual rename!)
-        if self.keepext and self.builder.get_object("notebook").get_current_page() != 3:
-            ename, epath, ext = renamerfilefuncs.cut_extension(newname, newpath)
-            if ext != "":
-                newname = ename
-                newpath = epath
+        page = self.builder.get_object("notebook").get_current_page()
+        options = {"keepext": self.keepext}
 
-        if self.builder.get_object("notebook").get_current_page() == 0:
+        if page == 0:
             # Replace using patterns
-            pattern_ini = self.builder.get_object(
+            options["pattern_ini"] = self.builder.get_object(
                 "original_pattern_combo"
             ).get_active_text()
-            pattern_end = self.builder.get_object(
+            options["pattern_end"] = self.builder.get_object(
                 "renamed_pattern_combo"
             ).get_active_text()
-            if self.keepext:
-                newname, newpath = renamerfilefuncs.rename_using_patterns(
-                    newname, newpath, pattern_ini, pattern_end, self.count, ext=ext
-                )
-            else:
-                newname, newpath = renamerfilefuncs.rename_using_patterns(
-                    newname, newpath, pattern_ini, pattern_end, self.count
-                )
-
-        elif self.builder.get_object("notebook").get_current_page() == 1:
-            # Replace spaces
-            if self.builder.get_object("subs_spaces").get_active() and newname != None:
-                newname, newpath = renamerfilefuncs.replace_spaces(
-                    newname,
-                    newpath,
-                    self.builder.get_object("subs_spaces_combo").get_active(),
-                )
-
-            # Replace orig with new
-            if self.builder.get_object("subs_replace").get_active() and newname != None:
-                orig = self.builder.get_object("subs_replace_orig").get_text()
-                new = self.builder.get_object("subs_replace_new").get_text()
-                newname, newpath = renamerfilefuncs.replace_with(
-                    newname, newpath, orig, new
-                )
 
-            # Replace capitalization
-            if (
-                self.builder.get_object("subs_capitalization").get_active()
-                and newname != None
-            ):
-                newname, newpath = renamerfilefuncs.replace_capitalization(
-                    newname,
-                    newpath,
-                    self.builder.get_object("subs_capitalization_combo").get_active(),
+        elif page == 1:
+            # Substitutions
+            if self.builder.get_object("subs_spaces").get_active():
+                options["spaces"] = self.builder.get_object(
+                    "subs_spaces_combo"
+                ).get_active()
+            if self.builder.get_object("subs_replace").get_active():
+                options["replace"] = (
+                    self.builder.get_object("subs_replace_orig").get_text(),
+                    self.builder.get_object("subs_replace_new").get_text(),
                 )
-
-            # Replace accents
-            if self.builder.get_object("subs_accents").get_active() and newname != None:
-                newname, newpath = renamerfilefuncs.replace_accents(newname, newpath)
-
-            # Fix duplicated symbols
-            if (
-                self.builder.get_object("subs_duplicated").get_active()
-                and newname != None
-            ):
-                newname, newpath = renamerfilefuncs.replace_duplicated(newname, newpath)
-
-        elif self.builder.get_object("notebook").get_current_page() == 2:
+            if self.builder.get_object("subs_capitalization").get_active():
+                options["capitalization"] = self.builder.get_object(
+                    "subs_capitalization_combo"
+                ).get_active()
+            options["accents"] = self.builder.get_object("subs_accents").get_active()
+            options["duplicated"] = self.builder.get_object(
+                "subs_duplicated"
+            ).get_active()
+
+        elif page == 2:
             # Insert / delete
             if self.builder.get_object("insert_radio").get_active():
                 text = self.builder.get_object("insert_entry").get_text()
@@ -461,46 +691,26 @@ class pyRenamer:
                         pos = -1
                     else:
                         pos = int(self.builder.get_object("insert_pos").get_value()) - 1
-                    newname, newpath = renamerfilefuncs.insert_at(
-                        newname, newpath, text, pos
-                    )
+                    options["insert"] = (text, pos)
             elif self.builder.get_object("delete_radio").get_active():
                 ini = int(self.builder.get_object("delete_from").get_value()) - 1
                 to = int(self.builder.get_object("delete_to").get_value()) - 1
-                newname, newpath = renamerfilefuncs.delete_from(
-                    newname, newpath, ini, to
-                )
+                options["delete"] = (ini, to)
 
-        elif self.builder.get_object("notebook").get_current_page() == 3:
-            # Manual rename
-            self.selected_files.get_selection().set_mode(Gtk.SelectionMode.SINGLE)
-            nmodel, niter = self.selected_files.get_selection().get_selected()
-            if niter != None:
-                if nmodel.get_value(niter, 0) == name:
-                    newname = self.builder.get_object("manual").get_text()
-                    newpath = renamerfilefuncs.get_new_path(newname, path)
-                else:
-                    newname = model.get_value(iter, 2)
-                    newpath = model.get_value(iter, 3)
-            self.selected_files.get_selection().set_mode(Gtk.SelectionMode.MULTIPLE)
+        return plan.RenamePlan(**options)
 
-        # Add the kept extension
-        if (
-            self.keepext
-            and self.builder.get_object("notebook").get_current_page() != 3
-            and (newname and newpath) != ""
-        ):
-            if ext != "":
-                newname, newpath = renamerfilefuncs.add_extension(newname, newpath, ext)
+    def preview_manual_rows(self, table, rows):
+        """Set the manual name on the selected row"""
 
-        # Set new values on model
-        if newname != "" and newname != None:
-            model.set_value(iter, 2, newname)
-            model.set_value(iter, 3, newpath)
-        else:
-            model.set_value(iter, 2, None)
-            model.set_value(iter, 3, None)
-        self.count += 1
+        self.selected_files.get_selection().set_mode(Gtk.SelectionMode.SINGLE)
+        nmodel, niter = self.selected_files.get_selection().get_selected()
+        if niter != None:
+            name = nmodel.get_value(niter, 0)
+            newname = self.builder.get_object("manual").get_text()
+            for row in rows:
+                if table.get_name(row) == name:
+                    table.set_newname(row, newname)
+        self.selected_files.get_selection().set_mode(Gtk.SelectionMode.MULTIPLE)
 
     def preview_selected_row(self):
         """Preview just selected row"""
@@ -518,37 +728,17 @@ class pyRenamer:
                 newpath = None
 
         # Set new values on model
-        if newname != "" and newname != None:
-            model.set_value(iter, 2, newname)
-            model.set_value(iter, 3, newpath)
-        else:
-            model.set_value(iter, 2, None)
-            model.set_value(iter, 3, None)
+        model.set_newname(iter, newname)
         self.count += 1
 
-    def preview_clear(self, model, path, iter, paths):
-        """Clean a row"""
-
-        if (paths != None) and (path not in paths) and (paths != []):
-            return
-
-        model.set_value(iter, 2, None)
-        model.set_value(iter, 3, None)
-
-    def enable_rename_and_clean(self, model, path, iter):
+    def enable_rename_and_clean(self):
         """Check if the rename button and menu should be enabled"""
-        val = model.get_value(iter, 2) != None
-        if path[0] > 0:
-            prev = self.builder.get_object("rename_button").get_property("sensitive")
-        else:
-            prev = False
-
-        self.builder.get_object("rename_button").set_sensitive(val or prev)
-        self.builder.get_object("menu_rename").set_sensitive(val or prev)
-        self.builder.get_object("clear_button").set_sensitive(val or prev)
-        self.builder.get_object("menu_clear_preview").set_sensitive(val or prev)
+        val = self.file_selected_model.table.has_newnames()
 
-        return False
+        self.builder.get_object("rename_button").set_sensitive(val)
+        self.builder.get_object("menu_rename").set_sensitive(val)
+        self.builder.get_object("clear_button").set_sensitive(val)
+        self.builder.get_object("menu_clear_preview").set_sensitive(val)
 
     # ---------------------------------------------------------------------------------------
     # Callbacks
@@ -572,8 +762,12 @@ class pyRenamer:
 
     def on_stop_button_clicked(self, widget):
         """The stop button on Statusbar.
-        Stop adding items to the selected files list and show information on statusbar"""
+        Stop adding items to the selected files list, previewing them, or
+        renaming them, and show information on statusbar"""
+        self.preview_cancel()
         self.populate_stop()
+        if self.rename_executor is not None:
+            self.rename_executor.stop.set()
 
     def on_main_window_window_state_event(self, window, event):
         """Thrown when window is maximized or demaximized"""
@@ -597,43 +791,74 @@ class pyRenamer:
     def on_rename_button_clicked(self, widget):
         """For everyrow rename the files as requested"""
 
-        self.undo_manager.clean()
-        self.builder.get_object("menu_undo").set_sensitive(True)
-        self.builder.get_object("menu_redo").set_sensitive(False)
-        self.file_selected_model.foreach(self.rename_rows, None)
-        self.dir_reload_current()
+        self.rename_cancel()
+        self.autopreview_cancel()
+        self.preview_cancel()
+        self.rename_when_previewed()
+
+    def rename_when_previewed(self):
+        """Rename once every row is previewed. Rows still waiting for their
+        new names are previewed on the background first, one preview at a
+        time, so the window keeps responding"""
+
+        pending = self.file_selected_model.table.get_pending()
+        if pending:
+            plan_preview, rows, counts = pending[0]
+            self.preview_start(plan_preview, rows, counts, self.rename_when_previewed)
+            return
+
+        planned = self.plan_rows()
+        if planned is None:
+            self.ignore_errors = False
+            return
+
+        self.undo_manager.begin()
+        self.undo_menu_update()
         self.builder.get_object("clear_button").set_sensitive(False)
         self.builder.get_object("menu_clear_preview").set_sensitive(False)
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
-        self.ignore_errors = False
+        self.rename_start(*planned)
 
     def on_preview_button_clicked(self, widget):
         """Set the item count to zero and get new names and paths for files on
         model"""
         self.count = 0
 
-        # Get selected rows and execute rename function
-        model, paths = self.selected_files.get_selection().get_selected_rows()
-        self.file_selected_model.foreach(self.preview_rename_rows, paths)
+        # Get selected rows and set their preview. Rows are previewed as
+        # they're shown, and the rest of them on a background thread
+        self.autopreview_cancel()
+        self.preview_cancel()
+        table = self.file_selected_model.table
+        rows = self.get_selected_rows()
+        if self.builder.get_object("notebook").get_current_page() == 3:
+            self.preview_manual_rows(table, rows)
+        else:
+            plan_preview = preview.PlanPreview(
+                table, self.build_rename_plan(), preview.cache
+            )
+            table.set_preview(plan_preview, rows)
+            self.preview_start(plan_preview, rows)
 
+        self.selected_files.queue_draw()
         self.selected_files.columns_autosize()
         self.builder.get_object("clear_button").set_sensitive(True)
         self.builder.get_object("menu_clear_preview").set_sensitive(True)
         self.builder.get_object("rename_button").set_sensitive(True)
         self.builder.get_object("menu_rename").set_sensitive(True)
-        self.file_selected_model.foreach(self.enable_rename_and_clean)
+        self.enable_rename_and_clean()
 
     def on_clean_button_clicked(self, widget):
         """Clean the previewed filenames"""
         self.count = 0
+        self.preview_cancel()
 
         # Clean selected rows
-        model, paths = self.selected_files.get_selection().get_selected_rows()
-        self.file_selected_model.foreach(self.preview_clear, paths)
+        self.file_selected_model.table.clear_newnames(self.get_selected_rows())
 
-        self.file_selected_model.foreach(self.enable_rename_and_clean)
+        self.enable_rename_and_clean()
 
+        self.selected_files.queue_draw()
         self.selected_files.columns_autosize()
 
         if self.builder.get_object("notebook").get_current_page() == 3:
@@ -682,14 +907,14 @@ class pyRenamer:
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_renamed_pattern_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_spaces_toggled(self, widget):
         """Enable/Disable spaces combo"""
@@ -697,7 +922,7 @@ class pyRenamer:
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_capitalization_toggled(self, widget):
         """Enable/Disable caps combo"""
@@ -707,7 +932,7 @@ class pyRenamer:
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_replace_toggled(self, widget):
         """Enable/Disable replace with text entries"""
@@ -717,49 +942,49 @@ class pyRenamer:
         self.builder.get_object("subs_replace_orig").set_sensitive(widget.get_active())
         self.builder.get_object("subs_replace_label").set_sensitive(widget.get_active())
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_spaces_combo_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_capitalization_combo_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_replace_orig_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_replace_new_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_accents_toggled(self, widget):
         """Enable/Disable accents"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_subs_duplicated_toggled(self, widget):
         """Fixes duplicated symbols"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_insert_radio_toggled(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
@@ -771,21 +996,21 @@ class pyRenamer:
         self.builder.get_object("delete_from").set_sensitive(False)
         self.builder.get_object("delete_to").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_insert_entry_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_insert_pos_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_insert_end_toggled(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
@@ -795,7 +1020,7 @@ class pyRenamer:
             not self.builder.get_object("insert_end").get_active()
         )
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_delete_radio_toggled(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
@@ -807,7 +1032,7 @@ class pyRenamer:
         self.builder.get_object("insert_pos").set_sensitive(False)
         self.builder.get_object("insert_end").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_delete_from_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
@@ -821,7 +1046,7 @@ class pyRenamer:
                 self.builder.get_object("delete_to").get_value()
             )
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_delete_to_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
@@ -835,14 +1060,14 @@ class pyRenamer:
                 self.builder.get_object("delete_from").get_value()
             )
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def on_manual_changed(self, widget):
         """Disable Rename button (user has to click on Preview again)"""
         self.builder.get_object("rename_button").set_sensitive(False)
         self.builder.get_object("menu_rename").set_sensitive(False)
         if self.autopreview:
-            self.on_preview_button_clicked(None)
+            self.autopreview_schedule()
 
     def populate_pattern_combos(self):
         """Populate pattern combo boxes"""
@@ -852,9 +1077,8 @@ class pyRenamer:
         self.builder.get_object("original_pattern_combo").get_model().clear()
         self.builder.get_object("renamed_pattern_combo").get_model().clear()
 
-        pe = pattern_editor.PyrenamerPatternEditor(self, config_dir, self.glade_file)
-        main_ori = pe.get_patterns("main_ori")
-        main_dest = pe.get_patterns("main_dest")
+        main_ori = patterns.get_patterns(config_dir, "main_ori")
+        main_dest = patterns.get_patterns(config_dir, "main_dest")
 
         def set_combo_element(combo, newtext):
             pos = 0
@@ -908,18 +1132,17 @@ class pyRenamer:
         text = self.builder.get_object("original_pattern").get_text()
 
         # Add it to the local file
-        pe = pattern_editor.PyrenamerPatternEditor(self, config_dir, self.glade_file)
-        pe.add_pattern("main_ori", text)
+        patterns.add_pattern(config_dir, "main_ori", text)
 
         # Add it to the variable
-        patterns = self.patterns["main_ori"]
-        patterns.append(text)
-        self.patterns["main_ori"] = patterns
+        self.patterns["main_ori"].append(text)
 
         # And show it on combobox
         self.builder.get_object("original_pattern_combo").append_text(text)
 
     def on_pattern_ori_edit_clicked(self, widget):
+        from gui import pattern_editor
+
         pe = pattern_editor.PyrenamerPatternEditor(self, config_dir, self.glade_file)
         pe.create_window("main_ori")
 
@@ -929,13 +1152,10 @@ class pyRenamer:
         text = self.builder.get_object("renamed_pattern").get_text()
 
         # Add it to the local file
-        pe = pattern_editor.PyrenamerPatternEditor(self)
-        pe.add_pattern("main_dest", text)
+        patterns.add_pattern(config_dir, "main_dest", text)
 
         # Add it to the variable
-        patterns = self.patterns["main_dest"]
-        patterns.append(text)
-        self.patterns["main_dest"] = patterns
+        self.patterns["main_dest"].append(text)
 
         # And show it on combobox
         self.builder.get_object("renamed_pattern_combo").append_text(text)
@@ -943,6 +1163,8 @@ class pyRenamer:
     def on_pattern_dest_edit_clicked(self, widget):
         """Open the pattern edit window in reponse to a user click"""
 
+        from gui import pattern_editor
+
         pe = pattern_editor.PyrenamerPatternEditor(self, config_dir, self.glade_file)
         pe.create_window("main_dest")
 
@@ -1037,7 +1259,7 @@ class pyRenamer:
             if event.keyval == Gdk.KEY_Page_Up:
                 try:
                     self.preview_selected_row()
-                    self.file_selected_model.foreach(self.enable_rename_and_clean)
+                    self.enable_rename_and_clean()
                     model, iter = self.selected_files.get_selection().get_selected()
                     path = model.get_path(iter)
                     path = path[0] - 1
@@ -1057,7 +1279,7 @@ class pyRenamer:
             elif event.keyval == Gdk.KEY_Page_Down:
                 try:
                     self.preview_selected_row()
-                    self.file_selected_model.foreach(self.enable_rename_and_clean)
+                    self.enable_rename_and_clean()
                     model, iter = self.selected_files.get_selection().get_selected()
                     iter = model.iter_next(iter)
                     if iter == None:
@@ -1076,7 +1298,7 @@ class pyRenamer:
             elif event.keyval == Gdk.KEY_Return:
                 try:
                     self.preview_selected_row()
-                    self.file_selected_model.foreach(self.enable_rename_and_clean)
+                    self.enable_rename_and_clean()
                     model, iter = self.selected_files.get_selection().get_selected()
                     iter = model.iter_next(iter)
                     if iter == None:
@@ -1121,7 +1343,10 @@ class pyRenamer:
 
     def on_main_quit(self, *args):
         """Bye bye! But first, save preferences"""
+        self.rename_cancel()
         self.populate_stop()
+        if self.watcher is not None:
+            self.watcher.close()
         self.prefs.preferences_save()
         Gtk.main_quit()
 
@@ -1144,18 +1369,22 @@ class pyRenamer:
         """The user has clicked on a directory on the left pane, so we need to load
         the files inside that dir on the right pane."""
 
+        self.rename_cancel()
         self.active_dir = dir
+        self.watch_renamed = set()
+        self.autopreview_cancel()
+        self.preview_cancel()
         self.populate_stop()
 
         self.stop_button.show()
         self.builder.get_object("clear_button").set_sensitive(False)
         self.builder.get_object("rename_button").set_sensitive(False)
-        self.file_selected_model.clear()
+        self.reset_model()
 
         while Gtk.events_pending():
             Gtk.main_iteration()
 
-        self.file_selected_model.clear()
+        self.reset_model()
 
         self.populate_selected_files(dir)
         self.selected_files.columns_autosize()
@@ -1185,26 +1414,22 @@ class pyRenamer:
             )
 
     def populate_get_listing(self, dir, pattern, recursive):
-        """Get the file listing using the utilities on renamerfilefuncs"""
+        """Get the file listing using the utilities on renamerfilefuncs and
+        pass it to the view in batches while it's being read"""
 
         # Add files from the current directory (and subdirs if needed)
-        if recursive:
-            self.listing = renamerfilefuncs.get_file_listing_recursive(
-                dir, self.filedir, pattern
-            )
-        else:
-            self.listing = renamerfilefuncs.get_file_listing(dir, self.filedir, pattern)
-
-        GLib.idle_add(self.populate_get_listing_end)
-
-    def populate_get_listing_end(self):
-        """The listing thread stuff is over, so now add things to the view"""
-
-        if renamerfilefuncs.get_stop():
-            self.populate_stop()
-        else:
-            populate = self.populate_add_to_view(self.listing)
-            self.populate_id.append(GLib.idle_add(populate.__next__))
+        batches = renamerfilefuncs.get_file_listing_batches(
+            dir, self.filedir, pattern, recursive
+        )
+        try:
+            for batch in batches:
+                # Wait for the view to catch up, unless listing is stopped
+                if renamerfilefuncs.get_stop():
+                    return
+                queue_put(self.listing_queue, batch, renamerfilefuncs.get_stop)
+        finally:
+            # Tell the view the listing is over
+            queue_put(self.listing_queue, None, renamerfilefuncs.get_stop)
 
     def populate_selected_files(self, dir):
         """Get the file listing using the utilities on renamerfilefuncs.
@@ -1215,30 +1440,63 @@ class pyRenamer:
 
         renamerfilefuncs.set_stop(False)
 
+        self.listing_queue = queue.Queue(maxsize=16)
         self.listing_thread = threading.Thread(
             target=lambda: self.populate_get_listing(dir, pattern, recursive)
         )
         self.listing_thread.start()
 
-        return
-
-    def populate_add_to_view(self, listing):
-        """Add files to the treeview"""
+        populate = self.populate_add_to_view(self.listing_queue)
+        self.populate_id.append(GLib.idle_add(populate.__next__))
 
-        # Add items to treeview
-        for elem in listing:
-            iter = self.file_selected_model.insert_before(None, None)
-
-            self.selected_files.set_model(None)
-            self.file_selected_model.set_value(iter, 0, elem[0])
-            self.file_selected_model.set_value(iter, 1, elem[1])
-            # self.file_selected_model.set_value(iter, 4, self.get_icon(elem[1]))
+        return
 
-            self.progressbar.pulse()
-            self.builder.get_object("statusbar").push(
-                self.statusbar_context, _("Adding file %s") % elem[1]
-            )
-            self.count += 1
+    def populate_add_to_view(self, listing_queue):
+        """Add files to the treeview as they come from the listing thread.
+        Rows are added with the model detached from the view until the
+        listing is over, in slices of POPULATE_TIME_SLICE seconds so the gui
+        keeps responding, and the progress is shown every POPULATE_REFRESH
+        seconds"""
+
+        listing = []
+        pos = 0
+        done = False
+        last_refresh = time.monotonic()
+        self.selected_files.set_model(None)
+
+        while not done:
+            # Add items to treeview until this slice is over
+            start = time.monotonic()
+            while time.monotonic() - start < POPULATE_TIME_SLICE:
+                if pos >= len(listing):
+                    # Wait for the listing thread until the slice is over,
+                    # so the main loop doesn't spin while it reads the disk
+                    timeout = POPULATE_TIME_SLICE - (time.monotonic() - start)
+                    try:
+                        listing = listing_queue.get(timeout=max(timeout, 0))
+                    except queue.Empty:
+                        listing = []
+                        break
+                    pos = 0
+                    if listing is None:
+                        done = True
+                        break
+
+                chunk = listing[pos : pos + POPULATE_CHUNK]
+                pos += len(chunk)
+                self.file_selected_model.extend(chunk)
+                self.count += len(chunk)
+
+            # Show how far we've got
+            now = time.monotonic()
+            if not done and now - last_refresh >= POPULATE_REFRESH:
+                last_refresh = now
+                self.progressbar.pulse()
+                if listing:
+                    self.builder.get_object("statusbar").push(
+                        self.statusbar_context,
+                        _("Adding file %s") % listing[pos - 1][1],
+                    )
             yield True
 
         self.selected_files.set_model(self.file_selected_model)
@@ -1249,33 +1507,369 @@ class pyRenamer:
         )
         self.stop_button.hide()
         self.count = 0
+        self.watch_list()
+        yield False
+
+    # ---------------------------------------------------------------------------------------
+    # Watcher functions
+
+    def watch_start(self):
+        """Watch the directories expanded on the tree and the ones of the
+        selected files list, and apply the changes to both"""
+
+        self.watcher = watcher.create_watcher()
+        self.tree_watched = set([self.file_browser.root])
+        self.file_browser.connect("row-expanded", self.on_file_browser_row_expanded)
+        self.file_browser_view.connect(
+            "row-collapsed", self.on_file_browser_row_collapsed
+        )
+
+        fileno = self.watcher.fileno()
+        if fileno is None:
+            self.watch_id = GLib.timeout_add(watcher.POLL_INTERVAL, self.watch_read)
+        else:
+            self.watch_id = GLib.io_add_watch(
+                fileno,
+                GLib.PRIORITY_DEFAULT,
+                GLib.IOCondition.IN,
+                lambda fd, condition: self.watch_read(),
+            )
+        self.watch_update()
+
+    def watch_update(self):
+        """Watch the directories of the tree and of the list"""
+        self.watcher.watch(self.tree_watched | self.list_watched)
+
+    def watch_list(self):
+        """Watch the directories of the selected files list"""
+
+        if self.watcher is None:
+            return
+        dirs = set([self.active_dir])
+        if self.builder.get_object("add_recursive").get_active():
+            dirs.update(self.file_selected_model.table.dirs[:WATCH_MAX_DIRS])
+        self.list_watched = dirs
+        self.watch_update()
+
+    def on_file_browser_row_expanded(self, browser, path):
+        if self.watcher is not None:
+            self.tree_watched.add(path)
+            self.watch_update()
+
+    def on_file_browser_row_collapsed(self, view, iter, path):
+        if self.watcher is not None:
+            self.tree_watched.discard(view.get_model().get_value(iter, 2))
+            self.watch_update()
+
+    def watch_read(self):
+        """Apply the changes found by the watcher"""
+
+        events = self.watcher.read_events()
+        if not events:
+            return True
+
+        overflow = False
+        for event in events:
+            if event.kind == watcher.OVERFLOW:
+                overflow = True
+            elif event.kind == watcher.CREATED:
+                self.file_browser.file_created(event.path, event.is_dir)
+            elif event.kind == watcher.DELETED:
+                self.file_browser.file_deleted(event.path)
+            elif event.kind == watcher.MOVED:
+                self.file_browser.file_moved(event.path, event.newpath, event.is_dir)
+
+        # A listing being read will find the changes by itself, and renames
+        # on the way move rows, so changes are applied once they're over
+        if self.populate_id:
+            return True
+        if self.rename_executor is not None:
+            self.watch_pending.extend(events)
+            return True
+        if overflow:
+            self.dir_reload_current()
+        else:
+            self.watch_apply_to_list(events)
+        return True
+
+    def watch_lists(self, path, is_dir):
+        """Check if a file belongs on the selected files list"""
+
+        dir = ospath.dirname(path)
+        if dir != self.active_dir:
+            if not self.builder.get_object("add_recursive").get_active():
+                return False
+            if not dir.startswith(ospath.join(self.active_dir, "")):
+                return False
+        if (self.filedir == 0 and is_dir) or (self.filedir == 1 and not is_dir):
+            return False
+        match = renamerfilefuncs.compile_file_pattern(
+            self.builder.get_object("file_pattern").get_text()
+        )
+        return match is None or bool(match(ospath.basename(path)))
+
+    def watch_apply_to_list(self, events):
+        """Add, remove or rename the rows of the selected files list changed
+        by the events. Only rows found on the events are touched"""
+
+        model = self.file_selected_model
+        table = model.table
+        paths = []
+        for event in events:
+            paths.append(event.path)
+            if event.newpath is not None:
+                paths.append(event.newpath)
+        rows = table.find_rows(paths)
+
+        changed = False
+        removed = []
+        added = []
+        for event in events:
+            if event.kind == watcher.CREATED:
+                if event.path not in rows and self.watch_lists(
+                    event.path, event.is_dir
+                ):
+                    added.append(event.path)
+
+            elif event.kind == watcher.DELETED:
+                if event.path in rows:
+                    removed.append(rows.pop(event.path))
+                if event.is_dir:
+                    removed.extend(table.find_rows_under(event.path))
+
+            elif event.kind == watcher.MOVED:
+                pair = (event.path, event.newpath)
+                if pair in self.watch_renamed:
+                    # Renamed by pyRenamer, the rows are already up to date
+                    self.watch_renamed.discard(pair)
+                    continue
+                if event.is_dir:
+                    table.rename_dir(event.path, event.newpath)
+                    changed = True
+                row = rows.pop(event.path, None)
+                if event.newpath in rows:
+                    # Moved over a file of the list, whose row stays
+                    if row is not None:
+                        removed.append(row)
+                    continue
+                if not self.watch_lists(event.newpath, event.is_dir):
+                    if row is not None:
+                        removed.append(row)
+                elif row is None:
+                    added.append(event.newpath)
+                else:
+                    table.rename_row(row, event.newpath)
+                    rows[event.newpath] = row
+                    changed = True
+
+        if not (changed or removed or added):
+            return
+
+        # Rows are about to move, so previews on the way would go astray
+        self.preview_cancel()
+        model.remove_rows(removed)
+        for path in added:
+            model.append(ospath.basename(path), path)
+        self.selected_files.queue_draw()
+        self.builder.get_object("statusbar").push(
+            self.statusbar_context,
+            _("Directory: %s - Files: %s") % (self.active_dir, len(table)),
+        )
+
+    # ---------------------------------------------------------------------------------------
+    # Preview functions
+
+    def autopreview_schedule(self):
+        """Preview once the rename options stay unchanged for
+        AUTOPREVIEW_DELAY milliseconds, so typing doesn't preview on every
+        keystroke. A preview running with the old options is stopped now"""
+
+        self.preview_cancel()
+        self.autopreview_cancel()
+        self.autopreview_id = GLib.timeout_add(
+            AUTOPREVIEW_DELAY, self.autopreview_run
+        )
+
+    def autopreview_run(self):
+        self.autopreview_id = None
+        self.on_preview_button_clicked(None)
+        return False
+
+    def autopreview_cancel(self):
+        """Forget a scheduled autopreview"""
+
+        if self.autopreview_id is not None:
+            GLib.source_remove(self.autopreview_id)
+            self.autopreview_id = None
+
+    def preview_start(self, plan_preview, rows, counts=None, on_finish=None):
+        """Preview the given rows on a background thread, and store the new
+        names on the table while the view shows the progress. counts are
+        the positions of the rows among the previewed ones, by default
+        their positions on rows. on_finish is called once every row is
+        previewed, unless the preview is stopped"""
+
+        # The thread reads a copy of the rows, as the list may change while
+        # it's previewing
+        self.preview_stop.clear()
+        self.preview_queue = queue.Queue(maxsize=16)
+        self.preview_thread = threading.Thread(
+            target=self.preview_get_names,
+            args=(
+                plan_preview,
+                plan_preview.table.copy(),
+                rows,
+                counts,
+                self.preview_queue,
+                self.preview_stop,
+            ),
+        )
+        self.preview_thread.start()
+
+        self.preview_done = on_finish
+        self.stop_button.show()
+        add = self.preview_add_to_view(plan_preview, rows, self.preview_queue)
+        self.preview_id = GLib.idle_add(add.__next__)
+
+    def preview_get_names(
+        self, plan_preview, table, rows, counts, preview_queue, stop
+    ):
+        """Preview the new names of the rows of table, a copy of the table of
+        plan_preview, and pass them to the view in batches as (first
+        position on rows, new names). An error that stops the preview is
+        passed to the view as it is"""
+
+        chunks = None
+        start = 0
+        try:
+            names = [table.get_name(row) for row in rows]
+            paths = [table.get_path(row) for row in rows]
+            chunks = preview.iter_preview(
+                plan_preview.plan, names, paths, counts, cache=plan_preview.cache
+            )
+            for chunk in chunks:
+                # Wait for the view to catch up, unless preview is stopped
+                if stop.is_set():
+                    return
+                queue_put(preview_queue, (start, chunk), stop.is_set)
+                start += len(chunk)
+        except Exception as e:
+            log.logger.error("preview failed", extra={"error": e})
+            queue_put(preview_queue, e, stop.is_set)
+        finally:
+            if chunks is not None:
+                chunks.close()
+            # Tell the view the preview is over
+            queue_put(preview_queue, None, stop.is_set)
+
+    def preview_add_to_view(self, plan_preview, rows, preview_queue):
+        """Store the new names on the table as they come from the preview
+        thread, in slices of POPULATE_TIME_SLICE seconds, and refresh the
+        view and the progress every POPULATE_REFRESH seconds. If the preview
+        fails, the error is shown and nothing else is done"""
+
+        table = plan_preview.table
+        done = 0
+        error = None
+        finished = False
+        last_refresh = time.monotonic()
+
+        while not finished:
+            start = time.monotonic()
+            while time.monotonic() - start < POPULATE_TIME_SLICE:
+                try:
+                    previewed = preview_queue.get_nowait()
+                except queue.Empty:
+                    # Preview thread is still working on the next batch
+                    break
+                if previewed is None:
+                    finished = True
+                    break
+                if isinstance(previewed, Exception):
+                    error = previewed
+                    continue
+                pos, newnames = previewed
+                table.set_previewed(
+                    plan_preview, rows[pos : pos + len(newnames)], newnames
+                )
+                done = pos + len(newnames)
+
+            now = time.monotonic()
+            if not finished and now - last_refresh >= POPULATE_REFRESH:
+                last_refresh = now
+                self.selected_files.queue_draw()
+                self.progressbar.set_fraction(done / len(rows))
+                self.builder.get_object("statusbar").push(
+                    self.statusbar_context,
+                    _("Previewing file %s of %s") % (done, len(rows)),
+                )
+            yield True
+
+        self.preview_id = None
+        self.selected_files.queue_draw()
+        self.preview_finish()
+        self.enable_rename_and_clean()
+        on_finish = self.preview_done
+        self.preview_done = None
+        if error is not None:
+            # Rows that failed are still waiting to be previewed, so going
+            # on would only preview them again
+            self.display_error_dialog(
+                _("Could not preview the new names\n%s") % error
+            )
+            self.ignore_errors = False
+        elif on_finish is not None:
+            on_finish()
         yield False
 
+    def preview_finish(self):
+        """Hide the preview progress"""
+
+        self.progressbar.set_fraction(0)
+        self.builder.get_object("statusbar").push(
+            self.statusbar_context,
+            _("Directory: %s - Files: %s")
+            % (self.active_dir, len(self.file_selected_model.table)),
+        )
+        if not self.populate_id:
+            self.stop_button.hide()
+
+    def preview_cancel(self):
+        """Stop the background preview, if it's running. Rows not previewed
+        yet are still previewed when they're shown or renamed"""
+
+        if self.preview_thread is None:
+            return
+
+        self.preview_stop.set()
+        self.preview_thread.join()
+        self.preview_thread = None
+        self.preview_done = None
+        if self.preview_id is not None:
+            GLib.source_remove(self.preview_id)
+            self.preview_id = None
+            self.preview_finish()
+
     def populate_from_file(self, filename):
         """Populate file preview loading the names from a file"""
 
         f = open(filename, "r")
-        iter = self.file_selected_model.get_iter_first()
+        table = self.file_selected_model.table
+        row = 0
         for line in f:
+            if row >= len(table):
+                break
+
             line = line.rstrip()
             if len(line) > 255 or not isinstance(line, str) or line == "":
                 line = None
-                path = None
-
-            if line != "" and line != None:
-                oripath = self.file_selected_model.get_value(iter, 1)
-                path = ospath.join(ospath.dirname(oripath), line)
 
-            self.selected_files.set_model(None)
-            self.file_selected_model.set_value(iter, 2, line)
-            self.file_selected_model.set_value(iter, 3, path)
+            table.set_newname(row, line)
 
             self.count += 1
-            iter = self.file_selected_model.iter_next(iter)
-            if iter == None:
-                break
+            row += 1
 
-        self.selected_files.set_model(self.file_selected_model)
+        self.selected_files.queue_draw()
 
         self.selected_files.columns_autosize()
         self.builder.get_object("clear_button").set_sensitive(True)
@@ -1339,24 +1933,131 @@ class pyRenamer:
         self.ignore_errors = dialog.run()
         dialog.destroy()
 
+    def journal_check(self):
+        """Ask what to do with a run of renames that was interrupted, if
+        there's one, and do it on the background"""
+
+        interrupted = journal.get_interrupted(config_dir)
+        if interrupted is None:
+            return False
+        done, left = interrupted.get_progress()
+        if not done and not left:
+            interrupted.forget()
+            return False
+
+        dialog = Gtk.MessageDialog(
+            None,
+            0,
+            Gtk.MessageType.WARNING,
+            Gtk.ButtonsType.NONE,
+            _(
+                "pyRenamer was interrupted while renaming files.\n"
+                "%d renames were done and %d were not."
+            )
+            % (len(done), len(left)),
+        )
+        dialog.add_button(_("Leave as it is"), 0)
+        dialog.add_button(_("Undo the renames"), 1)
+        dialog.add_button(_("Finish the renames"), 2)
+        response = dialog.run()
+        dialog.destroy()
+
+        if response == 1:
+            steps = interrupted.get_steps(journal.BACK)
+        elif response == 2:
+            steps = interrupted.get_steps(journal.FORWARD)
+        else:
+            interrupted.forget()
+            return False
+
+        def recovered(done, failures, stopped):
+            # A stopped recovery is left on the journal, to finish it later
+            if stopped:
+                interrupted.release()
+                return
+            interrupted.forget()
+            if failures:
+                self.display_error_dialog(executor.get_summary(failures))
+                self.ignore_errors = False
+            self.dir_reload_current()
+
+        self.rename_cancel()
+        self.rename_start(None, None, steps, use_journal=False, on_finish=recovered)
+        return False
+
+    def undo_replay(self, redo):
+        """Undo, or redo, the last rename on the background, like a rename,
+        and tell which files couldn't be renamed"""
+
+        self.rename_cancel()
+        self.autopreview_cancel()
+        self.preview_cancel()
+        if redo:
+            renames = self.undo_manager.redo_renames()
+        else:
+            renames = self.undo_manager.undo_renames()
+        if not renames:
+            return
+        steps, conflicts = planner.plan_renames(renames)
+
+        def replayed(done, failures, stopped):
+            # The history only moves once the renames are done
+            self.undo_manager.replayed(redo, renames, done)
+            self.undo_menu_update()
+            result = undo.ReplayResult(len(done), conflicts, failures)
+            if result.conflicts or result.failures:
+                self.display_error_dialog(undo.get_summary(result))
+                self.ignore_errors = False
+            if not stopped:
+                self.dir_reload_current()
+
+        self.rename_start(None, None, steps, on_finish=replayed)
+
+    def undo_menu_update(self):
+        """Make undo and redo available when there's something to undo or
+        redo"""
+        self.builder.get_object("menu_undo").set_sensitive(
+            self.undo_manager.can_undo()
+        )
+        self.builder.get_object("menu_redo").set_sensitive(
+            self.undo_manager.can_redo()
+        )
+
+    def display_conflicts_dialog(self, conflicts, can_rename):
+        """Display a summary of the files that can't be renamed, and the
+        first of them. Returns True if the rest of the files have to be
+        renamed anyway"""
+
+        lines = [planner.get_summary(conflicts), ""]
+        for conflict in conflicts[:CONFLICTS_SHOWN]:
+            lines.append(conflict.reason)
+        if len(conflicts) > CONFLICTS_SHOWN:
+            lines.append("...")
+
+        dialog = Gtk.MessageDialog(
+            None, 0, Gtk.MessageType.ERROR, Gtk.ButtonsType.NONE, "\n".join(lines)
+        )
+        dialog.add_button("gtk-cancel", 0)
+        if can_rename:
+            dialog.add_button(_("Rename the other files"), 1)
+        rename = dialog.run() == 1
+        dialog.destroy()
+        return rename
+
     def about_info(self, event, data=None):
         """Display the About dialog"""
 
-        about = Gtk.AboutDialog()
-        about.set_name("pyRenamer")
-        about.set_version(__version__)
-        about.set_authors(__authors__)
-        about.set_artists(__artists__)
-        about.set_translator_credits(_("translator-credits"))
-        about.set_logo(GdkPixbuf.Pixbuf.new_from_file(self.icon))
-        about.set_license(__license__)
-        about.set_wrap_license(True)
-        about.set_comments(__doc__)
-        about.set_copyright(__copyright__)
-        about.set_website("https://github.com/tfree87/pyRenamer")
-        about.set_icon_from_file(self.icon)
-        about.run()
-        about.destroy()
+        from gui import about
+
+        about.run_about_dialog(
+            self.icon,
+            __version__,
+            __authors__,
+            __artists__,
+            __license__,
+            __doc__,
+            __copyright__,
+        )
 
 
 def parse_arguments():
@@ -1375,6 +2076,19 @@ def parse_arguments():
         "--active_dir",
         help="Directory with files to be renamed when pyRenamer starts",
     )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Show every rename on the console, besides the log",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="Only log errors, not every rename",
+    )
+    batch.add_arguments(parser)
     args = parser.parse_args()
     return args
 
@@ -1383,6 +2097,18 @@ def main():
     """Start the pyRenamer program"""
 
     args = parse_arguments()  # Parse arguments
+    if args.quiet:
+        log.setup(config_dir, log.QUIET)
+    elif args.verbose:
+        log.setup(config_dir, log.VERBOSE)
+    else:
+        log.setup(config_dir)
+    if args.recover:
+        sys.exit(batch.recover(args.recover, config_dir))
+    if args.batch:
+        sys.exit(batch.run(args, config_dir))
+
+    load_gui()
     # GObject.threads_init() # Start threading
     py = pyRenamer(args.root_dir, args.active_dir)  # Initialize program
     Gtk.main()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+"""
+batch.py - Headless batch mode of the pyRenamer mass file renamer, to rename
+files from the command line without a display
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+import sys
+from gettext import gettext as _
+
+# Local Imports
+from tools import filetools as renamerfilefuncs
+from tools import plan
+from tools import planner
+from tools import executor
+from tools import journal
+
+
+def add_arguments(parser):
+    """Add the batch mode options to an argparse parser"""
+
+    parser.add_argument(
+        "--recover",
+        choices=[journal.FORWARD, journal.BACK],
+        help="Finish (forward), or undo (back), the renames of a run that was "
+        "interrupted, and exit",
+    )
+
+    group = parser.add_argument_group(
+        "batch mode",
+        "Rename the files on ACTIVE_DIR (or the current directory) without "
+        "starting the gui",
+    )
+    group.add_argument(
+        "-b", "--batch", action="store_true", help="Rename files without the gui"
+    )
+    group.add_argument(
+        "--original_pattern", help="Pattern to match the original file names"
+    )
+    group.add_argument("--renamed_pattern", help="Pattern for the new file names")
+    group.add_argument(
+        "--replace_spaces",
+        type=int,
+        choices=range(6),
+        help="0: ' ' to '_', 1: '_' to ' ', 2: ' ' to '.', 3: '.' to ' ', "
+        "4: ' ' to '-', 5: '-' to ' '",
+    )
+    group.add_argument(
+        "--replace", nargs=2, metavar=("ORIG", "NEW"), help="Replace ORIG with NEW"
+    )
+    group.add_argument(
+        "--capitalization",
+        type=int,
+        choices=range(4),
+        help="0: uppercase, 1: lowercase, 2: first letter uppercase, "
+        "3: first letter of each word uppercase",
+    )
+    group.add_argument("--accents", action="store_true", help="Remove accents")
+    group.add_argument(
+        "--duplicated", action="store_true", help="Remove duplicated symbols"
+    )
+    group.add_argument("--insert", help="Text to insert on the file names")
+    group.add_argument(
+        "--insert_pos",
+        type=int,
+        help="Position to insert the text at, starting at 1. Default is the end",
+    )
+    group.add_argument(
+        "--delete",
+        nargs=2,
+        type=int,
+        metavar=("FROM", "TO"),
+        help="Delete characters from FROM to TO, starting at 1",
+    )
+    group.add_argument(
+        "--keep_ext", action="store_true", help="Keep the file extensions"
+    )
+    group.add_argument(
+        "--file_pattern", help="Only rename files matching this pattern, i.e. *.mp3"
+    )
+    group.add_argument(
+        "--filedir",
+        type=int,
+        choices=range(3),
+        default=0,
+        help="0: rename files, 1: directories, 2: both",
+    )
+    group.add_argument(
+        "--recursive", action="store_true", help="Rename files on subdirectories"
+    )
+    group.add_argument(
+        "--ignore_errors",
+        action="store_true",
+        help="Rename the files that can be renamed, even if some can't",
+    )
+    group.add_argument(
+        "--dry_run",
+        action="store_true",
+        help="Only print the new names, don't rename anything",
+    )
+
+
+def build_plan(args):
+    """Returns the RenamePlan for the batch mode options"""
+
+    options = {"keepext": args.keep_ext}
+    if args.original_pattern is not None or args.renamed_pattern is not None:
+        options["pattern_ini"] = args.original_pattern or "{X}"
+        options["pattern_end"] = args.renamed_pattern or "{1}"
+    if args.replace_spaces is not None:
+        options["spaces"] = args.replace_spaces
+    if args.replace is not None:
+        options["replace"] = tuple(args.replace)
+    if args.capitalization is not None:
+        options["capitalization"] = args.capitalization
+    options["accents"] = args.accents
+    options["duplicated"] = args.duplicated
+    if args.insert:
+        pos = -1
+        if args.insert_pos is not None:
+            pos = args.insert_pos - 1
+        options["insert"] = (args.insert, pos)
+    elif args.delete is not None:
+        options["delete"] = (args.delete[0] - 1, args.delete[1] - 1)
+    return plan.RenamePlan(**options)
+
+
+def recover(mode, config_dir):
+    """Recover the run left on the journal. Returns the exit status"""
+
+    interrupted = journal.get_interrupted(config_dir)
+    if interrupted is None:
+        print(_("There is no interrupted run to recover"))
+        return 0
+
+    failures = interrupted.recover(mode)
+    if failures:
+        print(executor.get_summary(failures), file=sys.stderr)
+        return 1
+    return 0
+
+
+def run(args, config_dir):
+    """Read the listing and rename its files, in the order given by
+    planner.plan_renames so files can take names other files leave, and
+    directories are renamed after their contents. New names are checked
+    before any file is renamed, and renames are written on the journal of
+    config_dir. Returns the exit status"""
+
+    # Renaming now would lose track of the interrupted run
+    interrupted = None if args.dry_run else journal.get_interrupted(config_dir)
+    if interrupted is not None:
+        done, left = interrupted.get_progress()
+        if done or left:
+            interrupted.release()
+            print(
+                _("A run was interrupted, recover it first with --recover"),
+                file=sys.stderr,
+            )
+            return 1
+        interrupted.forget()
+
+    rename_plan = build_plan(args)
+    directory = os.path.abspath(args.active_dir or os.getcwd())
+    max_depth = None if args.recursive else 0
+
+    count = 0
+    renames = []
+    for entry in renamerfilefuncs.walk_dir(
+        directory, args.filedir, args.file_pattern, max_depth=max_depth
+    ):
+        newname = rename_plan.apply(entry.name, entry.path, count)
+        count += 1
+        if newname is None or newname == entry.name:
+            continue
+        renames.append((entry.path, renamerfilefuncs.get_new_path(newname, entry.path)))
+
+    # Nothing is renamed if some files can't be, unless told otherwise
+    steps, conflicts = planner.plan_renames(renames)
+    errors = len(conflicts)
+    if conflicts:
+        for conflict in conflicts:
+            print(
+                _("Could not rename file %s to %s\n%s")
+                % (conflict.ori, conflict.new, conflict.reason),
+                file=sys.stderr,
+            )
+        print(planner.get_summary(conflicts), file=sys.stderr)
+        if not args.ignore_errors and not args.dry_run:
+            return 1
+
+    if args.dry_run:
+        for step in steps:
+            print("%s -> %s" % (step.ori, step.new))
+    else:
+        rename_executor = executor.RenameExecutor(
+            steps, journal=journal.open_journal(config_dir)
+        )
+        renamed, failures = rename_executor.run()
+        if failures:
+            print(
+                executor.get_summary(failures, kept=rename_executor.kept),
+                file=sys.stderr,
+            )
+            errors += executor.count_files(failures)
+
+    if errors:
+        print(_("%d files could not be renamed") % errors, file=sys.stderr)
+        return 1
+    return 0
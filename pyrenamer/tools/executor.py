@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+"""
+executor.py - Run the renames planned for the pyRenamer mass file renamer on
+a pool of threads
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import queue
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from gettext import gettext as _
+
+# Local Imports
+from tools import filetools as renamerfilefuncs
+from tools import log
+from tools import planner
+
+
+# Threads renaming at once. Renames wait on the disk, or on the network on
+# shared directories, not on the processor, so there are more threads than
+# processors
+WORKERS = 8
+
+# Steps renamed by every task sent to the threads
+TASK_SIZE = 256
+
+# A planned rename that couldn't be done, and why
+RenameFailure = namedtuple("RenameFailure", ["step", "error"])
+
+
+def get_levels(steps):
+    """Split planned steps into levels of the same depth, deepest first, and
+    every level into its chains, keeping the planned order"""
+
+    levels = []
+    depth = None
+    for step in steps:
+        step_depth = planner.get_depth(step.ori)
+        if step_depth != depth:
+            depth = step_depth
+            chains = OrderedDict()
+            levels.append(chains)
+        chains.setdefault(step.chain, []).append(step)
+    return [list(chains.values()) for chains in levels]
+
+
+def get_tasks(chains, size=TASK_SIZE):
+    """Put chains together in tasks of about size steps"""
+
+    task = []
+    task_size = 0
+    for chain in chains:
+        task.append(chain)
+        task_size += len(chain)
+        if task_size >= size:
+            yield task
+            task = []
+            task_size = 0
+    if task:
+        yield task
+
+
+class RenameExecutor:
+    """Run the RenameSteps of planner.plan_renames on a pool of threads.
+
+    Levels of the plan are run one after the other, so no directory is
+    renamed before its contents, and the chains of every level are run at
+    once, each one in its planned order. A chain is renamed whole or not at
+    all: if one of its steps fails, the ones already done are put back, so
+    no file is left with a temporary name. Steps that can't be put back stay
+    renamed, and their RenameFailures, with the error putting them back,
+    are kept on kept.
+
+    Renamed steps and failures are put on results, as (renamed, failures)
+    lists for every task, and None once the executor is over. If a
+    journal.Journal is given, the plan and the progress are written on it,
+    so the run can be recovered if it's interrupted."""
+
+    def __init__(
+        self, steps, workers=WORKERS, rename=renamerfilefuncs.rename_file, journal=None
+    ):
+        self.levels = get_levels(steps)
+        self.journal = journal
+        self.total = len(steps)
+        self.workers = workers
+        self.rename = rename
+        self.results = queue.Queue()
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.kept = []
+        self.done = 0
+        self.start_time = None
+
+    def start(self):
+        """Start renaming on the background"""
+        self.start_time = time.monotonic()
+        self.thread = threading.Thread(target=self.run_levels)
+        self.thread.start()
+
+    def cancel(self):
+        """Stop renaming and wait for the chains being renamed to be over.
+        Their results are still put on results"""
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        """Rename everything on this thread. Returns (renamed, failures)"""
+        self.start_time = time.monotonic()
+        self.run_levels()
+
+        renamed = []
+        failures = []
+        for result in iter(self.results.get, None):
+            renamed.extend(result[0])
+            failures.extend(result[1])
+        return renamed, failures
+
+    def run_levels(self):
+        # First level that is not started yet
+        start = 0
+        try:
+            if self.journal is not None:
+                self.journal.begin(self.levels)
+            with ThreadPoolExecutor(self.workers) as pool:
+                for level, chains in enumerate(self.levels):
+                    if self.stop.is_set():
+                        break
+                    futures = [
+                        pool.submit(self.run_task, task) for task in get_tasks(chains)
+                    ]
+                    start = level + 1
+                    wait(futures)
+                    for future in futures:
+                        if future.exception() is not None:
+                            raise future.exception()
+                    if self.journal is not None and not self.stop.is_set():
+                        self.journal.level_done(level)
+            if self.journal is not None:
+                self.journal.close()
+        except Exception as e:
+            # The journal is left on disk, so the run can be recovered
+            log.logger.error("renames stopped", extra={"error": e})
+            self.fail_levels(start, e)
+        finally:
+            self.results.put(None)
+
+    def fail_levels(self, start, error):
+        """Put the steps of the levels from start on as failures"""
+        failures = []
+        for chains in self.levels[start:]:
+            for chain in chains:
+                for step in chain:
+                    if step.index is not None:
+                        failures.append(RenameFailure(step, error))
+        if failures:
+            self.results.put(([], failures))
+
+    def run_task(self, chains):
+        """Rename some chains. Their results are always put on results, even
+        if the task stops on an error: the steps it renamed are kept, and the
+        ones it didn't try fail with that error, which is raised again"""
+        renamed = []
+        failures = []
+        done = 0
+        chain_renamed = []
+        try:
+            chains_done = []
+            for chain in chains:
+                if self.stop.is_set():
+                    break
+                done += len(chain)
+                chain_renamed = []
+                for step in chain:
+                    result, error = self.rename(step.ori, step.new)
+                    if result:
+                        chain_renamed.append(step)
+                        continue
+
+                    # Put back the chain, so its files keep their names
+                    kept = []
+                    for done_step in reversed(chain_renamed):
+                        result, kept_error = self.rename(done_step.new, done_step.ori)
+                        if not result:
+                            renamed.append(done_step)
+                            kept.append(RenameFailure(done_step, kept_error))
+                    failures.append(RenameFailure(step, error))
+                    reason = _("%s was not renamed") % step.ori
+                    kept_steps = set([failure.step for failure in kept])
+                    for other in chain:
+                        if (
+                            other is not step
+                            and other.index is not None
+                            and other not in kept_steps
+                        ):
+                            failures.append(RenameFailure(other, reason))
+                    with self.lock:
+                        self.kept.extend(kept)
+                    chain_renamed = []
+                    break
+                else:
+                    chains_done.append(chain[0].chain)
+                renamed.extend(chain_renamed)
+                chain_renamed = []
+
+            if self.journal is not None and chains_done:
+                self.journal.chains_done(chains_done)
+        except Exception as e:
+            renamed.extend(chain_renamed)
+            handled = set(renamed)
+            handled.update([failure.step for failure in failures])
+            for chain in chains:
+                for step in chain:
+                    if step.index is not None and step not in handled:
+                        failures.append(RenameFailure(step, e))
+            raise
+        finally:
+            with self.lock:
+                self.done += done
+            self.results.put((renamed, failures))
+
+    def get_eta(self):
+        """Returns the seconds left to rename everything, guessed from the
+        time it took so far, or None if it can't be guessed yet"""
+        if not self.done or self.start_time is None:
+            return None
+        elapsed = time.monotonic() - self.start_time
+        return elapsed * (self.total - self.done) / self.done
+
+
+def format_eta(seconds):
+    """Returns a time left as h:mm:ss or m:ss"""
+    seconds = int(seconds)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "%d:%02d:%02d" % (hours, minutes, seconds)
+    return "%d:%02d" % (minutes, seconds)
+
+
+def count_files(failures):
+    """Returns the number of files that failed to be renamed. Renames to
+    temporary names are not counted as files"""
+    return len([failure for failure in failures if failure.step.index is not None])
+
+
+def get_summary(failures, shown=10, kept=()):
+    """Returns a report of the renames that failed, and of the ones in kept
+    that couldn't be put back, with the first shown of them one by one"""
+
+    lines = [_("%d files could not be renamed:") % count_files(failures)]
+    for failure in failures[:shown]:
+        step = failure.step
+        lines.append("%s -> %s: %s" % (step.ori, step.new, failure.error))
+    if len(failures) > shown:
+        lines.append("...")
+    if kept:
+        lines.append(_("%d renames could not be put back:") % len(kept))
+        for failure in kept[:shown]:
+            step = failure.step
+            lines.append("%s -> %s: %s" % (step.ori, step.new, failure.error))
+        if len(kept) > shown:
+            lines.append("...")
+    return "\n".join(lines)
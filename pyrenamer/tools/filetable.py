@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+
+"""
+filetable.py - Compact table of the files selected for renaming on the
+pyRenamer mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+from array import array
+from bisect import bisect_left
+
+
+class FileTable:
+    """Files to be renamed and their new names. Every directory is stored only
+    once, and each row keeps the id of its directory and the base names, so
+    full paths are built only when they're needed. Base names are kept
+    together, utf-8 encoded, in a single bytearray.
+
+    New names can be previewed lazily: a preview function is stored for a
+    set of rows and it's only called when the new name of one of those rows
+    is needed, so the cost of a preview doesn't depend on the table size.
+    Previewed names are cached apart from the names set by hand, so they
+    can be previewed again when rows move without losing the others."""
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self.dir_of)
+
+    def clear(self):
+        """Remove every row"""
+        self.dirs = []
+        self.dir_ids = {}
+        self.dir_of = array("L")
+        self.name_data = bytearray()
+        self.name_ends = array("Q")
+        self.renamed = {}
+        self.newnames = {}
+        self.previewed = {}
+        self.previews = []
+
+    def copy(self):
+        """Returns a copy of the rows, without their new names, that can be
+        read from another thread while this table changes"""
+        table = FileTable()
+        table.dirs = list(self.dirs)
+        table.dir_ids = dict(self.dir_ids)
+        table.dir_of = self.dir_of[:]
+        table.name_data = bytearray(self.name_data)
+        table.name_ends = self.name_ends[:]
+        table.renamed = dict(self.renamed)
+        return table
+
+    def get_dir_id(self, dir):
+        """Returns the id of a directory, adding it if it's a new one"""
+        dir_id = self.dir_ids.get(dir)
+        if dir_id is None:
+            dir_id = len(self.dirs)
+            self.dirs.append(dir)
+            self.dir_ids[dir] = dir_id
+        return dir_id
+
+    def append(self, name, path):
+        """Add a file given its name and full path. Returns its row"""
+        self.dir_of.append(self.get_dir_id(os.path.dirname(path)))
+        self.name_data += name.encode("utf-8", "surrogateescape")
+        self.name_ends.append(len(self.name_data))
+        return len(self.dir_of) - 1
+
+    def extend(self, listing):
+        """Add a list of [file,/path/to/file]"""
+        for name, path in listing:
+            self.append(name, path)
+
+    def get_name(self, row):
+        if row in self.renamed:
+            return self.renamed[row]
+        start = self.name_ends[row - 1] if row > 0 else 0
+        return self.name_data[start : self.name_ends[row]].decode(
+            "utf-8", "surrogateescape"
+        )
+
+    def get_dir(self, row):
+        return self.dirs[self.dir_of[row]]
+
+    def get_path(self, row):
+        return self.join(self.get_dir(row), self.get_name(row))
+
+    def get_newname(self, row):
+        """Returns the new name of a row, previewing it now if needed"""
+        if row in self.newnames:
+            return self.newnames[row]
+        if row in self.previewed:
+            return self.previewed[row]
+
+        for rows, preview in reversed(self.previews):
+            if row in rows:
+                newname = preview(row, rows[row])
+                if newname == "":
+                    newname = None
+                self.previewed[row] = newname
+                return newname
+        return None
+
+    def get_newpath(self, row):
+        newname = self.get_newname(row)
+        if newname is None:
+            return None
+        return self.join(self.get_dir(row), newname)
+
+    def set_newname(self, row, newname):
+        """Set the new name of a row. Empty names are stored as None"""
+        if newname == "":
+            newname = None
+        self.newnames[row] = newname
+        self.previewed.pop(row, None)
+
+    def set_preview(self, preview, rows=None):
+        """Preview the given rows, or every row, lazily. preview(row, count)
+        returns the new name of a row, where count is the position of the row
+        among the previewed ones"""
+        if rows is None:
+            rows = range(len(self))
+
+        if isinstance(rows, range) and len(rows) == len(self):
+            self.newnames = {}
+            self.previewed = {}
+            self.previews = []
+        else:
+            rows = dict([(row, count) for count, row in enumerate(rows)])
+            for row in rows:
+                self.newnames.pop(row, None)
+                self.previewed.pop(row, None)
+        self.previews.append((rows, preview))
+
+    def find_rows(self, paths):
+        """Returns a dict of {path: row} for the given paths that are on the
+        table, reading the table only once"""
+        wanted = {}
+        for path in paths:
+            dir_id = self.dir_ids.get(os.path.dirname(path))
+            if dir_id is not None:
+                wanted.setdefault(dir_id, {})[os.path.basename(path)] = path
+
+        found = {}
+        if not wanted:
+            return found
+        for row, dir_id in enumerate(self.dir_of):
+            names = wanted.get(dir_id)
+            if names is not None:
+                path = names.get(self.get_name(row))
+                if path is not None:
+                    found[path] = row
+        return found
+
+    def find_rows_under(self, dir):
+        """Returns the rows inside a directory, or its subdirectories"""
+        prefix = self.join(dir, "")
+        dir_ids = set(
+            [
+                dir_id
+                for dir_id, row_dir in enumerate(self.dirs)
+                if row_dir == dir or row_dir.startswith(prefix)
+            ]
+        )
+        if not dir_ids:
+            return []
+        return [row for row, dir_id in enumerate(self.dir_of) if dir_id in dir_ids]
+
+    def rename_row(self, row, path):
+        """Point a row to the new path of its file, once it's renamed. Its new
+        name is forgotten"""
+        self.renamed[row] = os.path.basename(path)
+        self.dir_of[row] = self.get_dir_id(os.path.dirname(path))
+        self.newnames.pop(row, None)
+        self.previewed.pop(row, None)
+
+    def rename_dir(self, old, new):
+        """Update the rows inside a renamed directory, or its subdirectories.
+        Only the stored directories change, not the rows"""
+        prefix = self.join(old, "")
+        for dir_id, dir in enumerate(self.dirs):
+            if dir == old or dir.startswith(prefix):
+                newdir = new + dir[len(old) :]
+                if self.dir_ids.get(dir) == dir_id:
+                    del self.dir_ids[dir]
+                self.dirs[dir_id] = newdir
+                self.dir_ids.setdefault(newdir, dir_id)
+
+    def remove_rows(self, rows):
+        """Remove the given rows. Rows after them move up, keeping the new
+        names set by hand. Previews number the rows left again, so the names
+        previewed for the rows that moved are previewed again when they're
+        needed. Names of renamed rows are packed with the rest again, so
+        call it after renaming even if no row is removed"""
+        removed = sorted(set(rows))
+        if not removed and not self.renamed:
+            return
+
+        def new_row(row):
+            return row - bisect_left(removed, row)
+
+        removed_rows = set(removed)
+        dir_of = array("L")
+        name_data = bytearray()
+        name_ends = array("Q")
+        for row in range(len(self)):
+            if row in removed_rows:
+                continue
+            dir_of.append(self.dir_of[row])
+            if row in self.renamed:
+                name_data += self.renamed[row].encode("utf-8", "surrogateescape")
+            else:
+                start = self.name_ends[row - 1] if row > 0 else 0
+                name_data += self.name_data[start : self.name_ends[row]]
+            name_ends.append(len(name_data))
+
+        # Rows of every preview are numbered again without the removed ones
+        previews = []
+        for preview_rows, preview in self.previews:
+            if isinstance(preview_rows, range):
+                end = len(preview_rows)
+                preview_rows = range(end - bisect_left(removed, end))
+            else:
+                kept = sorted(
+                    [
+                        (count, new_row(row))
+                        for row, count in preview_rows.items()
+                        if row not in removed_rows
+                    ]
+                )
+                preview_rows = dict(
+                    [(row, count) for count, (old, row) in enumerate(kept)]
+                )
+            previews.append((preview_rows, preview))
+
+        # Rows before the first removed one keep their rows and counts, so
+        # only their previewed names are still right
+        first = removed[0] if removed else len(self)
+        self.previewed = dict(
+            [(row, newname) for row, newname in self.previewed.items() if row < first]
+        )
+        self.newnames = dict(
+            [
+                (new_row(row), newname)
+                for row, newname in self.newnames.items()
+                if row not in removed_rows
+            ]
+        )
+        self.previews = previews
+        self.renamed = {}
+        self.dir_of = dir_of
+        self.name_data = name_data
+        self.name_ends = name_ends
+
+    def get_pending(self, rows=None):
+        """Returns the given rows, or every row, that are waiting to be
+        previewed, as a list of (preview, rows, counts), one for every
+        preview they're waiting on. Rows are looked up preview by preview,
+        newest first, so the rows of a preview of every row are not listed
+        one by one when none of them is previewed yet"""
+        wanted = None if rows is None else set(rows)
+        claimed = set()
+        pending = []
+        for index in range(len(self.previews) - 1, -1, -1):
+            preview_rows, preview = self.previews[index]
+            if (
+                isinstance(preview_rows, range)
+                and wanted is None
+                and not claimed
+                and not self.newnames
+                and not self.previewed
+            ):
+                pending_rows = counts = preview_rows
+            else:
+                pending_rows = [
+                    row
+                    for row in preview_rows
+                    if row not in self.newnames
+                    and row not in self.previewed
+                    and row not in claimed
+                    and (wanted is None or row in wanted)
+                ]
+                counts = [preview_rows[row] for row in pending_rows]
+            if len(pending_rows) == 0:
+                continue
+            pending.append((preview, pending_rows, counts))
+            if index > 0:
+                claimed.update(pending_rows)
+        pending.reverse()
+        return pending
+
+    def set_previewed(self, preview, rows, newnames):
+        """Store the new names of rows previewed ahead of time with preview.
+        Rows that got a new name since then, or are now on a newer preview,
+        are left alone, and so is every row if preview was cleared"""
+        for index in range(len(self.previews) - 1, -1, -1):
+            if self.previews[index][1] is preview:
+                break
+        else:
+            return
+
+        newer = [preview_rows for preview_rows, _ in self.previews[index + 1 :]]
+        for row, newname in zip(rows, newnames):
+            if row in self.newnames or row in self.previewed:
+                continue
+            for preview_rows in newer:
+                if row in preview_rows:
+                    break
+            else:
+                if newname == "":
+                    newname = None
+                self.previewed[row] = newname
+
+    def clear_newnames(self, rows=None):
+        """Forget the new names of the given rows, or of every row"""
+        if rows is None:
+            self.newnames = {}
+            self.previewed = {}
+            self.previews = []
+        else:
+            for row in rows:
+                self.newnames[row] = None
+                self.previewed.pop(row, None)
+
+    def has_newnames(self):
+        """Check if any row has a new name other than its name, or may have
+        one once it's previewed"""
+        for newnames in (self.newnames, self.previewed):
+            for row, newname in newnames.items():
+                if newname is not None and newname != self.get_name(row):
+                    return True
+        for preview_rows, preview in self.previews:
+            for row in preview_rows:
+                if row not in self.newnames and row not in self.previewed:
+                    return True
+        return False
+
+    def join(self, dir, name):
+        """Same as filetools.get_new_path, without splitting the path again"""
+        if dir != "/":
+            dir += "/"
+        return dir + name
@@ -22,16 +22,21 @@ this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
 # Global Imports
+import logging
 import os
-import glob
+import fnmatch
 import re
 import sys
 import time
 from datetime import datetime
 import random
 import unicodedata
+from errno import EEXIST, EINVAL, ENOSYS
 from gettext import gettext as _
 
+# Local Imports
+from tools import log
+
 STOP = False
 
 
@@ -51,85 +56,144 @@ def escape_pattern(pattern):
     return pattern
 
 
+def compile_file_pattern(pattern):
+    """Returns a function that checks if a file name matches a file pattern,
+    like glob does, or None if there's no pattern. Hidden files only match
+    patterns starting with a dot."""
+
+    if pattern is None or pattern == "":
+        return None
+
+    match = re.compile(fnmatch.translate(escape_pattern(pattern))).match
+    if pattern[0] == ".":
+        return match
+    return lambda name: name[0] != "." and match(name)
+
+
+def entry_matches_mode(entry, mode):
+    """Check if a directory entry has to be listed on the given mode.
+    0: files; 1: directories; 2: files and directories"""
+    if mode == 2:
+        return True
+    try:
+        isdir = entry.is_dir()
+    except OSError:
+        isdir = False
+    if mode == 1:
+        return isdir
+    return not isdir
+
+
+def walk_dir(dir, mode, pattern=None, max_depth=None, follow_symlinks=False):
+    """Yields the entries of a directory and its subdirectories as
+    os.DirEntry, reading every directory only once. Each directory is sorted
+    by name and listed before its subdirectories.
+
+    max_depth limits how deep the walk goes: 0 lists only the given directory
+    and None walks the whole tree. Symbolic links to directories are only
+    walked into if follow_symlinks is set, and then each directory is
+    visited once at most so link loops don't make the walk endless."""
+
+    match = compile_file_pattern(pattern)
+
+    visited = set()
+    if follow_symlinks:
+        st = os.stat(dir)
+        visited.add((st.st_dev, st.st_ino))
+
+    pending = [(dir, 0)]
+    while pending:
+        current, depth = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name.lower())
+        except OSError:
+            if depth == 0:
+                raise
+            # Unreadable subdirectories are skipped, like os.walk does
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if STOP:
+                return
+            if (match is None or match(entry.name)) and entry_matches_mode(
+                entry, mode
+            ):
+                yield entry
+
+            if max_depth is not None and depth >= max_depth:
+                continue
+            try:
+                if not entry.is_dir(follow_symlinks=follow_symlinks):
+                    continue
+                if follow_symlinks:
+                    st = entry.stat()
+                    if (st.st_dev, st.st_ino) in visited:
+                        continue
+                    visited.add((st.st_dev, st.st_ino))
+            except OSError:
+                continue
+            subdirs.append((entry.path, depth + 1))
+
+        # Reversed, so the first subdirectory is the next one to be walked
+        pending.extend(reversed(subdirs))
+
+
+def scan_dir(dir, mode, pattern=None):
+    """Returns the listing of a given directory as a list of os.DirEntry,
+    sorted by name. Entries carry the file type reported by the directory
+    itself, so no extra stat is needed to tell files from directories, and
+    they cache their stat info once it's read."""
+
+    return list(walk_dir(dir, mode, pattern, max_depth=0))
+
+
 def get_file_listing(dir, mode, pattern=None):
     """Returns the file listing of a given directory. It returns only files.
     Returns a list of [file,/path/to/file]"""
 
-    filelist = []
-
-    if pattern == (None or ""):
-        listaux = os.listdir(dir)
-    else:
-        if dir != "/":
-            dir += "/"
-        dir = escape_pattern(dir + pattern)
-        listaux = glob.glob(dir)
-
-    listaux.sort(key=str.lower)
-    for elem in listaux:
-        if STOP:
-            return filelist
-        if mode == 0:
-            # Get files
-            if not os.path.isdir(os.path.join(dir, elem)):
-                filelist.append([os.path.basename(elem), os.path.join(dir, elem)])
-        elif mode == 1:
-            # Get directories
-            if os.path.isdir(os.path.join(dir, elem)):
-                filelist.append([os.path.basename(elem), os.path.join(dir, elem)])
-        elif mode == 2:
-            # Get files and directories
-            filelist.append([os.path.basename(elem), os.path.join(dir, elem)])
-        else:
-            # Get files
-            if not os.path.isdir(os.path.join(dir, elem)):
-                filelist.append([os.path.basename(elem), os.path.join(dir, elem)])
-
-    return filelist
+    return [[entry.name, entry.path] for entry in scan_dir(dir, mode, pattern)]
 
 
-def get_file_listing_recursive(dir, mode, pattern=None):
+def get_file_listing_recursive(dir, mode, pattern=None, max_depth=None):
     """Returns the file listing of a given directory recursively.
     It returns only files. Returns a list of [file,/path/to/file]"""
 
-    filelist = []
+    return [
+        [entry.name, entry.path]
+        for entry in walk_dir(dir, mode, pattern, max_depth=max_depth)
+    ]
 
-    # Get subdirs
-    for root, dirs, files in os.walk(dir, topdown=False):
-        if STOP:
-            return filelist
-        for directory in dirs:
-            if STOP:
-                return filelist
-            elem = get_file_listing(os.path.join(root, directory), mode, pattern)
-            for i in elem:
-                if STOP:
-                    return filelist
-                filelist.append(i)
 
-    # Get root directory files
-    list = get_file_listing(dir, mode, pattern)
-    for i in list:
-        filelist.append(i)
+def iter_file_listing(dir, mode, pattern=None, recursive=False):
+    """Yields the file listing of a given directory, and its subdirectories if
+    recursive, while it's being read. Yields [file,/path/to/file]"""
+
+    max_depth = None if recursive else 0
+    for entry in walk_dir(dir, mode, pattern, max_depth=max_depth):
+        yield [entry.name, entry.path]
 
-    return filelist
+
+def get_file_listing_batches(dir, mode, pattern=None, recursive=False, size=1000):
+    """Yields the file listing of a given directory in lists of up to size
+    elements, so it can be handed to another thread a batch at a time"""
+
+    batch = []
+    for elem in iter_file_listing(dir, mode, pattern, recursive):
+        batch.append(elem)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def get_dir_listing(dir):
     """Returns the subdirectory listing of a given directory. It returns only directories.
     Returns a list of [dir,/path/to/dir]"""
 
-    dirlist = []
-
-    listaux = os.listdir(dir)
-    listaux.sort(key=str.lower)
-    for elem in listaux:
-        if STOP:
-            return dirlist
-        if os.path.isdir(os.path.join(dir, elem)):
-            dirlist.append([os.path.basename(elem), os.path.join(dir, elem)])
-
-    return dirlist
+    return [[entry.name, entry.path] for entry in scan_dir(dir, 1)]
 
 
 def get_new_path(name, path):
@@ -242,198 +306,275 @@ def replace_duplicated(name, path):
     return str(newname), str(newpath)
 
 
-def rename_using_patterns(name, path, pattern_ini, pattern_end, count, ext=""):
-    """This method parses te patterns given by the user and stores the new filename
-    on the treestore. Posibble patterns are:
-
-    {#} Numbers
-    {L} Letters
-    {C} Characters (Numbers & letters, not spaces)
-    {X} Numbers, letters, and spaces
-    {@} Trash
-    """
-    name = str(name)
-    path = str(path)
-    ext = ext
-
-    pattern = pattern_ini
-    newname = pattern_end
-
-    pattern = pattern.replace(".", "\.")
-    pattern = pattern.replace("[", "\[")
-    pattern = pattern.replace("]", "\]")
-    pattern = pattern.replace("(", "\(")
-    pattern = pattern.replace(")", "\)")
-    pattern = pattern.replace("?", "\?")
+# Tokens understood on the destination pattern. Anything between braces that
+# is not one of these is copied verbatim to the new name.
+TEMPLATE_TOKEN = re.compile(r"{([^{}]*)}")
+GROUP_TOKEN = re.compile(r"([1-9][0-9]*)$")
+NUM_TOKEN = re.compile(r"num([0-9]*)(?:(\+)([0-9]*))?$")
+RAND_TOKEN = re.compile(r"rand([0-9]*)(?:(-)([0-9]*))?(?:(,)([0-9]*))?$")
+
+# strftime formats for the {date} family. The file based variants use the
+# same suffixes prefixed with 'create' or 'modify'.
+DATE_FORMATS = {
+    "date": "%Y%m%d",
+    "datedelim": "%Y-%m-%d",
+    "year": "%Y",
+    "month": "%m",
+    "monthname": "%B",
+    "monthsimp": "%b",
+    "day": "%d",
+    "dayname": "%A",
+    "daysimp": "%a",
+}
+
+# Operations of a compiled destination pattern
+OP_TEXT = 0
+OP_GROUP = 1
+OP_NUM = 2
+OP_DIR = 3
+OP_DATE = 4
+OP_CREATEDATE = 5
+OP_MODIFYDATE = 6
+OP_RAND = 7
+
+
+def translate_pattern(pattern):
+    """Convert an original pattern given by the user into a regular expression"""
+
+    pattern = pattern.replace(".", r"\.")
+    pattern = pattern.replace("[", r"\[")
+    pattern = pattern.replace("]", r"\]")
+    pattern = pattern.replace("(", r"\(")
+    pattern = pattern.replace(")", r"\)")
+    pattern = pattern.replace("?", r"\?")
     pattern = pattern.replace("{#}", "([0-9]*)")
     pattern = pattern.replace("{L}", "([a-zA-Z]*)")
-    pattern = pattern.replace("{C}", "([\S]*)")
-    pattern = pattern.replace("{X}", "([\S\s]*)")
+    pattern = pattern.replace("{C}", r"([\S]*)")
+    pattern = pattern.replace("{X}", r"([\S\s]*)")
     pattern = pattern.replace("{@}", "(.*)")
+    return pattern
 
-    try:
-        repattern = re.compile(pattern)
-    except:
-        print("Error: could not compile pattern")
-        return None, None
 
-    try:
-        groups = repattern.search(name).groups()
+def parse_template(template):
+    """Split a destination pattern into a list of (operation, argument, text)
+    tuples, where text is the original token so it can be restored when the
+    token can not be resolved"""
+
+    program = []
+    last = 0
+    for token in TEMPLATE_TOKEN.finditer(template):
+        if token.start() > last:
+            program.append((OP_TEXT, template[last : token.start()], None))
+        last = token.end()
+
+        text = token.group(0)
+        key = token.group(1)
+        if GROUP_TOKEN.match(key):
+            program.append((OP_GROUP, int(key), text))
+        elif NUM_TOKEN.match(key):
+            program.append((OP_NUM, NUM_TOKEN.match(key).groups(), text))
+        elif RAND_TOKEN.match(key):
+            program.append((OP_RAND, RAND_TOKEN.match(key).groups(), text))
+        elif key == "dir":
+            program.append((OP_DIR, None, text))
+        elif key in DATE_FORMATS:
+            program.append((OP_DATE, key, text))
+        elif key[:6] == "create" and key[6:] in DATE_FORMATS:
+            program.append((OP_CREATEDATE, key[6:], text))
+        elif key[:6] == "modify" and key[6:] in DATE_FORMATS:
+            program.append((OP_MODIFYDATE, key[6:], text))
+        else:
+            program.append((OP_TEXT, text, None))
 
-        for i in range(len(groups)):
-            newname = newname.replace("{" + repr(i + 1) + "}", groups[i])
-    except:
-        return None, None
+    if last < len(template):
+        program.append((OP_TEXT, template[last:], None))
 
-    # Replace {num} with item number.
-    # If {num2} the number will be 02
-    # If {num3+10} the number will be 010
-    count = repr(count)
-    cr = re.compile("{(num)([0-9]*)}|{(num)([0-9]*)(\+)([0-9]*)}")
-    try:
-        cg = cr.search(newname).groups()
-        if len(cg) == 6:
-
-            if cg[0] == "num":
-                # {num2}
-                if cg[1] != "":
-                    count = count.zfill(int(cg[1]))
-                newname = cr.sub(count, newname)
-
-            elif cg[2] == "num" and cg[4] == "+":
-                # {num2+5}
-                if cg[5] != "":
-                    count = str(int(count) + int(cg[5]))
-                if cg[3] != "":
-                    count = count.zfill(int(cg[3]))
-
-        newname = cr.sub(count, newname)
-    except:
-        pass
+    return merge_text(program)
 
-    # Replace {dir} with directory name
-    dir = os.path.dirname(path)
-    dir = os.path.basename(dir)
-    newname = newname.replace("{dir}", dir)
 
-    # Some date replacements
-    newname = newname.replace("{date}", time.strftime("%Y%m%d", time.localtime()))
-    newname = newname.replace(
-        "{datedelim}", time.strftime("%Y-%m-%d", time.localtime())
-    )
-    newname = newname.replace("{year}", time.strftime("%Y", time.localtime()))
-    newname = newname.replace("{month}", time.strftime("%m", time.localtime()))
-    newname = newname.replace("{monthname}", time.strftime("%B", time.localtime()))
-    newname = newname.replace("{monthsimp}", time.strftime("%b", time.localtime()))
-    newname = newname.replace("{day}", time.strftime("%d", time.localtime()))
-    newname = newname.replace("{dayname}", time.strftime("%A", time.localtime()))
-    newname = newname.replace("{daysimp}", time.strftime("%a", time.localtime()))
-
-    # Some pattern matches for creation and modification date
-    if ext:
-        createdate, modifydate = get_filestat_data(get_new_path(name + "." + ext, path))
-    else:
-        createdate, modifydate = get_filestat_data(get_new_path(name, path))
-    if createdate is not None:
-        newname = newname.replace("{createdate}", time.strftime("%Y%m%d", createdate))
-        newname = newname.replace(
-            "{createdatedelim}", time.strftime("%Y-%m-%d", createdate)
-        )
-        newname = newname.replace("{createyear}", time.strftime("%Y", createdate))
-        newname = newname.replace("{createmonth}", time.strftime("%m", createdate))
-        newname = newname.replace("{createmonthname}", time.strftime("%B", createdate))
-        newname = newname.replace("{createmonthsimp}", time.strftime("%b", createdate))
-        newname = newname.replace("{createday}", time.strftime("%d", createdate))
-        newname = newname.replace("{createdayname}", time.strftime("%A", createdate))
-        newname = newname.replace("{createdaysimp}", time.strftime("%a", createdate))
-    else:
-        newname = newname.replace("{createdate}", "")
-        newname = newname.replace("{createdatedelim}", "")
-        newname = newname.replace("{createyear}", "")
-        newname = newname.replace("{createmonth}", "")
-        newname = newname.replace("{createmonthname}", "")
-        newname = newname.replace("{createmonthsimp}", "")
-        newname = newname.replace("{createday}", "")
-        newname = newname.replace("{createdayname}", "")
-        newname = newname.replace("{createdaysimp}", "")
-
-    if modifydate is not None:
-        newname = newname.replace("{modifydate}", time.strftime("%Y%m%d", modifydate))
-        newname = newname.replace(
-            "{modifydatedelim}", time.strftime("%Y-%m-%d", modifydate)
-        )
-        newname = newname.replace("{modifyyear}", time.strftime("%Y", modifydate))
-        newname = newname.replace("{modifymonth}", time.strftime("%m", modifydate))
-        newname = newname.replace("{modifymonthname}", time.strftime("%B", modifydate))
-        newname = newname.replace("{modifymonthsimp}", time.strftime("%b", modifydate))
-        newname = newname.replace("{modifyday}", time.strftime("%d", modifydate))
-        newname = newname.replace("{modifydayname}", time.strftime("%A", modifydate))
-        newname = newname.replace("{modifydaysimp}", time.strftime("%a", modifydate))
+def merge_text(program):
+    """Join adjacent literal chunks of a parsed destination pattern"""
+
+    merged = []
+    for op in program:
+        if merged and op[0] == OP_TEXT and merged[-1][0] == OP_TEXT:
+            merged[-1] = (OP_TEXT, merged[-1][1] + op[1], None)
+        else:
+            merged.append(op)
+    return merged
+
+
+def format_date_tokens(date, keys):
+    """Returns a dict with the value of the given {date} tokens for a time
+    tuple. Tokens are empty if there's no date."""
+
+    values = {}
+    for key in keys:
+        if date is None:
+            values[key] = ""
+        else:
+            values[key] = time.strftime(DATE_FORMATS[key], date)
+    return values
+
+
+def format_num(spec, count):
+    """Format the item number for a {num} token.
+    {num2} the number will be 02
+    {num3+10} the number will be 010"""
+
+    width, plus, offset = spec
+    count = repr(count)
+    if plus and offset != "":
+        count = str(int(count) + int(offset))
+    if width != "":
+        count = count.zfill(int(width))
+    return count
+
+
+def format_rand(spec):
+    """Format a random number for a {rand} token.
+    {rand} will be a number between 0 and 100
+    {rand500} will be a number between 0 and 500
+    {rand10-20} will be a number between 10 and 20
+    {rand20,5} will be a number between 0 and 20 of 5 digits (00012)
+    {rand2-10,3} will be a number between 2 and 10 of 3 digits (007)
+    Returns None if the range is empty, like {rand10-5}"""
+
+    low, dash, high, comma, width = spec
+
+    if dash:
+        if low == "" or high == "":
+            return ""
+        low, high = int(low), int(high)
     else:
-        newname = newname.replace("{modifydate}", "")
-        newname = newname.replace("{modifydatedelim}", "")
-        newname = newname.replace("{modifyyear}", "")
-        newname = newname.replace("{modifymonth}", "")
-        newname = newname.replace("{modifymonthname}", "")
-        newname = newname.replace("{modifymonthsimp}", "")
-        newname = newname.replace("{modifyday}", "")
-        newname = newname.replace("{modifydayname}", "")
-        newname = newname.replace("{modifydaysimp}", "")
-
-    # Replace {rand} with random number between 0 and 100.
-    # If {rand500} the number will be between 0 and 500
-    # If {rand10-20} the number will be between 10 and 20
-    # If you add ,5 the number will be padded with 5 digits
-    # ie. {rand20,5} will be a number between 0 and 20 of 5 digits (00012)
-    rnd = ""
-    cr = re.compile(
-        "{(rand)([0-9]*)}"
-        "|{(rand)([0-9]*)(\-)([0-9]*)}"
-        "|{(rand)([0-9]*)(\,)([0-9]*)}"
-        "|{(rand)([0-9]*)(\-)([0-9]*)(\,)([0-9]*)}"
-    )
-    try:
-        cg = cr.search(newname).groups()
-        if len(cg) == 16:
+        low, high = 0, int(low) if low != "" else 100
+    if low > high:
+        return None
+    rnd = str(random.randint(low, high))
 
-            if cg[0] == "rand":
-                if cg[1] == "":
-                    # {rand}
-                    rnd = random.randint(0, 100)
-                else:
-                    # {rand2}
-                    rnd = random.randint(0, int(cg[1]))
+    if comma:
+        if width == "":
+            return ""
+        rnd = rnd.zfill(int(width))
+    return rnd
+
+
+class RenamePattern:
+    """A pair of original and destination patterns compiled once, so they can
+    be applied to a whole listing without parsing them again for every file.
+    Possible tokens on the original pattern are:
+
+    {#} Numbers
+    {L} Letters
+    {C} Characters (Numbers & letters, not spaces)
+    {X} Numbers, letters, and spaces
+    {@} Trash
+    """
 
-            elif cg[2] == "rand" and cg[4] == "-" and cg[3] != "" and cg[5] != "":
-                # {rand10-100}
-                rnd = random.randint(int(cg[3]), int(cg[5]))
+    def __init__(self, pattern_ini, pattern_end):
+        self.pattern_ini = pattern_ini
+        self.pattern_end = pattern_end
+
+        try:
+            self.regex = re.compile(translate_pattern(pattern_ini))
+        except:
+            log.logger.warning("could not compile pattern")
+            self.regex = None
+
+        # Only the tokens present on the destination pattern are evaluated.
+        # The current date is the same for every file on this run, so its
+        # tokens are resolved here and become plain text.
+        program = parse_template(pattern_end)
+        now = time.localtime()
+        self.program = merge_text(
+            [
+                (OP_TEXT, format_date_tokens(now, [arg])[arg], None)
+                if op == OP_DATE
+                else (op, arg, text)
+                for op, arg, text in program
+            ]
+        )
+        self.create_keys = set(
+            [arg for op, arg, text in self.program if op == OP_CREATEDATE]
+        )
+        self.modify_keys = set(
+            [arg for op, arg, text in self.program if op == OP_MODIFYDATE]
+        )
 
-            elif cg[6] == "rand" and cg[8] == "," and cg[9] != "":
-                if cg[7] == "":
-                    # {rand,2}
-                    rnd = str(random.randint(0, 100)).zfill(int(cg[9]))
+        # What new names depend on, besides the original name: the position
+        # of the file, its directory, the day of this run, or things that
+        # change on every call (random numbers, file dates)
+        ops = set([op for op, arg, text in program])
+        self.uses_count = OP_NUM in ops
+        self.uses_dir = OP_DIR in ops
+        self.uses_today = OP_DATE in ops
+        self.volatile = bool(OP_RAND in ops or self.create_keys or self.modify_keys)
+        self.today = time.strftime("%Y%m%d", now)
+
+    def rename(self, name, path, count, ext=""):
+        """Apply the patterns to a file name. Returns the new name and path,
+        or None, None if the name doesn't match the original pattern"""
+
+        name = str(name)
+        path = str(path)
+
+        if self.regex is None:
+            return None, None
+
+        match = self.regex.search(name)
+        if match is None:
+            return None, None
+        groups = match.groups()
+        if None in groups:
+            return None, None
+
+        # File dates are read from the original file, only if needed
+        if self.create_keys or self.modify_keys:
+            if ext:
+                createdate, modifydate = get_filestat_data(
+                    get_new_path(name + "." + ext, path)
+                )
+            else:
+                createdate, modifydate = get_filestat_data(get_new_path(name, path))
+            created = format_date_tokens(createdate, self.create_keys)
+            modified = format_date_tokens(modifydate, self.modify_keys)
+
+        newname = []
+        for op, arg, text in self.program:
+            if op == OP_TEXT:
+                newname.append(arg)
+            elif op == OP_GROUP:
+                if arg > len(groups):
+                    newname.append(text)
                 else:
-                    # {rand10,2}
-                    rnd = str(random.randint(0, int(cg[7]))).zfill(int(cg[9]))
-
-            elif (
-                cg[10] == "rand"
-                and cg[12] == "-"
-                and cg[14] == ","
-                and cg[11] != ""
-                and cg[13] != ""
-                and cg[15] != ""
-            ):
-                # {rand2-10,3}
-                rnd = str(random.randint(int(cg[11]), int(cg[13]))).zfill(int(cg[15]))
+                    newname.append(groups[arg - 1])
+            elif op == OP_NUM:
+                newname.append(format_num(arg, count))
+            elif op == OP_DIR:
+                newname.append(os.path.basename(os.path.dirname(path)))
+            elif op == OP_CREATEDATE:
+                newname.append(created[arg])
+            elif op == OP_MODIFYDATE:
+                newname.append(modified[arg])
+            elif op == OP_RAND:
+                rnd = format_rand(arg)
+                newname.append(text if rnd is None else rnd)
+        newname = "".join(newname)
+
+        # Returns new name and path
+        newpath = get_new_path(newname, path)
+        return str(newname), str(newpath)
+
+
+def compile_pattern(pattern_ini, pattern_end):
+    """Returns a RenamePattern for the given original and destination patterns"""
+    return RenamePattern(pattern_ini, pattern_end)
 
-        newname = cr.sub(str(rnd), newname)
-    except:
-        pass
 
-    # Returns new name and path
-    newpath = get_new_path(newname, path)
-    return str(newname), str(newpath)
+def rename_using_patterns(name, path, pattern_ini, pattern_end, count, ext=""):
+    """This method parses te patterns given by the user and returns the new
+    filename. When renaming many files use compile_pattern once instead."""
+    return compile_pattern(pattern_ini, pattern_end).rename(name, path, count, ext)
 
 
 def get_filestat_data(path):
@@ -444,10 +585,10 @@ def get_filestat_data(path):
     try:
         st = os.stat(path)
         if not st:
-            print("ERROR: File attributes could not be read", path)
+            log.logger.error("could not read file attributes", extra={"ori": path})
             return createdate, modifydate
     except:
-        print("ERROR: processing file attributes on", path)
+        log.logger.error("could not read file attributes", extra={"ori": path})
         return createdate, modifydate
 
     createdate = datetime.fromtimestamp(st.st_ctime).timetuple()
@@ -456,8 +597,65 @@ def get_filestat_data(path):
     return createdate, modifydate
 
 
+# renameat2 constants, from <linux/fs.h> and <fcntl.h>
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+
+renameat2 = None
+
+
+def get_renameat2():
+    """Returns the renameat2 function of the C library, or False where it's
+    not available"""
+
+    global renameat2
+    if renameat2 is None:
+        import ctypes
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            renameat2 = libc.renameat2
+            renameat2.argtypes = [
+                ctypes.c_int,
+                ctypes.c_char_p,
+                ctypes.c_int,
+                ctypes.c_char_p,
+                ctypes.c_uint,
+            ]
+        except (OSError, AttributeError, TypeError):
+            renameat2 = False
+    return renameat2
+
+
+def rename_noreplace(ori, new):
+    """Rename ori to new, raising FileExistsError if new exists. The check
+    is atomic where renameat2 supports RENAME_NOREPLACE, otherwise new is
+    looked up right before renaming"""
+
+    function = get_renameat2()
+    if function:
+        result = function(
+            AT_FDCWD, os.fsencode(ori), AT_FDCWD, os.fsencode(new), RENAME_NOREPLACE
+        )
+        if result == 0:
+            return
+        import ctypes
+
+        errno = ctypes.get_errno()
+        # Kernels or file systems without RENAME_NOREPLACE
+        if errno not in (ENOSYS, EINVAL):
+            raise OSError(errno, os.strerror(errno), ori, None, new)
+
+    if os.path.lexists(new):
+        raise OSError(EEXIST, os.strerror(EEXIST), ori, None, new)
+    os.rename(ori, new)
+
+
 def rename_file(ori, new):
-    """Change filename with the new one"""
+    """Change filename with the new one. Directories of the new name are
+    only created if they're missing, and the ones of the old name are left
+    alone"""
 
     if ori == new:
         return (
@@ -465,20 +663,20 @@ def rename_file(ori, new):
             None,
         )  # We don't need to rename the file, but don't show error message
 
-    if os.path.exists(new):
-        print(
-            _("Error while renaming %s to %s! -> %s already exists!") % (ori, new, new)
-        )
-        error = "[Errno 17] %s" % os.strerror(17)
-        return False, error
-
     try:
-        os.renames(ori, new)
-        print("Renaming %s to %s" % (ori, new))
+        try:
+            rename_noreplace(ori, new)
+        except FileNotFoundError:
+            newdir = os.path.dirname(new)
+            if not newdir or os.path.isdir(newdir) or not os.path.lexists(ori):
+                raise
+            os.makedirs(newdir)
+            rename_noreplace(ori, new)
+        if log.logger.isEnabledFor(logging.INFO):
+            log.logger.info("rename", extra={"ori": ori, "new": new})
         return True, None
     except Exception as e:
-        print(_("Error while renaming %s to %s!") % (ori, new))
-        print(e)
+        log.logger.error("rename failed", extra={"ori": ori, "new": new, "error": e})
         return False, e
 
 
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+
+"""
+journal.py - Write-ahead journal of the renames of the pyRenamer mass file
+renamer, so a run interrupted by a crash can be finished or rolled back
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import json
+import os
+import tempfile
+import threading
+
+# Local Imports
+from tools import executor
+from tools import log
+from tools import planner
+
+
+# Every run has its own journal, named after the process, so runs of
+# several processes at once don't write on the same journal
+JOURNAL_PREFIX = "journal-"
+
+# Kinds of records, one per line, as JSON
+BEGIN = "begin"  # A run starts
+STEP = "step"  # A rename the run is going to do, in planned order
+INODE = "inode"  # The file a cycle starts with
+PLANNED = "planned"  # Every step is on the journal, renames start now
+CHAINS = "chains"  # Chains that are completely renamed
+LEVEL = "level"  # A level that is completely renamed
+
+# Ways to recover an interrupted run
+FORWARD = "forward"
+BACK = "back"
+
+
+def lock(file):
+    """Lock a journal for this process, without waiting. Returns False if
+    another process has it locked. Where files can't be locked, every
+    journal is taken as unlocked"""
+
+    try:
+        import fcntl
+    except ImportError:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def is_cycle(chain):
+    """Check if a chain goes through a temporary name"""
+    return len(chain) > 1 and chain[-1].ori == chain[0].new
+
+
+class Journal:
+    """Append-only journal of a run of RenameExecutor. The whole plan is
+    written, and synced, before the first rename, and then every task tells
+    the chains it completed and every level tells when it's over.
+
+    Completion is written once per task, not once per rename, so chains
+    renamed by a task that was interrupted are not on the journal. Levels
+    are renamed one after the other, so only one level can be half
+    renamed, and how far its chains went is found from the files on disk,
+    see InterruptedRun.get_done_count.
+
+    Writes of several threads are committed together: a thread waiting for
+    its records to be synced writes and syncs everything waiting, so
+    concurrent tasks share one fsync. The journal is locked while its run
+    goes on, and deleted once the run is over, so an unlocked journal left
+    on disk is a run that was interrupted."""
+
+    def __init__(self, file, path):
+        self.file = file
+        self.path = path
+        self.condition = threading.Condition()
+        self.pending = []
+        self.written = 0
+        self.synced = 0
+        self.syncing = False
+
+    def write(self, records, sync=True):
+        """Append records to the journal. If sync, wait until they're on
+        disk"""
+
+        with self.condition:
+            for record in records:
+                self.pending.append(json.dumps(record).encode("ascii") + b"\n")
+            self.written += 1
+            number = self.written
+            if not sync:
+                return
+
+            while self.synced < number:
+                if self.syncing:
+                    # Another thread is syncing, ours go with the next sync
+                    self.condition.wait()
+                    continue
+
+                data = b"".join(self.pending)
+                self.pending = []
+                last = self.written
+                self.syncing = True
+                self.condition.release()
+                try:
+                    self.file.write(data)
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                finally:
+                    self.condition.acquire()
+                    self.syncing = False
+                    self.condition.notify_all()
+                self.synced = max(self.synced, last)
+
+    def begin(self, levels):
+        """Write the plan of a run, levels of chains of RenameSteps"""
+
+        records = [{"op": BEGIN}]
+        for level, chains in enumerate(levels):
+            for chain in chains:
+                for step in chain:
+                    records.append(
+                        {
+                            "op": STEP,
+                            "ori": step.ori,
+                            "new": step.new,
+                            "index": step.index,
+                            "chain": step.chain,
+                            "level": level,
+                        }
+                    )
+                if is_cycle(chain):
+                    try:
+                        st = os.lstat(chain[0].ori)
+                    except OSError:
+                        continue
+                    records.append(
+                        {
+                            "op": INODE,
+                            "chain": chain[0].chain,
+                            "dev": st.st_dev,
+                            "ino": st.st_ino,
+                        }
+                    )
+        records.append({"op": PLANNED})
+        self.write(records)
+
+    def chains_done(self, chains):
+        """Tell the given chain numbers are completely renamed"""
+        self.write([{"op": CHAINS, "chains": chains}])
+
+    def level_done(self, level):
+        """Tell every chain of a level is completely renamed"""
+        self.write([{"op": LEVEL, "level": level}])
+
+    def close(self):
+        """Close the journal once the run is over, deleting it. It's deleted
+        while it's still locked, so no other process takes it for an
+        interrupted run"""
+        self.write([], sync=True)
+        os.remove(self.path)
+        self.file.close()
+
+
+def open_journal(config_dir):
+    """Returns a new Journal on config_dir, or None if it can't be created.
+    The journal is created and locked under a name that is not a journal's,
+    so no other process finds it before it's locked"""
+
+    try:
+        if not os.path.isdir(config_dir):
+            os.makedirs(config_dir)
+        fd, temp = tempfile.mkstemp(prefix="." + JOURNAL_PREFIX, dir=config_dir)
+        file = os.fdopen(fd, "wb")
+        try:
+            lock(file)
+            name = "%s%d-%s" % (
+                JOURNAL_PREFIX,
+                os.getpid(),
+                os.path.basename(temp)[len(JOURNAL_PREFIX) + 1 :],
+            )
+            path = os.path.join(config_dir, name)
+            os.rename(temp, path)
+        except OSError:
+            file.close()
+            os.remove(temp)
+            raise
+        return Journal(file, path)
+    except OSError as e:
+        log.logger.error("could not open the journal", extra={"error": e})
+        return None
+
+
+class InterruptedRun:
+    """A run found on a journal left on disk. The journal is kept locked
+    until it's forgotten or released, so no other process recovers it at
+    the same time"""
+
+    def __init__(self, path, file):
+        self.path = path
+        self.file = file
+        self.levels = []
+        self.inodes = {}
+        self.planned = False
+        self.chains_done = set()
+        self.levels_done = set()
+        self.read()
+
+    def read(self):
+        chains = {}
+        self.file.seek(0)
+        for line in self.file:
+            try:
+                record = json.loads(line.decode("ascii"))
+            except ValueError:
+                # The last line may be cut short by the crash
+                break
+
+            op = record.get("op")
+            if op == STEP:
+                step = planner.RenameStep(
+                    record["ori"], record["new"], record["index"], record["chain"]
+                )
+                level = record["level"]
+                while len(self.levels) <= level:
+                    self.levels.append([])
+                chain = chains.get((level, step.chain))
+                if chain is None:
+                    chain = chains[(level, step.chain)] = []
+                    self.levels[level].append(chain)
+                chain.append(step)
+            elif op == INODE:
+                self.inodes[record["chain"]] = (record["dev"], record["ino"])
+            elif op == PLANNED:
+                self.planned = True
+            elif op == CHAINS:
+                self.chains_done.update(record["chains"])
+            elif op == LEVEL:
+                self.levels_done.add(record["level"])
+
+    def get_done_count(self, chain):
+        """Returns how many steps of a chain were renamed, looking at the
+        files. A chain is renamed in order, and every step frees the name
+        the next one takes, so only the original name of the last renamed
+        step is missing. Cycles that are not started look like complete
+        ones, so they're told apart by the file their last name has"""
+
+        first = chain[0]
+        if not os.path.lexists(first.new):
+            if not is_cycle(chain) or first.chain not in self.inodes:
+                return 0
+            try:
+                st = os.lstat(chain[-1].new)
+            except OSError:
+                return 0
+            if (st.st_dev, st.st_ino) == self.inodes[first.chain]:
+                return len(chain)
+            return 0
+
+        for count, step in enumerate(chain):
+            if not os.path.lexists(step.ori):
+                return count + 1
+        return len(chain)
+
+    def get_progress(self):
+        """Returns (done, left): lists of the steps that were renamed and
+        the ones that were not, in planned order"""
+
+        done = []
+        left = []
+        if not self.planned:
+            return done, left
+
+        # Levels are renamed one after the other, so only the first one not
+        # over can be half renamed. Chains of the levels that are over, that
+        # were not completed, failed and were put back
+        current = None
+        for level, chains in enumerate(self.levels):
+            if current is None and level not in self.levels_done:
+                current = level
+            for chain in chains:
+                if chain[0].chain in self.chains_done:
+                    count = len(chain)
+                elif level == current:
+                    count = self.get_done_count(chain)
+                else:
+                    count = 0
+                done.extend(chain[:count])
+                left.extend(chain[count:])
+        return done, left
+
+    def get_steps(self, mode):
+        """Returns the steps that finish the run if mode is FORWARD, or that
+        put back what it renamed if mode is BACK"""
+
+        done, left = self.get_progress()
+        if mode == FORWARD:
+            return left
+        return [
+            planner.RenameStep(step.new, step.ori, step.index, step.chain)
+            for step in reversed(done)
+        ]
+
+    def recover(self, mode):
+        """Finish the run if mode is FORWARD, or put back what it renamed if
+        mode is BACK. Returns the list of RenameFailure, and deletes the
+        journal"""
+
+        renamed, failures = executor.RenameExecutor(self.get_steps(mode)).run()
+        self.forget()
+        return failures
+
+    def forget(self):
+        """Delete the journal, leaving the files as they are"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.file.close()
+
+    def release(self):
+        """Leave the journal for later, unlocking it"""
+        self.file.close()
+
+
+def get_interrupted(config_dir):
+    """Returns an InterruptedRun left by a crash, or None. Journals locked
+    by a run that is still going on are left alone"""
+
+    try:
+        names = sorted(os.listdir(config_dir))
+    except OSError:
+        return None
+
+    for name in names:
+        if not name.startswith(JOURNAL_PREFIX):
+            continue
+        path = os.path.join(config_dir, name)
+        try:
+            file = open(path, "rb")
+        except OSError:
+            continue
+        if lock(file):
+            # The run may be over, and its journal deleted, before it's
+            # locked here
+            try:
+                same = os.path.samestat(os.fstat(file.fileno()), os.stat(path))
+            except OSError:
+                same = False
+            if same:
+                return InterruptedRun(path, file)
+        file.close()
+    return None
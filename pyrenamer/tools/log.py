@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+log.py - Structured log of the renames of the pyRenamer mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+
+
+LOG_NAME = "pyrenamer.log"
+
+# Size of the log before it's rotated, and rotated logs kept
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 3
+
+# Verbosity levels
+QUIET = 0  # Only errors, nothing is logged for every file renamed
+NORMAL = 1  # Every rename on the log file
+VERBOSE = 2  # Every rename on the log file and on the console too
+
+# Fields passed to the logger as extra, that are written on the log
+FIELDS = ["ori", "new", "error", "files"]
+
+logger = logging.getLogger("pyrenamer")
+listener = None
+
+# Nothing is written until setup is called, not even errors, like when the
+# tools are used from other programs or from the preview processes
+logger.addHandler(logging.NullHandler())
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as JSON lines with their time, level, event and the
+    FIELDS they have"""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = str(value)
+        return json.dumps(entry)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Format records as event: ori -> new (error)"""
+
+    def format(self, record):
+        text = record.getMessage()
+        ori = getattr(record, "ori", None)
+        if ori is not None:
+            text += ": %s -> %s" % (ori, getattr(record, "new", None))
+        error = getattr(record, "error", None)
+        if error is not None:
+            text += " (%s)" % error
+        return text
+
+
+def get_file_handler(path, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+    """Returns a handler writing JSON lines to a log rotated by size. Lines
+    go through the buffer of the file, and are only flushed when the
+    listener has nothing else to write"""
+
+    import logging.handlers
+
+    class JsonFileHandler(logging.handlers.RotatingFileHandler):
+        def __init__(self):
+            super().__init__(
+                path,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding="utf-8",
+                delay=True,
+            )
+            self.size = None
+            self.setFormatter(JsonFormatter())
+
+        def emit(self, record):
+            # Size is kept here, as asking the file for it flushes it
+            try:
+                line = self.format(record) + self.terminator
+                # maxBytes is in bytes, not in characters
+                line_size = len(line.encode("utf-8"))
+                if self.size is None:
+                    try:
+                        self.size = os.path.getsize(self.baseFilename)
+                    except OSError:
+                        self.size = 0
+                if self.size and self.size + line_size > self.maxBytes:
+                    self.doRollover()
+                    self.size = 0
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(line)
+                self.size += line_size
+            except Exception:
+                self.handleError(record)
+
+    return JsonFileHandler()
+
+
+def setup(config_dir, verbosity=NORMAL):
+    """Log to the log file of config_dir, and to the console if VERBOSE.
+    Records are passed through a queue to a thread that writes them, so
+    logging doesn't wait on the disk or the terminal"""
+
+    global listener
+
+    import logging.handlers
+
+    class LogListener(logging.handlers.QueueListener):
+        def dequeue(self, block):
+            try:
+                return self.queue.get(block=False)
+            except queue.Empty:
+                # Write what's buffered before waiting for more records
+                for handler in self.handlers:
+                    handler.flush()
+                return self.queue.get(block)
+
+    class RecordQueueHandler(logging.handlers.QueueHandler):
+        def prepare(self, record):
+            # Records are queued as they are and formatted by the listener,
+            # not copied and formatted here too. Errors may be exceptions,
+            # so they're turned into strings first, and queued records don't
+            # keep them, and their tracebacks, alive
+            error = getattr(record, "error", None)
+            if error is not None and not isinstance(error, str):
+                record.error = str(error)
+            return record
+
+    if not os.path.isdir(config_dir):
+        os.makedirs(config_dir)
+    handlers = [get_file_handler(os.path.join(config_dir, LOG_NAME))]
+    if verbosity >= VERBOSE:
+        console = logging.StreamHandler(sys.stderr)
+        console.setFormatter(ConsoleFormatter())
+        handlers.append(console)
+
+    records = queue.SimpleQueue()
+    logger.addHandler(RecordQueueHandler(records))
+    logger.propagate = False
+    logger.setLevel(logging.WARNING if verbosity <= QUIET else logging.INFO)
+
+    listener = LogListener(records, *handlers)
+    listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Write every record left and close the log"""
+
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+patterns.py - Storage of the user-defined patterns of the pyRenamer mass file
+renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+
+
+default_patterns = {
+    "main_ori": "{X}\n",
+    "main_dest": "{1}\n",
+}
+
+
+def get_patterns_dir(config_dir):
+    """Returns the directory the patterns are stored in, creating it if it
+    doesn't exist"""
+
+    patterns_dir = os.path.join(config_dir, "patterns")
+    if not os.path.isdir(patterns_dir):
+        os.makedirs(patterns_dir)
+    return patterns_dir
+
+
+def get_patterns(config_dir, selector):
+    """Obtain a list of pre-saved patterns from the configuration file for
+    populating the combo boxes in the main window"""
+
+    patterns = []
+    config_file = os.path.join(get_patterns_dir(config_dir), selector)
+
+    # If the config file doesn't exist, create it with default options
+    if not os.path.isfile(config_file):
+        with open(config_file, "w") as f:
+            f.write(default_patterns[selector])
+
+    # Read patterns from file
+    with open(config_file, "r") as f:
+        for line in f:
+            patterns.append(line.rstrip("\r\n"))
+
+    # Return found patterns
+    if patterns == []:
+        if "ori" in selector:
+            patterns.append("{X}")
+        else:
+            patterns.append("{1}")
+    return patterns
+
+
+def save_patterns(config_dir, selector, patterns):
+    """Write user-defined patterns into file in the configuration directory
+    for later recall"""
+
+    config_file = os.path.join(get_patterns_dir(config_dir), selector)
+    with open(config_file, "w") as f:
+        for pattern in patterns:
+            f.write(pattern + "\n")
+
+
+def add_pattern(config_dir, selector, pattern):
+    """Append user-defined patterns to the configuration file"""
+
+    config_file = os.path.join(get_patterns_dir(config_dir), selector)
+    with open(config_file, "a") as f:
+        f.write(pattern + "\n")
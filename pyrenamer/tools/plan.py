@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""
+plan.py - Rename plans for the pyRenamer mass file renamer, to get new file
+names from a fixed set of rename options
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+from collections import namedtuple
+
+# Local Imports
+from tools import filetools as renamerfilefuncs
+
+
+class RenamePlan(
+    namedtuple(
+        "RenamePlan",
+        [
+            "pattern_ini",
+            "pattern_end",
+            "spaces",
+            "replace",
+            "capitalization",
+            "accents",
+            "duplicated",
+            "insert",
+            "delete",
+            "keepext",
+        ],
+        defaults=[None, None, None, None, None, False, False, None, None, False],
+    )
+):
+    """An immutable set of rename options. Options set to None (or False)
+    are not applied, and the others are applied in this order:
+
+    pattern_ini, pattern_end: rename using patterns
+    spaces: replace spaces mode, see filetools.replace_spaces
+    replace: (orig, new) text replacement
+    capitalization: capitalization mode, see filetools.replace_capitalization
+    accents: remove accents
+    duplicated: remove duplicated symbols
+    insert: (text, pos) insert text at pos, or at the end if pos is -1
+    delete: (ini, to) delete chars from ini to to
+    keepext: keep the file extension out of the renaming
+
+    Its patterns are compiled, and it's hashed, once when it's created."""
+
+    def __new__(cls, *args, **kwargs):
+        plan = super().__new__(cls, *args, **kwargs)
+
+        # Compile the patterns once for the whole plan. This and the hash are
+        # the only attributes ever set on a plan
+        plan.compiled = None
+        if plan.pattern_ini is not None and plan.pattern_end is not None:
+            plan.compiled = renamerfilefuncs.compile_pattern(
+                plan.pattern_ini, plan.pattern_end
+            )
+
+        # Plans are hashed once, as they're used on every cache key
+        plan.hash = tuple.__hash__(plan)
+        return plan
+
+    def __hash__(self):
+        return self.hash
+
+    def __reduce__(self):
+        # The patterns are compiled, and the plan hashed, again on unpickling
+        return (self.__class__, tuple(self))
+
+    def cache_key(self, name, path, count=0):
+        """Returns a hashable key for the new name of a file, so files with
+        the same key get the same new name, or None if the new name can't be
+        reused (random numbers, or dates read from the file)"""
+
+        compiled = self.compiled
+        if compiled is None:
+            return (self, name)
+        if compiled.volatile:
+            return None
+
+        key = [self, name]
+        if compiled.uses_count:
+            key.append(count)
+        if compiled.uses_dir:
+            key.append(os.path.dirname(path))
+        if compiled.uses_today:
+            key.append(compiled.today)
+        return tuple(key)
+
+    def apply(self, name, path, count=0):
+        """Returns the new name of a file, or None if it has no new name.
+        count is the position of the file among the renamed ones"""
+
+        ext = ""
+        newname = name
+        newpath = path
+
+        # Keep extension
+        if self.keepext:
+            ename, epath, ext = renamerfilefuncs.cut_extension(newname, newpath)
+            if ext != "":
+                newname = ename
+                newpath = epath
+
+        # Replace using patterns
+        if self.compiled is not None:
+            newname, newpath = self.compiled.rename(newname, newpath, count, ext=ext)
+
+        # Replace spaces
+        if self.spaces is not None and newname != None:
+            newname, newpath = renamerfilefuncs.replace_spaces(
+                newname, newpath, self.spaces
+            )
+
+        # Replace orig with new
+        if self.replace is not None and newname != None:
+            orig, new = self.replace
+            newname, newpath = renamerfilefuncs.replace_with(
+                newname, newpath, orig, new
+            )
+
+        # Replace capitalization
+        if self.capitalization is not None and newname != None:
+            newname, newpath = renamerfilefuncs.replace_capitalization(
+                newname, newpath, self.capitalization
+            )
+
+        # Replace accents
+        if self.accents and newname != None:
+            newname, newpath = renamerfilefuncs.replace_accents(newname, newpath)
+
+        # Fix duplicated symbols
+        if self.duplicated and newname != None:
+            newname, newpath = renamerfilefuncs.replace_duplicated(newname, newpath)
+
+        # Insert / delete
+        if self.insert is not None and newname != None:
+            text, pos = self.insert
+            newname, newpath = renamerfilefuncs.insert_at(newname, newpath, text, pos)
+        elif self.delete is not None and newname != None:
+            ini, to = self.delete
+            newname, newpath = renamerfilefuncs.delete_from(newname, newpath, ini, to)
+
+        # Add the kept extension
+        if ext != "" and newname:
+            newname, newpath = renamerfilefuncs.add_extension(newname, newpath, ext)
+
+        if newname == "":
+            return None
+        return newname
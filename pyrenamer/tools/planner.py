@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+
+"""
+planner.py - Order the renames of the pyRenamer mass file renamer, so files
+can take names that other renamed files are leaving
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+import sys
+from collections import Counter, namedtuple
+from gettext import gettext as _
+
+
+# A rename to do. index is the position of the rename on the planned list,
+# or None for the renames to temporary names that break cycles. Steps of the
+# same chain have to be done one after the other, in order, while steps of
+# different chains on the same depth can be done at once
+RenameStep = namedtuple("RenameStep", ["ori", "new", "index", "chain"])
+
+# A rename that can't be done, the kind of problem, and why
+RenameConflict = namedtuple(
+    "RenameConflict", ["ori", "new", "index", "kind", "reason"]
+)
+
+# Kinds of conflicts
+INVALID = "invalid"  # The new name is empty or has a "/" or NUL character
+TOO_LONG = "too long"  # The new name is longer than the file system allows
+DUPLICATED = "duplicated"  # Another file is renamed to the same name
+REPEATED = "repeated"  # The same file is renamed more than once
+EXISTS = "exists"  # A file that is not renamed has the new name
+BLOCKED = "blocked"  # Waiting on a rename that can't be done
+
+KINDS = [INVALID, TOO_LONG, DUPLICATED, REPEATED, EXISTS, BLOCKED]
+
+TEMP_PREFIX = ".pyrenamer-"
+
+# Longest file name, in bytes, where the file system doesn't tell
+NAME_MAX = 255
+
+
+def same_file(ori, new):
+    """Check if two paths are the same file, like hard links"""
+    try:
+        return os.path.samefile(ori, new)
+    except OSError:
+        return False
+
+
+def get_depth(path):
+    return path.count("/")
+
+
+def is_case_insensitive(dir, names):
+    """Check if a directory ignores case in file names, like the ones on
+    FAT, NTFS or HFS+ file systems, looking up one of its names with its
+    case swapped. names is the listing of the directory"""
+
+    for name in names:
+        swapped = name.swapcase()
+        if swapped == name:
+            continue
+        if swapped in names:
+            return False
+        return os.path.lexists(os.path.join(dir, swapped))
+
+    # No name to try, so try the directory itself on its parent
+    parent, name = os.path.split(dir)
+    if name.swapcase() == name:
+        return False
+    return os.path.lexists(os.path.join(parent, name.swapcase()))
+
+
+def get_temp_name(name, count, name_max=NAME_MAX):
+    """Returns the temporary name number count of a file, cutting its name
+    so the temporary one is not longer than name_max bytes"""
+    prefix = "%s%d-" % (TEMP_PREFIX, count)
+    room = name_max - len(os.fsencode(prefix))
+    encoded = os.fsencode(name)
+    if len(encoded) > room:
+        # Cut on whole characters, so the name is still valid
+        name = encoded[: max(room, 0)].decode(sys.getfilesystemencoding(), "ignore")
+    return prefix + name
+
+
+class TargetDirs:
+    """What's known about the directories files are renamed into. Every
+    directory is read the first time it's needed, so checking the new names
+    costs one listing per directory instead of one stat per file. On
+    directories that ignore case, names are compared ignoring case too."""
+
+    def __init__(self):
+        self.dirs = {}
+
+    def get_dir(self, dir):
+        """Returns (names, case_insensitive, name_max) of a directory. names
+        is None if the directory can't be read"""
+        info = self.dirs.get(dir)
+        if info is None:
+            info = self.read_dir(dir)
+            self.dirs[dir] = info
+        return info
+
+    def read_dir(self, dir):
+        try:
+            names = set(os.listdir(dir))
+        except OSError:
+            return None, False, NAME_MAX
+        try:
+            name_max = os.pathconf(dir, "PC_NAME_MAX")
+        except (OSError, ValueError):
+            name_max = NAME_MAX
+        case_insensitive = is_case_insensitive(dir, names)
+        if case_insensitive:
+            names = set([name.casefold() for name in names])
+        return names, case_insensitive, name_max
+
+    def get_key(self, path):
+        """Returns the path the way it's compared with other paths"""
+        dir, name = os.path.split(path)
+        if self.get_dir(dir)[1]:
+            return os.path.join(dir, name.casefold())
+        return path
+
+    def exists(self, path):
+        dir, name = os.path.split(path)
+        names, case_insensitive, name_max = self.get_dir(dir)
+        if names is None:
+            return os.path.lexists(path)
+        if case_insensitive:
+            name = name.casefold()
+        return name in names
+
+    def check(self, ori, new):
+        """Returns (kind, reason) if new is not a valid new path for ori, or
+        None if it is"""
+        dir, name = os.path.split(new)
+        ori_dir = os.path.dirname(ori)
+        if dir != ori_dir:
+            name = os.path.relpath(new, ori_dir)
+            return INVALID, _("%s has a \"/\" character") % name
+        if name == "":
+            return INVALID, _("The new name of %s is empty") % ori
+        if "\0" in name:
+            return INVALID, _("%s has a NUL character") % name
+        name_max = self.get_dir(dir)[2]
+        if len(os.fsencode(name)) > name_max:
+            return TOO_LONG, _("%s is longer than %d bytes") % (name, name_max)
+        return None
+
+
+def plan_renames(renames, target_dirs=None):
+    """Order a list of (ori, new) renames so none of them overwrites a file.
+    Returns (steps, conflicts): the list of RenameStep to do in order, and
+    the list of RenameConflict for the renames that can't be done. Nothing
+    is renamed here, so every problem is found before touching the disk.
+
+    A file can take the name of another renamed file once that one is
+    renamed, so chains like file2 -> file3, file3 -> file4 are done from
+    the end. Cycles like a -> b, b -> a rename one of the files to a
+    temporary name first. Invalid names, renames to a name taken by a file
+    that is not renamed, or that another rename takes first, and renames of
+    a file that is already renamed, are conflicts.
+    Files on subdirectories are renamed before their directories."""
+
+    if target_dirs is None:
+        target_dirs = TargetDirs()
+    get_key = target_dirs.get_key
+
+    # Renames by the key of their source, and the other way round
+    dest_of = {}
+    source_of = {}
+    index_of = {}
+    sources = set()
+    conflicts = []
+
+    # Build the graph, keeping the first rename of every file and to every
+    # destination
+    for index, (ori, new) in enumerate(renames):
+        if ori == new:
+            continue
+        ori_key = get_key(ori)
+        if ori_key in sources:
+            reason = _("%s is renamed more than once") % ori
+            conflicts.append(RenameConflict(ori, new, index, REPEATED, reason))
+            continue
+        sources.add(ori_key)
+        problem = target_dirs.check(ori, new)
+        if problem is not None:
+            conflicts.append(RenameConflict(ori, new, index, *problem))
+            continue
+        new_key = get_key(new)
+        if new_key in source_of:
+            reason = _("Another file is renamed to %s") % new
+            conflicts.append(RenameConflict(ori, new, index, DUPLICATED, reason))
+            continue
+        dest_of[ori_key] = new_key
+        source_of[new_key] = ori_key
+        index_of[ori_key] = index
+
+    def fail(ori_key, kind, reason):
+        """Drop a rename, and the renames waiting for it, back along the
+        chain"""
+        while ori_key is not None:
+            new_key = dest_of.pop(ori_key)
+            del source_of[new_key]
+            index = index_of[ori_key]
+            ori, new = renames[index]
+            conflicts.append(RenameConflict(ori, new, index, kind, reason))
+            kind = BLOCKED
+            reason = _("%s is not renamed") % ori
+            ori_key = source_of.get(ori_key)
+
+    # Destinations taken by files that stay must fail
+    for ori_key in list(dest_of):
+        new_key = dest_of.get(ori_key)
+        if new_key is None or new_key in dest_of:
+            continue
+        ori, new = renames[index_of[ori_key]]
+        if target_dirs.exists(new) and not same_file(ori, new):
+            fail(ori_key, EXISTS, _("%s already exists") % new)
+
+    def step(ori_key, chain):
+        index = index_of[ori_key]
+        ori, new = renames[index]
+        return RenameStep(ori, new, index, chain)
+
+    # Chains start at files whose name is not taken by other file, and they
+    # are done from the end, so every name is free when it's taken
+    steps = []
+    done = set()
+    chain_count = 0
+    for ori_key in dest_of:
+        if ori_key in source_of or ori_key in done:
+            continue
+        chain = []
+        while ori_key in dest_of and ori_key not in done:
+            done.add(ori_key)
+            chain.append(step(ori_key, chain_count))
+            ori_key = dest_of[ori_key]
+        steps.extend(reversed(chain))
+        chain_count += 1
+
+    # What's left are cycles. Renames that only change the case of a name,
+    # on directories that ignore case, are cycles of a single file
+    temp_count = 0
+    for ori_key in dest_of:
+        if ori_key in done:
+            continue
+        cycle = []
+        while ori_key not in done:
+            done.add(ori_key)
+            cycle.append(ori_key)
+            ori_key = dest_of[ori_key]
+
+        first = step(cycle[0], chain_count)
+        dir, name = os.path.split(first.ori)
+        name_max = target_dirs.get_dir(dir)[2]
+        while True:
+            temp = os.path.join(dir, get_temp_name(name, temp_count, name_max))
+            temp_count += 1
+            temp_key = get_key(temp)
+            if (
+                temp_key not in dest_of
+                and temp_key not in source_of
+                and not target_dirs.exists(temp)
+            ):
+                break
+
+        steps.append(RenameStep(first.ori, temp, None, chain_count))
+        for ori_key in reversed(cycle[1:]):
+            steps.append(step(ori_key, chain_count))
+        steps.append(RenameStep(temp, first.new, first.index, chain_count))
+        chain_count += 1
+
+    # Deeper files first, so no directory is renamed before its contents
+    steps.sort(key=lambda step: -get_depth(step.ori))
+    conflicts.sort(key=lambda conflict: conflict.index)
+    return steps, conflicts
+
+
+def get_summary(conflicts):
+    """Returns a report of how many renames can't be done, by kind"""
+
+    labels = {
+        INVALID: _("Invalid new name"),
+        TOO_LONG: _("New name too long"),
+        DUPLICATED: _("Same new name as another file"),
+        REPEATED: _("Renamed more than once"),
+        EXISTS: _("New name already taken"),
+        BLOCKED: _("Waiting on a file that can't be renamed"),
+    }
+    counts = Counter([conflict.kind for conflict in conflicts])
+    lines = [_("%d files can't be renamed:") % len(conflicts)]
+    for kind in KINDS:
+        if counts[kind]:
+            lines.append("    %s: %d" % (labels[kind], counts[kind]))
+    return "\n".join(lines)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+"""
+preview.py - Parallel preview of new file names for the pyRenamer mass file
+renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import atexit
+import multiprocessing
+import os
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Names previewed by a worker process on every task. Bigger chunks send
+# fewer messages between processes
+CHUNK_SIZE = 4096
+
+# Lists with less names than this are previewed in this process, as starting
+# the workers and sending them the names would take longer
+MIN_PARALLEL = 50000
+
+# Bounds of the cache of previewed names
+CACHE_ENTRIES = 500000
+CACHE_BYTES = 128 * 1024 * 1024
+
+# Approximate bytes used by a cache entry, besides its names
+CACHE_ENTRY_OVERHEAD = 200
+
+executor = None
+
+
+class PreviewCache:
+    """Least recently used cache of new names, keyed by RenamePlan.cache_key,
+    so previewing again with a plan that was already used doesn't compute
+    the names again. It's bounded both by number of entries and by an
+    estimate of their size in bytes, and it's safe to use from several
+    threads."""
+
+    missing = object()
+
+    def __init__(self, max_entries=CACHE_ENTRIES, max_bytes=CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """Forget every entry, and reset the counters"""
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_size(self, key, newname):
+        size = CACHE_ENTRY_OVERHEAD + sys.getsizeof(key[1])
+        if newname is not None:
+            size += sys.getsizeof(newname)
+        return size
+
+    def get(self, key):
+        """Returns the new name for a key, or PreviewCache.missing"""
+        if key is None:
+            return self.missing
+        with self.lock:
+            newname = self.entries.get(key, self.missing)
+            if newname is self.missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return newname
+
+    def put(self, key, newname):
+        """Store the new name for a key, forgetting the least recently used
+        entries if the cache is full"""
+        if key is None:
+            return
+        with self.lock:
+            old = self.entries.pop(key, self.missing)
+            if old is not self.missing:
+                self.bytes -= self.get_size(key, old)
+            self.entries[key] = newname
+            self.bytes += self.get_size(key, newname)
+            while self.entries and (
+                len(self.entries) > self.max_entries or self.bytes > self.max_bytes
+            ):
+                old_key, old = self.entries.popitem(last=False)
+                self.bytes -= self.get_size(old_key, old)
+
+
+# Cache shared by every preview of the gui
+cache = PreviewCache()
+
+
+def get_workers():
+    """Returns the number of worker processes to preview with"""
+    return os.cpu_count() or 1
+
+
+def get_executor():
+    """Returns the process pool, starting it on first use. Workers are
+    spawned, not forked, so they don't inherit the gui or its threads"""
+
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(
+            get_workers(), mp_context=multiprocessing.get_context("spawn")
+        )
+        atexit.register(shutdown)
+    return executor
+
+
+def shutdown():
+    """Stop the worker processes, if they were started"""
+
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False)
+        executor = None
+
+
+def preview_chunk(rename_plan, names, paths, counts):
+    """Returns the new names of a chunk of files"""
+    apply = rename_plan.apply
+    return [
+        apply(name, path, count) for name, path, count in zip(names, paths, counts)
+    ]
+
+
+class CachedChunk:
+    """A chunk of files to preview, split into the ones with new names on a
+    PreviewCache and the ones that still have to be previewed"""
+
+    def __init__(self, rename_plan, names, paths, counts, cache):
+        self.cache = cache
+        self.keys = [
+            rename_plan.cache_key(name, path, count)
+            for name, path, count in zip(names, paths, counts)
+        ]
+        self.newnames = [cache.get(key) for key in self.keys]
+        self.misses = [
+            i for i, newname in enumerate(self.newnames) if newname is cache.missing
+        ]
+        self.names = [names[i] for i in self.misses]
+        self.paths = [paths[i] for i in self.misses]
+        self.counts = [counts[i] for i in self.misses]
+
+    def merge(self, newnames):
+        """Returns the new names of the whole chunk, given the new names of
+        the files that were not on the cache, and caches these"""
+        for i, newname in zip(self.misses, newnames):
+            self.newnames[i] = newname
+            self.cache.put(self.keys[i], newname)
+        return self.newnames
+
+
+def iter_preview(
+    rename_plan, names, paths, counts=None, chunksize=CHUNK_SIZE, cache=None
+):
+    """Preview the new names of a list of files with a RenamePlan. Yields
+    lists with the new names of every chunksize files, in the same order as
+    names. counts are the positions of the files among the renamed ones, by
+    default their positions on names. New names are looked up on, and
+    stored on, cache if given.
+
+    Short lists are previewed in this process. Otherwise chunks are sent to
+    the process pool, and only a few of them are waiting for the workers at
+    once, so closing the generator stops the preview soon."""
+
+    if counts is None:
+        counts = range(len(names))
+
+    def chunks():
+        for start in range(0, len(names), chunksize):
+            end = start + chunksize
+            chunk = (names[start:end], paths[start:end], counts[start:end])
+            if cache is None:
+                yield None, chunk
+            else:
+                cached = CachedChunk(rename_plan, *chunk, cache)
+                yield cached, (cached.names, cached.paths, cached.counts)
+
+    def merge(cached, newnames):
+        if cached is None:
+            return newnames
+        return cached.merge(newnames)
+
+    if len(names) < MIN_PARALLEL or get_workers() < 2:
+        for cached, chunk in chunks():
+            yield merge(cached, preview_chunk(rename_plan, *chunk))
+        return
+
+    pool = get_executor()
+    pending = deque()
+    max_pending = 2 * get_workers()
+    try:
+        for cached, chunk in chunks():
+            pending.append((cached, pool.submit(preview_chunk, rename_plan, *chunk)))
+            if len(pending) >= max_pending:
+                cached, future = pending.popleft()
+                yield merge(cached, future.result())
+        while pending:
+            cached, future = pending.popleft()
+            yield merge(cached, future.result())
+    finally:
+        for cached, future in pending:
+            future.cancel()
+
+
+class PlanPreview:
+    """Preview function for the rows of a FileTable with a RenamePlan, see
+    FileTable.set_preview. New names are looked up on, and stored on, cache
+    if given"""
+
+    def __init__(self, table, rename_plan, cache=None):
+        self.table = table
+        self.plan = rename_plan
+        self.cache = cache
+
+    def __call__(self, row, count):
+        name = self.table.get_name(row)
+        path = self.table.get_path(row)
+        if self.cache is None:
+            return self.plan.apply(name, path, count)
+
+        key = self.plan.cache_key(name, path, count)
+        newname = self.cache.get(key)
+        if newname is self.cache.missing:
+            newname = self.plan.apply(name, path, count)
+            self.cache.put(key, newname)
+        return newname
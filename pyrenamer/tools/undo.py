@@ -21,26 +21,321 @@ this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 
+# Global Imports
+import os
+import pickle
+import tempfile
+from array import array
+from collections import namedtuple
+
 # Local Imports
-from tools import filetools as renamerfilefuncs
+from tools import executor
+from tools import log
+from tools import planner
 
-class Undo:
+
+# Renames that can be undone, one level per rename of the gui
+UNDO_LEVELS = 20
+
+# Bytes of undo history kept in memory. Older levels are written to
+# temporary files beyond this
+MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+# What an undo or redo did: the number of files renamed, the renames that
+# couldn't be planned (planner.RenameConflict) and the ones that failed
+# (executor.RenameFailure)
+ReplayResult = namedtuple("ReplayResult", ["renamed", "conflicts", "failures"])
+
+
+def get_common_prefix(a, b):
+    """Returns the length of the common start of two strings"""
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+
+class UndoStep:
+    """The renames of one run, as (original, renamed) paths. Every directory
+    is stored only once, and each entry keeps the id of its directory, the
+    original name, and the renamed name without the start it shares with
+    the original one. Names are kept together, utf-8 encoded, in a single
+    bytearray.
+
+    A step can be spilled to a temporary file, to free its memory, and it's
+    loaded back the next time it's read."""
 
     def __init__(self):
-        self.undo_memory = []
+        self.dirs = []
+        self.dir_ids = {}
+        self.dir_of = array("L")
+        self.newdir_of = {}
+        self.prefixes = array("L")
+        self.name_data = bytearray()
+        self.name_ends = array("Q")
+        self.spilled = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def get_dir_id(self, dir):
+        dir_id = self.dir_ids.get(dir)
+        if dir_id is None:
+            dir_id = len(self.dirs)
+            self.dirs.append(dir)
+            self.dir_ids[dir] = dir_id
+        return dir_id
+
+    def add(self, original, renamed):
+        self.load()
+        dir, name = os.path.split(original)
+        newdir, newname = os.path.split(renamed)
+        entry = len(self.dir_of)
+        self.dir_of.append(self.get_dir_id(dir))
+        if newdir != dir:
+            self.newdir_of[entry] = self.get_dir_id(newdir)
+
+        prefix = get_common_prefix(name, newname)
+        self.prefixes.append(prefix)
+        self.name_data += name.encode("utf-8", "surrogateescape")
+        self.name_ends.append(len(self.name_data))
+        self.name_data += newname[prefix:].encode("utf-8", "surrogateescape")
+        self.name_ends.append(len(self.name_data))
+        self.count += 1
+
+    def get_name(self, end):
+        start = self.name_ends[end - 1] if end > 0 else 0
+        return self.name_data[start : self.name_ends[end]].decode(
+            "utf-8", "surrogateescape"
+        )
+
+    def __iter__(self):
+        """Yields the (original, renamed) paths, in the order they were
+        added"""
+        self.load()
+        for entry in range(len(self.dir_of)):
+            dir = self.dirs[self.dir_of[entry]]
+            newdir = self.dirs[self.newdir_of.get(entry, self.dir_of[entry])]
+            name = self.get_name(2 * entry)
+            newname = name[: self.prefixes[entry]] + self.get_name(2 * entry + 1)
+            yield os.path.join(dir, name), os.path.join(newdir, newname)
+
+    def get_size(self):
+        """Returns an estimate of the bytes used by the step in memory"""
+        if self.spilled is not None:
+            return 0
+        size = len(self.name_data)
+        size += self.dir_of.itemsize * len(self.dir_of)
+        size += self.prefixes.itemsize * len(self.prefixes)
+        size += self.name_ends.itemsize * len(self.name_ends)
+        size += 100 * len(self.newdir_of)
+        for dir in self.dirs:
+            size += 2 * len(dir) + 100
+        return size
+
+    def spill(self):
+        """Write the step to a temporary file and free its memory"""
+        if self.spilled is not None:
+            return
+        spilled = tempfile.TemporaryFile()
+        data = (
+            self.dirs,
+            self.dir_of,
+            self.newdir_of,
+            self.prefixes,
+            self.name_data,
+            self.name_ends,
+        )
+        pickle.dump(data, spilled, pickle.HIGHEST_PROTOCOL)
+        self.spilled = spilled
+        self.dirs = []
+        self.dir_ids = {}
+        self.dir_of = array("L")
+        self.newdir_of = {}
+        self.prefixes = array("L")
+        self.name_data = bytearray()
+        self.name_ends = array("Q")
+
+    def load(self):
+        """Read back a step that was spilled"""
+        if self.spilled is None:
+            return
+        self.spilled.seek(0)
+        (
+            self.dirs,
+            self.dir_of,
+            self.newdir_of,
+            self.prefixes,
+            self.name_data,
+            self.name_ends,
+        ) = pickle.load(self.spilled)
+        self.dir_ids = dict([(dir, dir_id) for dir_id, dir in enumerate(self.dirs)])
+        self.spilled.close()
+        self.spilled = None
+
+    def close(self):
+        """Delete the temporary file of the step, if it was spilled"""
+        if self.spilled is not None:
+            self.spilled.close()
+            self.spilled = None
+
+
+class Undo:
+    """Undo and redo history of the renames. Every rename of the gui is a
+    level of the history, and up to UNDO_LEVELS of them can be undone.
+    Levels beyond MEMORY_BUDGET bytes, the oldest first, are spilled to
+    temporary files until they're undone again."""
+
+    def __init__(self, levels=UNDO_LEVELS, memory_budget=MEMORY_BUDGET):
+        self.levels = levels
+        self.memory_budget = memory_budget
+        self.history = []
+        self.position = 0
 
     def clean(self):
-        self.undo_memory = []
+        """Forget the whole history"""
+        for step in self.history:
+            step.close()
+        self.history = []
+        self.position = 0
+
+    def begin(self):
+        """Start a new level. Levels that were undone can't be redone
+        anymore"""
+        for step in self.history[self.position :]:
+            step.close()
+        del self.history[self.position :]
+
+        self.history.append(UndoStep())
+        while len(self.history) > self.levels:
+            self.history.pop(0).close()
+        self.position = len(self.history)
+        self.check_memory()
 
     def add(self, original, renamed):
-        self.undo_memory.append([original, renamed])
+        """Add a rename to the current level"""
+        if not self.history:
+            self.begin()
+        self.history[self.position - 1].add(original, renamed)
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.history)
+
+    def check_memory(self):
+        """Spill the oldest levels while the history uses more than its
+        memory budget. The last level is always kept in memory"""
+        size = sum([step.get_size() for step in self.history])
+        for step in self.history[:-1]:
+            if size <= self.memory_budget:
+                break
+            step_size = step.get_size()
+            if step_size:
+                step.spill()
+                size -= step_size
+
+    def undo_renames(self):
+        """Returns the (ori, new) renames that undo the last level that was
+        not undone, or [] if there's nothing to undo. The history only
+        changes once they're done, see replayed"""
+        if not self.can_undo():
+            return []
+        step = self.history[self.position - 1]
+        log.logger.info("undo", extra={"files": len(step)})
+        return invert(list(step))
+
+    def redo_renames(self):
+        """Returns the (ori, new) renames that redo the last level that was
+        undone, or [] if there's nothing to redo. The history only changes
+        once they're done, see replayed"""
+        if not self.can_redo():
+            return []
+        step = self.history[self.position]
+        log.logger.info("redo", extra={"files": len(step)})
+        return list(step)
+
+    def replayed(self, redo, renames, done):
+        """Record a replay of the renames of undo_renames, or redo_renames
+        if redo. done are the indexes of the renames that were done. If every
+        one was done the level is undone, or redone. Otherwise the ones
+        done are added as a new level, so they can be undone"""
+        if not renames:
+            return
+        if len(set(done)) == len(renames):
+            self.position += 1 if redo else -1
+            self.check_memory()
+        elif done:
+            self.begin()
+            for index in sorted(set(done)):
+                self.add(*renames[index])
+
+    def replay(self, redo, journal=None):
+        """Undo, or redo if redo, a level and record it with replayed. The
+        renames are done in the order given by planner.plan_renames, so
+        chains like a -> b, b -> c are undone from the start, on a
+        RenameExecutor, so files on different directories are renamed at
+        once. Returns a ReplayResult"""
+        renames = self.redo_renames() if redo else self.undo_renames()
+        steps, conflicts = planner.plan_renames(renames)
+        renamed, failures = executor.RenameExecutor(steps, journal=journal).run()
+        done = [step.index for step in renamed if step.index is not None]
+        self.replayed(redo, renames, done)
+        return ReplayResult(len(done), conflicts, failures)
+
+    def undo(self, journal=None):
+        """Undo the last level that was not undone. Returns a ReplayResult"""
+        return self.replay(False, journal)
+
+    def redo(self, journal=None):
+        """Redo the last level that was undone. Returns a ReplayResult"""
+        return self.replay(True, journal)
+
+
+def invert(renames):
+    """Returns the renames that put back a level of (original, renamed)
+    paths. The paths of a level are the ones files had before the level,
+    and directories are renamed after their contents, so the paths of the
+    contents are moved to where their renamed directories are now"""
+
+    renamed_dirs = dict(renames)
+    current_dirs = {}
+
+    def current(dir):
+        """Returns where a directory is after the level"""
+        path = current_dirs.get(dir)
+        if path is None:
+            parent, name = os.path.split(dir)
+            if name == "":
+                path = dir
+            else:
+                if dir in renamed_dirs:
+                    name = os.path.basename(renamed_dirs[dir])
+                path = os.path.join(current(parent), name)
+            current_dirs[dir] = path
+        return path
+
+    inverse = []
+    for original, renamed in renames:
+        newdir, newname = os.path.split(renamed)
+        dir, name = os.path.split(original)
+        inverse.append(
+            (os.path.join(current(newdir), newname), os.path.join(current(dir), name))
+        )
+    return inverse
+
 
-    def undo(self):
-        for i in self.undo_memory:
-            renamerfilefuncs.rename_file(i[1], i[0])
-            print("Undo: %s -> %s" % (i[1] , i[0]))
+def get_summary(result):
+    """Returns a report of the renames of a ReplayResult that couldn't be
+    done"""
 
-    def redo(self):
-        for i in self.undo_memory:
-            renamerfilefuncs.rename_file(i[0], i[1])
-            print("Redo: %s -> %s" % (i[0] , i[1]))
+    lines = []
+    if result.conflicts:
+        lines.append(planner.get_summary(result.conflicts))
+    if result.failures:
+        lines.append(executor.get_summary(result.failures))
+    return "\n\n".join(lines)
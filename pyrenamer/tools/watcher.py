@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+watcher.py - Watch directories for files created, deleted or moved outside
+the pyRenamer mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import ctypes
+import ctypes.util
+import os
+import struct
+from collections import namedtuple
+
+
+# Kinds of events
+CREATED = "created"
+DELETED = "deleted"
+MOVED = "moved"
+OVERFLOW = "overflow"  # Events were lost, watched directories must be read again
+
+WatchEvent = namedtuple("WatchEvent", ["kind", "path", "newpath", "is_dir"])
+
+# Milliseconds between checks of the polling watcher
+POLL_INTERVAL = 2000
+
+# inotify constants, from <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ONLYDIR = 0x01000000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def get_libc():
+    """Returns the C library if it has inotify, or None"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError, TypeError):
+        return None
+    return libc
+
+
+class InotifyWatcher:
+    """Watch directories with the Linux inotify API. Events are read when
+    fileno() is ready to be read, with read_events"""
+
+    def __init__(self):
+        self.libc = get_libc()
+        if self.libc is None:
+            raise OSError("inotify is not available")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.wds = {}
+        self.dirs = {}
+
+    def fileno(self):
+        return self.fd
+
+    def watch(self, dirs):
+        """Watch exactly the given directories. Returns the ones that can't
+        be watched"""
+        dirs = set(dirs)
+        for dir in list(self.wds):
+            if dir not in dirs:
+                self.remove(dir)
+        return [dir for dir in dirs if dir not in self.wds and not self.add(dir)]
+
+    def add(self, dir):
+        """Start watching a directory. Returns False if it can't be watched"""
+        if dir in self.wds:
+            return True
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir), WATCH_MASK)
+        if wd < 0:
+            return False
+        self.wds[dir] = wd
+        self.dirs[wd] = dir
+        return True
+
+    def remove(self, dir):
+        """Stop watching a directory"""
+        wd = self.wds.pop(dir, None)
+        if wd is not None:
+            self.dirs.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.wds = {}
+        self.dirs = {}
+
+    def read_raw(self):
+        """Read every queued inotify event as (wd, mask, cookie, name)"""
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos : pos + length].rstrip(b"\0")
+            pos += length
+            yield wd, mask, cookie, os.fsdecode(name)
+
+    def read_events(self):
+        """Returns the list of WatchEvent that happened since the last call.
+        A file moved out of the watched directories is reported as deleted,
+        and one moved into them as created"""
+        events = []
+        moved_from = None
+        for wd, mask, cookie, name in self.read_raw():
+            if mask & IN_Q_OVERFLOW:
+                events.append(WatchEvent(OVERFLOW, None, None, False))
+                continue
+            if mask & IN_IGNORED:
+                dir = self.dirs.pop(wd, None)
+                if dir is not None:
+                    self.wds.pop(dir, None)
+                continue
+            dir = self.dirs.get(wd)
+            if dir is None or not name:
+                continue
+
+            path = os.path.join(dir, name)
+            is_dir = bool(mask & IN_ISDIR)
+
+            # Both halves of a move come one after the other
+            if moved_from is not None:
+                from_cookie, from_path, from_is_dir = moved_from
+                moved_from = None
+                if mask & IN_MOVED_TO and cookie == from_cookie:
+                    events.append(WatchEvent(MOVED, from_path, path, is_dir))
+                    continue
+                events.append(WatchEvent(DELETED, from_path, None, from_is_dir))
+
+            if mask & IN_MOVED_FROM:
+                moved_from = (cookie, path, is_dir)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                events.append(WatchEvent(CREATED, path, None, is_dir))
+            elif mask & IN_DELETE:
+                events.append(WatchEvent(DELETED, path, None, is_dir))
+
+        if moved_from is not None:
+            from_cookie, from_path, from_is_dir = moved_from
+            events.append(WatchEvent(DELETED, from_path, None, from_is_dir))
+        return events
+
+
+class PollingWatcher:
+    """Watch directories reading them again, every POLL_INTERVAL, when their
+    modification time changes. Files are told apart by inode, so moves
+    between watched directories are found too"""
+
+    def __init__(self):
+        self.snapshots = {}
+
+    def fileno(self):
+        """There's nothing to wait on, read_events has to be called every
+        POLL_INTERVAL milliseconds"""
+        return None
+
+    def watch(self, dirs):
+        """Watch exactly the given directories. Returns the ones that can't
+        be watched"""
+        dirs = set(dirs)
+        for dir in list(self.snapshots):
+            if dir not in dirs:
+                self.remove(dir)
+        return [dir for dir in dirs if not self.add(dir)]
+
+    def add(self, dir):
+        """Start watching a directory. Returns False if it can't be read"""
+        if dir not in self.snapshots:
+            snapshot = self.read_dir(dir)
+            if snapshot is None:
+                return False
+            self.snapshots[dir] = snapshot
+        return True
+
+    def remove(self, dir):
+        """Stop watching a directory"""
+        self.snapshots.pop(dir, None)
+
+    def close(self):
+        self.snapshots = {}
+
+    def read_dir(self, dir):
+        """Returns (modification time, {name: (inode, is_dir)}) of a directory,
+        or None if it can't be read"""
+        try:
+            mtime = os.stat(dir).st_mtime_ns
+            entries = {}
+            with os.scandir(dir) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    entries[entry.name] = (entry.inode(), is_dir)
+        except OSError:
+            return None
+        return mtime, entries
+
+    def read_events(self):
+        """Returns the list of WatchEvent that happened since the last call"""
+        gone = {}
+        new = {}
+        for dir, (mtime, entries) in list(self.snapshots.items()):
+            try:
+                if os.stat(dir).st_mtime_ns == mtime:
+                    continue
+            except OSError:
+                pass
+
+            snapshot = self.read_dir(dir)
+            if snapshot is None:
+                snapshot = (None, {})
+            self.snapshots[dir] = snapshot
+            for name, (inode, is_dir) in entries.items():
+                if snapshot[1].get(name, (None,))[0] != inode:
+                    gone[inode] = (os.path.join(dir, name), is_dir)
+            for name, (inode, is_dir) in snapshot[1].items():
+                if entries.get(name, (None,))[0] != inode:
+                    new[inode] = (os.path.join(dir, name), is_dir)
+
+        events = []
+        for inode, (path, is_dir) in gone.items():
+            if inode in new:
+                newpath, is_dir = new.pop(inode)
+                events.append(WatchEvent(MOVED, path, newpath, is_dir))
+            else:
+                events.append(WatchEvent(DELETED, path, None, is_dir))
+        for path, is_dir in new.values():
+            events.append(WatchEvent(CREATED, path, None, is_dir))
+        return events
+
+
+def create_watcher():
+    """Returns an InotifyWatcher, or a PollingWatcher where inotify is not
+    available"""
+    try:
+        return InotifyWatcher()
+    except OSError:
+        return PollingWatcher()
@@ -346,36 +346,121 @@ class TreeFileBrowser(GObject.GObject):
     def get_file_list(self, model, iter, dir):
         """Get the file list from a given directory"""
 
-        ls = os.listdir(dir)
-        ls.sort(key=str.lower)
-        for i in ls:
-            path = ospath.join(dir, i)
-            if ospath.isdir(path) or not self.show_only_dirs:
-                if i[0] != "." or (self.show_hidden and i[0] == "."):
-                    newiter = model.append(iter)
-                    if ospath.isdir(path):
-                        icon = self.get_folder_closed_icon()
-                    else:
-                        icon = self.get_file_icon()
-                    model.set_value(newiter, 0, icon)
-                    model.set_value(newiter, 1, i)
-                    model.set_value(newiter, 2, path)
-                    if ospath.isdir(path):
-                        try:
-                            subdir = os.listdir(path)
-                        except:
-                            subdir = []
-                        if subdir != []:
-                            for i in subdir:
-                                if (
-                                    ospath.isdir(ospath.join(path, i))
-                                    or not self.show_only_dirs
-                                ):
-                                    if i[0] != "." or (
-                                        self.show_hidden and i[0] == "."
-                                    ):
-                                        self.add_empty_child(model, newiter)
-                                        break
+        with os.scandir(dir) as it:
+            entries = [entry for entry in it if self.is_shown(entry)]
+        entries.sort(key=lambda entry: entry.name.lower())
+        for entry in entries:
+            newiter = model.append(iter)
+            is_dir = entry.is_dir()
+            if is_dir:
+                icon = self.get_folder_closed_icon()
+            else:
+                icon = self.get_file_icon()
+            model.set_value(newiter, 0, icon)
+            model.set_value(newiter, 1, entry.name)
+            model.set_value(newiter, 2, entry.path)
+            if is_dir and self.has_children(entry.path):
+                self.add_empty_child(model, newiter)
+
+    def is_shown(self, entry):
+        """Check if a directory entry is shown on the tree"""
+
+        if entry.name[0] == "." and not self.show_hidden:
+            return False
+        try:
+            return not self.show_only_dirs or entry.is_dir()
+        except OSError:
+            return False
+
+    def has_children(self, dir):
+        """Check if a directory has any entry shown on the tree. Stops reading
+        the directory at the first one, so big directories are not listed
+        just to draw their expander"""
+
+        try:
+            with os.scandir(dir) as it:
+                for entry in it:
+                    if self.is_shown(entry):
+                        return True
+        except OSError:
+            pass
+        return False
+
+    def find_iter(self, path):
+        """Returns the iter of a path on the tree, or None if it isn't loaded"""
+
+        model = self.view.get_model()
+        iter = model.get_iter_first()
+        if iter == None:
+            return None
+        if path == self.root:
+            return iter
+        prefix = self.root if self.root.endswith("/") else self.root + "/"
+        if not path.startswith(prefix):
+            return None
+
+        iter = model.iter_children(iter)
+        while iter != None:
+            value = model.get_value(iter, 2)
+            if value == path:
+                return iter
+            if value != None and path.startswith(value + "/"):
+                iter = model.iter_children(iter)
+            else:
+                iter = model.iter_next(iter)
+        return None
+
+    def file_created(self, path, is_dir):
+        """Add a file created on a directory shown on the tree"""
+
+        model = self.view.get_model()
+        parent = self.find_iter(ospath.dirname(path))
+        name = ospath.basename(path)
+        if parent == None or self.find_iter(path) != None:
+            return
+        if (name[0] == "." and not self.show_hidden) or (
+            self.show_only_dirs and not is_dir
+        ):
+            return
+
+        # Folders that are not expanded only need their expander. The root
+        # is always shown expanded
+        child = model.iter_children(parent)
+        if model.iter_parent(parent) != None and not self.view.row_expanded(
+            model.get_path(parent)
+        ):
+            if child == None:
+                self.add_empty_child(model, parent)
+            return
+        if child != None and model.get_value(child, 2) == None:
+            return
+
+        # Keep the tree sorted
+        while child != None and model.get_value(child, 1).lower() < name.lower():
+            child = model.iter_next(child)
+        newiter = model.insert_before(parent, child)
+        if is_dir:
+            icon = self.get_folder_closed_icon()
+        else:
+            icon = self.get_file_icon()
+        model.set_value(newiter, 0, icon)
+        model.set_value(newiter, 1, name)
+        model.set_value(newiter, 2, path)
+        if is_dir and self.has_children(path):
+            self.add_empty_child(model, newiter)
+
+    def file_deleted(self, path):
+        """Remove a deleted file from the tree"""
+
+        iter = self.find_iter(path)
+        if iter != None and path != self.root:
+            self.view.get_model().remove(iter)
+
+    def file_moved(self, path, newpath, is_dir):
+        """Move a file on the tree"""
+
+        self.file_deleted(path)
+        self.file_created(newpath, is_dir)
 
     def create_root(self):
 
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_batch.py - Tests of the batch mode of the pyRenamer mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import argparse
+import os
+
+import pytest
+
+# Local Imports
+from tools import batch
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    """Returns (files, config_dir): a directory with the files a1, a2, b1
+    and the subdirectory sub with c1, and the configuration directory"""
+    files = tmp_path / "files"
+    (files / "sub").mkdir(parents=True)
+    for name in ["a1", "a2", "b1", "sub/c1"]:
+        (files / name).write_text(name)
+    return str(files), str(tmp_path / "config")
+
+
+def run(dir, config_dir, *options):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-a", "--active_dir")
+    batch.add_arguments(parser)
+    args = parser.parse_args(["--batch", "-a", dir] + list(options))
+    return batch.run(args, config_dir)
+
+
+def read_tree(dir):
+    files = {}
+    for root, dirs, names in os.walk(dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path) as file:
+                files[os.path.relpath(path, dir)] = file.read()
+    return files
+
+
+def test_rename(dirs):
+    dir, config_dir = dirs
+    status = run(dir, config_dir, "--capitalization", "0", "--recursive")
+    assert status == 0
+    assert read_tree(dir) == {"A1": "a1", "A2": "a2", "B1": "b1", "sub/C1": "sub/c1"}
+
+    # The run leaves nothing to recover behind
+    assert os.listdir(config_dir) == []
+
+
+def test_dry_run(dirs, capsys):
+    dir, config_dir = dirs
+    before = read_tree(dir)
+    status = run(
+        dir,
+        config_dir,
+        "--original_pattern",
+        "{L}{#}",
+        "--renamed_pattern",
+        "{1}-{2}",
+        "--file_pattern",
+        "a*",
+        "--dry_run",
+    )
+    assert status == 0
+    assert read_tree(dir) == before
+    assert capsys.readouterr().out.splitlines() == [
+        "%s -> %s" % (os.path.join(dir, ori), os.path.join(dir, new))
+        for ori, new in [("a1", "a-1"), ("a2", "a-2")]
+    ]
+
+
+def test_conflicts(dirs, capsys):
+    dir, config_dir = dirs
+    before = read_tree(dir)
+
+    # a2 would take the new name of a1, so nothing is renamed
+    options = ["--original_pattern", "{L}{#}", "--renamed_pattern", "{1}"]
+    assert run(dir, config_dir, *options) == 1
+    assert read_tree(dir) == before
+    assert "Same new name as another file: 1" in capsys.readouterr().err
+
+    # A dry run prints the renames that can be done, and still fails
+    assert run(dir, config_dir, *(options + ["--dry_run"])) == 1
+    assert capsys.readouterr().out.splitlines() == [
+        "%s -> %s" % (os.path.join(dir, ori), os.path.join(dir, new))
+        for ori, new in [("a1", "a"), ("b1", "b")]
+    ]
+    assert read_tree(dir) == before
+
+    # Or the files that can be renamed are, and the rest are left alone
+    assert run(dir, config_dir, *(options + ["--ignore_errors"])) == 1
+    assert read_tree(dir) == {"a": "a1", "a2": "a2", "b": "b1", "sub/c1": "sub/c1"}
+
+
+def test_nothing_to_rename(dirs, capsys):
+    dir, config_dir = dirs
+    assert run(dir, config_dir, "--file_pattern", "*.mp3", "--accents") == 0
+    assert capsys.readouterr() == ("", "")
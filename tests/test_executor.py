@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_executor.py - Tests of the rename executor of the pyRenamer mass file
+renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+
+# Local Imports
+from tools import executor
+from tools import planner
+
+
+def plan(dir, names):
+    renames = [(os.path.join(dir, ori), os.path.join(dir, new)) for ori, new in names]
+    for ori, new in renames:
+        if not os.path.exists(ori):
+            open(ori, "w").close()
+    steps, conflicts = planner.plan_renames(renames)
+    assert conflicts == []
+    return steps
+
+
+def test_rename(tmp_path):
+    dir = str(tmp_path)
+    steps = plan(dir, [("a", "b"), ("b", "a"), ("c", "d")])
+    renamed, failures = executor.RenameExecutor(steps).run()
+
+    assert failures == []
+    assert sorted(renamed) == sorted(steps)
+    assert sorted(os.listdir(dir)) == ["a", "b", "d"]
+
+
+def test_failed_chain_is_put_back(tmp_path):
+    dir = str(tmp_path)
+    steps = plan(dir, [("a", "b"), ("b", "c")])
+
+    def rename(ori, new):
+        if os.path.basename(ori) == "a":
+            return False, "denied"
+        os.rename(ori, new)
+        return True, None
+
+    renamed, failures = executor.RenameExecutor(steps, rename=rename).run()
+    assert renamed == []
+    assert sorted([failure.step.index for failure in failures]) == [0, 1]
+    assert sorted(os.listdir(dir)) == ["a", "b"]
+
+
+def test_failed_put_back_stays_renamed(tmp_path):
+    dir = str(tmp_path)
+    steps = plan(dir, [("a", "b"), ("b", "c"), ("d", "e")])
+
+    def rename(ori, new):
+        # c can't be renamed, and b can't be put back once it's renamed
+        if os.path.basename(ori) in ["a", "c"]:
+            return False, "denied"
+        os.rename(ori, new)
+        return True, None
+
+    runner = executor.RenameExecutor(steps, rename=rename)
+    renamed, failures = runner.run()
+
+    # b is renamed once, and only a fails
+    (kept,) = [step for step in steps if step.ori.endswith("b")]
+    assert sorted(renamed) == sorted([kept, steps[-1]])
+    assert [failure.step.ori for failure in failures] == [os.path.join(dir, "a")]
+    assert runner.kept == [executor.RenameFailure(kept, "denied")]
+    assert sorted(os.listdir(dir)) == ["a", "c", "e"]
+    assert "1 renames could not be put back" in executor.get_summary(
+        failures, kept=runner.kept
+    )
+
+
+class BrokenJournal:
+    """A journal whose disk fails once the renames start"""
+
+    def begin(self, levels):
+        pass
+
+    def chains_done(self, chains):
+        raise OSError("disk full")
+
+    def level_done(self, level):
+        pass
+
+    def close(self):
+        raise AssertionError("a broken run closed its journal")
+
+
+def test_task_error_keeps_results(tmp_path):
+    dir = str(tmp_path)
+    os.mkdir(os.path.join(dir, "dir"))
+    steps = plan(dir, [("dir/a", "dir/b"), ("dir", "other")])
+    runner = executor.RenameExecutor(steps, journal=BrokenJournal())
+    renamed, failures = runner.run()
+
+    # The file was renamed before the journal failed, and the directory on
+    # the next level is not renamed
+    assert [step.index for step in renamed] == [0]
+    assert [failure.step.index for failure in failures] == [1]
+    assert isinstance(failures[0].error, OSError)
+    assert os.listdir(os.path.join(dir, "dir")) == ["b"]
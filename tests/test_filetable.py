@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_filetable.py - Tests of the table of selected files of the pyRenamer mass
+file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Local Imports
+from tools.filetable import FileTable
+
+
+PATHS = [
+    "/home/user/a.txt",
+    "/home/user/photos/b.jpg",
+    "/home/user/photos/canción.jpg",
+    "/home/user/photos/2016/d.jpg",
+    "/e-\udcff",
+]
+
+
+def make_table(paths=PATHS):
+    table = FileTable()
+    table.extend([[path.rsplit("/", 1)[1], path] for path in paths])
+    return table
+
+
+def get_paths(table):
+    return [table.get_path(row) for row in range(len(table))]
+
+
+def test_rows():
+    table = make_table()
+    assert len(table) == len(PATHS)
+    assert get_paths(table) == PATHS
+    assert table.get_name(2) == "canción.jpg"
+    assert table.get_dir(2) == "/home/user/photos"
+    assert table.get_dir(4) == "/"
+
+    # Every directory is kept once
+    assert table.dirs == [
+        "/home/user",
+        "/home/user/photos",
+        "/home/user/photos/2016",
+        "/",
+    ]
+
+
+def test_copy():
+    table = make_table()
+    copy = table.copy()
+    table.rename_row(0, "/home/user/z.txt")
+    table.remove_rows([1])
+    assert get_paths(copy) == PATHS
+
+
+def test_find_rows():
+    table = make_table()
+    found = table.find_rows(
+        ["/home/user/photos/b.jpg", "/e-\udcff", "/home/user/b.jpg", "/x/a.txt"]
+    )
+    assert found == {"/home/user/photos/b.jpg": 1, "/e-\udcff": 4}
+    assert table.find_rows_under("/home/user/photos") == [1, 2, 3]
+    assert table.find_rows_under("/home/user/photo") == []
+
+
+def test_rename_row_and_dir():
+    table = make_table()
+    table.rename_row(1, "/home/user/photos/f.jpg")
+    table.rename_dir("/home/user/photos", "/home/user/pictures")
+    assert get_paths(table) == [
+        "/home/user/a.txt",
+        "/home/user/pictures/f.jpg",
+        "/home/user/pictures/canción.jpg",
+        "/home/user/pictures/2016/d.jpg",
+        "/e-\udcff",
+    ]
+    assert table.find_rows(["/home/user/pictures/f.jpg"]) == {
+        "/home/user/pictures/f.jpg": 1
+    }
+
+
+def test_remove_rows():
+    table = make_table()
+    table.rename_row(3, "/home/user/photos/2016/g.jpg")
+    table.remove_rows([4, 0, 2])
+    assert get_paths(table) == [
+        "/home/user/photos/b.jpg",
+        "/home/user/photos/2016/g.jpg",
+    ]
+
+    # Renamed names are packed with the rest, even if no row is removed
+    table.rename_row(0, "/home/user/photos/h.jpg")
+    table.remove_rows([])
+    assert table.renamed == {}
+    assert get_paths(table) == [
+        "/home/user/photos/h.jpg",
+        "/home/user/photos/2016/g.jpg",
+    ]
+
+
+class Preview:
+    """Preview function that names rows after their count, and keeps the
+    rows it was called for"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.called = []
+
+    def __call__(self, row, count):
+        self.called.append(row)
+        return "%s%d" % (self.prefix, count)
+
+
+def get_newnames(table):
+    return [table.get_newname(row) for row in range(len(table))]
+
+
+def test_lazy_preview():
+    table = make_table()
+    preview = Preview("x")
+    table.set_preview(preview)
+    assert preview.called == []
+
+    # Rows are previewed once, when their new name is needed
+    assert table.get_newname(3) == "x3"
+    assert table.get_newname(3) == "x3"
+    assert preview.called == [3]
+
+    # Newer previews and names set by hand come first
+    other = Preview("y")
+    table.set_preview(other, [4, 1])
+    table.set_newname(0, "hand")
+    table.set_newname(2, "")
+    assert get_newnames(table) == ["hand", "y1", None, "x3", "y0"]
+    assert table.get_newpath(1) == "/home/user/photos/y1"
+
+
+def test_get_pending():
+    table = make_table()
+    preview = Preview("x")
+    table.set_preview(preview)
+
+    # Nothing previewed yet, so the whole preview is pending at once
+    assert table.get_pending() == [(preview, range(5), range(5))]
+
+    other = Preview("y")
+    table.set_preview(other, [4, 1])
+    table.set_newname(0, "hand")
+    table.get_newname(3)
+    assert table.get_pending() == [(preview, [2], [2]), (other, [4, 1], [0, 1])]
+    assert table.get_pending([1, 2]) == [(preview, [2], [2]), (other, [1], [1])]
+    assert table.get_pending([0, 3]) == []
+
+
+def test_set_previewed():
+    table = make_table()
+    preview = Preview("x")
+    table.set_preview(preview)
+    other = Preview("y")
+    table.set_preview(other, [1])
+
+    # Names previewed ahead of time are kept, unless a newer preview has them
+    table.set_previewed(preview, [0, 1, 2], ["p0", "p1", ""])
+    assert get_newnames(table)[:3] == ["p0", "y0", None]
+
+    # Names previewed for a preview that's gone are dropped
+    table.set_preview(Preview("z"))
+    table.set_previewed(preview, [3], ["p3"])
+    assert table.get_newname(3) == "z3"
+
+
+def test_has_newnames():
+    table = make_table()
+    assert not table.has_newnames()
+    table.set_newname(0, "a.txt")
+    assert not table.has_newnames()
+    table.set_newname(1, "f.jpg")
+    assert table.has_newnames()
+
+    # Rows waiting to be previewed may get a new name
+    table.clear_newnames()
+    table.set_preview(lambda row, count: table.get_name(row), [2])
+    assert table.has_newnames()
+    table.get_newname(2)
+    assert not table.has_newnames()
+
+
+def test_remove_previewed_rows():
+    table = make_table()
+    preview = Preview("x")
+    table.set_preview(preview)
+    other = Preview("y")
+    table.set_preview(other, [4, 1, 3])
+    table.set_newname(2, "hand")
+    assert get_newnames(table) == ["x0", "y1", "hand", "y2", "y0"]
+
+    # Rows that move keep the names set by hand, and are previewed again
+    # with the counts of the rows left
+    table.remove_rows([1])
+    assert get_newnames(table) == ["x0", "hand", "y1", "y0"]
+    assert table.get_pending() == []
+    table.remove_rows([0])
+    assert get_newnames(table) == ["hand", "y1", "y0"]
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_filetools.py - Tests of the file listing and renaming of the pyRenamer
+mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import ctypes
+import errno
+import os
+
+import pytest
+
+# Local Imports
+from tools import filetools
+
+
+@pytest.fixture
+def listing_dir(tmp_path):
+    """Returns a directory with the files B.txt, a.txt, c.png, .hidden.txt,
+    x[1].txt and the directory sub"""
+    for name in ["B.txt", "a.txt", "c.png", ".hidden.txt", "x[1].txt"]:
+        (tmp_path / name).write_text(name)
+    (tmp_path / "sub").mkdir()
+    return str(tmp_path)
+
+
+def names(entries):
+    return [entry.name for entry in entries]
+
+
+def test_scan_dir_modes(listing_dir):
+    files = ["a.txt", "B.txt", "c.png", "x[1].txt"]
+    assert names(filetools.scan_dir(listing_dir, 0)) == [".hidden.txt"] + files
+    assert names(filetools.scan_dir(listing_dir, 1)) == ["sub"]
+    assert names(filetools.scan_dir(listing_dir, 2)) == (
+        [".hidden.txt"] + files[:3] + ["sub"] + files[3:]
+    )
+
+
+@pytest.mark.parametrize(
+    "pattern, listed",
+    [
+        ("*.txt", ["a.txt", "B.txt", "x[1].txt"]),
+        ("*", ["a.txt", "B.txt", "c.png", "x[1].txt"]),
+        (".*", [".hidden.txt"]),
+        ("x[1].txt", ["x[1].txt"]),
+        ("?.png", ["c.png"]),
+        ("", [".hidden.txt", "a.txt", "B.txt", "c.png", "x[1].txt"]),
+    ],
+)
+def test_scan_dir_pattern(listing_dir, pattern, listed):
+    assert names(filetools.scan_dir(listing_dir, 0, pattern)) == listed
+
+
+def test_listing_paths(listing_dir):
+    assert filetools.get_file_listing(listing_dir, 0, "a*") == [
+        ["a.txt", os.path.join(listing_dir, "a.txt")]
+    ]
+    assert filetools.get_dir_listing(listing_dir) == [
+        ["sub", os.path.join(listing_dir, "sub")]
+    ]
+
+
+def test_scan_missing_dir(tmp_path):
+    with pytest.raises(OSError):
+        filetools.scan_dir(str(tmp_path / "missing"), 0)
+
+
+@pytest.fixture
+def tree_dir(tmp_path):
+    """Returns a directory with the tree a/b/c/f, a/e and g, where a/b/c/loop
+    links back to a, and link links to a"""
+    (tmp_path / "a" / "b" / "c").mkdir(parents=True)
+    (tmp_path / "a" / "b" / "c" / "f").write_text("f")
+    (tmp_path / "a" / "e").write_text("e")
+    (tmp_path / "g").write_text("g")
+    os.symlink(str(tmp_path / "a"), str(tmp_path / "a" / "b" / "c" / "loop"))
+    os.symlink(str(tmp_path / "a"), str(tmp_path / "link"))
+    return str(tmp_path)
+
+
+def paths(dir, entries):
+    return [os.path.relpath(entry.path, dir) for entry in entries]
+
+
+def test_walk_dir(tree_dir):
+    # Directories are listed before their subdirectories, which aren't
+    # walked through links
+    assert paths(tree_dir, filetools.walk_dir(tree_dir, 2)) == [
+        "a",
+        "g",
+        "link",
+        "a/b",
+        "a/e",
+        "a/b/c",
+        "a/b/c/f",
+        "a/b/c/loop",
+    ]
+
+    # Links to directories are listed as directories
+    assert paths(tree_dir, filetools.walk_dir(tree_dir, 0)) == ["g", "a/e", "a/b/c/f"]
+
+
+@pytest.mark.parametrize(
+    "max_depth, listed",
+    [
+        (0, ["a", "g", "link"]),
+        (1, ["a", "g", "link", "a/b", "a/e"]),
+        (2, ["a", "g", "link", "a/b", "a/e", "a/b/c"]),
+    ],
+)
+def test_walk_dir_depth(tree_dir, max_depth, listed):
+    assert paths(tree_dir, filetools.walk_dir(tree_dir, 2, max_depth=max_depth)) == (
+        listed
+    )
+
+
+def test_walk_dir_link_loop(tree_dir):
+    # Every directory is walked once, through the first path found to it
+    assert paths(tree_dir, filetools.walk_dir(tree_dir, 0, follow_symlinks=True)) == [
+        "g",
+        "a/e",
+        "a/b/c/f",
+    ]
+
+
+def test_walk_dir_pattern(tree_dir):
+    # Patterns filter what's listed, but every subdirectory is walked
+    assert paths(tree_dir, filetools.walk_dir(tree_dir, 0, "f")) == ["a/b/c/f"]
+    assert filetools.get_file_listing_recursive(tree_dir, 0, "f", max_depth=2) == []
+
+
+def unsupported_renameat2(*args):
+    """renameat2 of a file system without RENAME_NOREPLACE"""
+    ctypes.set_errno(errno.EINVAL)
+    return -1
+
+
+@pytest.fixture(params=["renameat2", "unsupported", "missing"])
+def noreplace(request, monkeypatch):
+    """Run with renameat2, with a renameat2 that doesn't support
+    RENAME_NOREPLACE, or without renameat2"""
+    if request.param == "renameat2":
+        if not filetools.get_renameat2():
+            pytest.skip("renameat2 is not available")
+    elif request.param == "unsupported":
+        monkeypatch.setattr(filetools, "renameat2", unsupported_renameat2)
+    else:
+        monkeypatch.setattr(filetools, "renameat2", False)
+
+
+def test_rename_noreplace(tmp_path, noreplace):
+    (tmp_path / "a").write_text("a")
+    (tmp_path / "b").write_text("b")
+    os.symlink(str(tmp_path / "missing"), str(tmp_path / "link"))
+
+    filetools.rename_noreplace(str(tmp_path / "a"), str(tmp_path / "c"))
+    assert (tmp_path / "c").read_text() == "a"
+
+    # Existing files are never replaced, even links to nowhere
+    for name in ["b", "link"]:
+        with pytest.raises(FileExistsError):
+            filetools.rename_noreplace(str(tmp_path / "c"), str(tmp_path / name))
+    assert (tmp_path / "b").read_text() == "b"
+    assert (tmp_path / "c").read_text() == "a"
+    assert os.path.islink(str(tmp_path / "link"))
+
+    with pytest.raises(FileNotFoundError):
+        filetools.rename_noreplace(str(tmp_path / "a"), str(tmp_path / "d"))
+
+
+def test_rename_file(tmp_path, noreplace):
+    (tmp_path / "a").write_text("a")
+    (tmp_path / "b").write_text("b")
+
+    # Missing directories of the new name are created
+    new = str(tmp_path / "x" / "y" / "a")
+    assert filetools.rename_file(str(tmp_path / "a"), new) == (True, None)
+    assert (tmp_path / "x" / "y" / "a").read_text() == "a"
+
+    result, error = filetools.rename_file(new, str(tmp_path / "b"))
+    assert not result
+    assert isinstance(error, FileExistsError)
+
+    # Nor are they created when the file to rename is missing
+    result, error = filetools.rename_file(
+        str(tmp_path / "a"), str(tmp_path / "z" / "a")
+    )
+    assert not result
+    assert isinstance(error, FileNotFoundError)
+    assert not os.path.exists(str(tmp_path / "z"))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_journal.py - Tests of the rename journal of the pyRenamer mass file
+renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+
+import pytest
+
+# Local Imports
+from tools import executor
+from tools import journal
+from tools import planner
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    """Returns (files, config_dir): a directory with the files a, b, c and
+    the configuration directory the journals go to"""
+    files = tmp_path / "files"
+    files.mkdir()
+    for name in ["a", "b", "c"]:
+        (files / name).write_text(name)
+    return str(files), str(tmp_path / "config")
+
+
+def read_files(dir):
+    files = {}
+    for name in os.listdir(dir):
+        with open(os.path.join(dir, name)) as file:
+            files[name] = file.read()
+    return files
+
+
+def crash(dir, config_dir, renames, count):
+    """Start a run of renames on the journal, rename its first count steps
+    and stop as if the process was killed. Returns the planned steps"""
+    renames = [(os.path.join(dir, ori), os.path.join(dir, new)) for ori, new in renames]
+    steps, conflicts = planner.plan_renames(renames)
+    assert conflicts == []
+
+    run_journal = journal.open_journal(config_dir)
+    run_journal.begin(executor.get_levels(steps))
+    for step in steps[:count]:
+        os.rename(step.ori, step.new)
+
+    # The lock is gone with the process
+    run_journal.file.close()
+    return steps
+
+
+# A swap of a and b, and c renamed to d
+RENAMES = [("a", "b"), ("b", "a"), ("c", "d")]
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 4])
+def test_recover_forward(dirs, count):
+    dir, config_dir = dirs
+    steps = crash(dir, config_dir, RENAMES, count)
+
+    interrupted = journal.get_interrupted(config_dir)
+    assert interrupted is not None
+    done, left = interrupted.get_progress()
+    assert done + left == steps
+    assert len(done) == count
+
+    assert interrupted.recover(journal.FORWARD) == []
+    assert read_files(dir) == {"a": "b", "b": "a", "d": "c"}
+    assert journal.get_interrupted(config_dir) is None
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 4])
+def test_recover_back(dirs, count):
+    dir, config_dir = dirs
+    crash(dir, config_dir, RENAMES, count)
+
+    interrupted = journal.get_interrupted(config_dir)
+    assert interrupted.recover(journal.BACK) == []
+    assert read_files(dir) == {"a": "a", "b": "b", "c": "c"}
+    assert journal.get_interrupted(config_dir) is None
+
+
+def test_cut_journal(dirs):
+    dir, config_dir = dirs
+    crash(dir, config_dir, RENAMES, 0)
+
+    # A run killed while the plan was written has nothing to recover
+    (path,) = [
+        os.path.join(config_dir, name)
+        for name in os.listdir(config_dir)
+        if name.startswith(journal.JOURNAL_PREFIX)
+    ]
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 10)
+
+    interrupted = journal.get_interrupted(config_dir)
+    assert interrupted.get_progress() == ([], [])
+    interrupted.forget()
+    assert journal.get_interrupted(config_dir) is None
+
+
+def test_running_journal_is_skipped(dirs):
+    dir, config_dir = dirs
+    run_journal = journal.open_journal(config_dir)
+    run_journal.begin([])
+
+    # Another run is still going on, so its journal is not interrupted
+    other_journal = journal.open_journal(config_dir)
+    assert other_journal.path != run_journal.path
+    assert journal.get_interrupted(config_dir) is None
+
+    run_journal.close()
+    other_journal.close()
+    assert os.listdir(config_dir) == []
+
+
+def test_released_journal_is_found_again(dirs):
+    dir, config_dir = dirs
+    crash(dir, config_dir, RENAMES, 1)
+
+    interrupted = journal.get_interrupted(config_dir)
+    assert journal.get_interrupted(config_dir) is None
+    interrupted.release()
+    interrupted = journal.get_interrupted(config_dir)
+    assert interrupted is not None
+    interrupted.release()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_log.py - Tests of the rename log of the pyRenamer mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import json
+import logging
+import os
+import subprocess
+import sys
+
+# Local Imports
+from tools import filetools
+from tools import log
+
+
+def test_nothing_written_without_setup(tmp_path):
+    # On its own process, as pytest handles the records of every logger
+    code = "from tools import filetools; filetools.rename_file(%r, %r)" % (
+        str(tmp_path / "missing"),
+        str(tmp_path / "new"),
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(filetools.__file__))),
+        capture_output=True,
+        text=True,
+    )
+    assert output.returncode == 0
+    assert output.stderr == ""
+
+
+def test_errors_queued_as_strings(tmp_path):
+    handlers = list(log.logger.handlers)
+    log.setup(str(tmp_path))
+    try:
+        (queue_handler,) = [
+            handler for handler in log.logger.handlers if handler not in handlers
+        ]
+        error = FileNotFoundError(2, "No such file or directory")
+        record = log.logger.makeRecord(
+            log.logger.name,
+            logging.ERROR,
+            __file__,
+            0,
+            "rename failed",
+            (),
+            None,
+            extra={"ori": "a", "new": "b", "error": error},
+        )
+        assert queue_handler.prepare(record).error == str(error)
+        log.logger.handle(record)
+    finally:
+        log.shutdown()
+        for handler in log.logger.handlers[:]:
+            if handler not in handlers:
+                log.logger.removeHandler(handler)
+        log.logger.setLevel(logging.NOTSET)
+
+    with open(os.path.join(str(tmp_path), log.LOG_NAME)) as file:
+        (entry,) = [json.loads(line) for line in file]
+    assert entry["event"] == "rename failed"
+    assert entry["error"] == str(error)
+
+
+def test_rotation_counts_bytes(tmp_path):
+    path = str(tmp_path / log.LOG_NAME)
+    handler = log.get_file_handler(path, max_bytes=300, backup_count=5)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    try:
+        # 51 characters with the line end, but 101 bytes
+        for i in range(6):
+            handler.handle(logging.makeLogRecord({"msg": "ñ" * 50}))
+    finally:
+        handler.close()
+
+    # Two lines fit on every file, as a third one would be 303 bytes long
+    sizes = [os.path.getsize(str(file)) for file in tmp_path.iterdir()]
+    assert sizes == [202, 202, 202]
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_patterns.py - Tests of the rename patterns of the pyRenamer mass file
+renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+import random
+import time
+
+import pytest
+
+# Local Imports
+from tools import filetools
+
+
+def rename(pattern_end, count=7, pattern_ini="{L}{#}.txt"):
+    """Returns the new name of /d/x/a7.txt"""
+    pattern = filetools.compile_pattern(pattern_ini, pattern_end)
+    return pattern.rename("a7.txt", "/d/x/a7.txt", count)[0]
+
+
+# New names given by pyRenamer 0.6, before patterns were compiled
+@pytest.mark.parametrize(
+    "pattern_end, newname",
+    [
+        ("{1}{num}", "a7"),
+        ("{1}{num3}", "a007"),
+        ("{1}{num+10}", "a17"),
+        ("{1}{num3+10}", "a017"),
+        ("{1}-{num2}", "a-07"),
+        ("{1}{dir}", "ax"),
+        ("{2}{1}", "7a"),
+        ("{1}{5}", "a{5}"),
+        ("{1}{foo}", "a{foo}"),
+        ("{1}{rand10-5}", "a{rand10-5}"),
+        ("{1}{rand10-5,3}", "a{rand10-5,3}"),
+        ("{1}{rand-5}", "a"),
+        ("{1}{rand5,}", "a"),
+        ("{1}{rand3-3}", "a3"),
+        ("{1}{rand3-3,4}", "a0003"),
+        ("{1}{rand0}", "a0"),
+    ],
+)
+def test_same_as_before(pattern_end, newname):
+    assert rename(pattern_end) == newname
+
+
+def test_no_match():
+    assert rename("{1}", pattern_ini="{#}.png") is None
+
+
+def test_every_num_token_has_its_format():
+    # Every {num} token used to take the format of the first one: a0707
+    assert rename("{1}{num2}{num3}") == "a07007"
+
+
+def test_every_rand_token_is_drawn():
+    # Every {rand} token used to take the same number
+    random.seed(1)
+    first, second = rename("{rand1000000}-{rand1000000}").split("-")
+    assert first != second
+
+
+@pytest.mark.parametrize(
+    "pattern_end, low, high, width",
+    [
+        ("{rand}", 0, 100, 1),
+        ("{rand500}", 0, 500, 1),
+        ("{rand10-20}", 10, 20, 2),
+        ("{rand20,5}", 0, 20, 5),
+        ("{rand2-10,3}", 2, 10, 3),
+        ("{rand,4}", 0, 100, 4),
+    ],
+)
+def test_rand_ranges(pattern_end, low, high, width):
+    for i in range(50):
+        number = rename(pattern_end)
+        assert len(number) >= width
+        assert low <= int(number) <= high
+
+
+def test_date_once_per_run(monkeypatch):
+    days = iter(range(1, 32))
+
+    def localtime(seconds=None):
+        return time.struct_time((2024, 3, next(days), 12, 0, 0, 0, 1, -1))
+
+    monkeypatch.setattr(time, "localtime", localtime)
+    pattern = filetools.compile_pattern("{@}", "{date}-{datedelim}-{year}{month}{day}")
+
+    # Every file of the run gets the date the pattern was compiled on
+    for name in ["a", "b", "c"]:
+        newname = pattern.rename(name, "/d/" + name, 0)[0]
+        assert newname == "20240301-2024-03-01-20240301"
+
+
+def test_file_dates(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("a")
+    modified = time.mktime((2020, 5, 17, 12, 0, 0, 0, 0, -1))
+    os.utime(str(path), (modified, modified))
+
+    pattern = filetools.compile_pattern("{X}", "{1}-{modifydatedelim}")
+    assert pattern.rename("a", str(tmp_path / "a"), 0, ext="txt")[0] == "a-2020-05-17"
+
+    # Dates of files that can't be read are empty
+    assert pattern.rename("b", str(tmp_path / "b"), 0)[0] == "b-"
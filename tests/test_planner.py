@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_planner.py - Tests of the rename planner of the pyRenamer mass file
+renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+
+# Local Imports
+from tools import planner
+
+
+def make_files(dir, names):
+    """Create files named after themselves, so their contents tell where
+    they came from"""
+    for name in names:
+        with open(os.path.join(dir, name), "w") as file:
+            file.write(name)
+
+
+def read_files(dir):
+    """Returns {name: contents} of the files of dir"""
+    files = {}
+    for name in os.listdir(dir):
+        with open(os.path.join(dir, name)) as file:
+            files[name] = file.read()
+    return files
+
+
+def get_renames(dir, names):
+    return [(os.path.join(dir, ori), os.path.join(dir, new)) for ori, new in names]
+
+
+def rename_all(steps):
+    for step in steps:
+        assert not os.path.lexists(step.new)
+        os.rename(step.ori, step.new)
+
+
+def test_swap(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a", "b"])
+    steps, conflicts = planner.plan_renames(get_renames(dir, [("a", "b"), ("b", "a")]))
+
+    assert conflicts == []
+    assert len(steps) == 3
+    assert len(set([step.chain for step in steps])) == 1
+    assert [step.index for step in steps].count(None) == 1
+    rename_all(steps)
+    assert read_files(dir) == {"a": "b", "b": "a"}
+
+
+def test_chain(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["file1", "file2", "file3"])
+    renames = get_renames(
+        dir, [("file1", "file2"), ("file2", "file3"), ("file3", "file4")]
+    )
+    steps, conflicts = planner.plan_renames(renames)
+
+    assert conflicts == []
+    assert [step.index for step in steps] == [2, 1, 0]
+    rename_all(steps)
+    assert read_files(dir) == {"file2": "file1", "file3": "file2", "file4": "file3"}
+
+
+def test_cycle(tmp_path):
+    dir = str(tmp_path)
+    names = ["a", "b", "c", "d"]
+    make_files(dir, names)
+    renames = get_renames(dir, zip(names, names[1:] + names[:1]))
+    steps, conflicts = planner.plan_renames(renames)
+
+    assert conflicts == []
+    assert len(steps) == len(names) + 1
+    assert os.path.basename(steps[0].new).startswith(planner.TEMP_PREFIX)
+    rename_all(steps)
+    assert read_files(dir) == {"b": "a", "c": "b", "d": "c", "a": "d"}
+
+
+def test_duplicated(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a", "b"])
+    steps, conflicts = planner.plan_renames(get_renames(dir, [("a", "c"), ("b", "c")]))
+
+    assert [step.index for step in steps] == [0]
+    assert [(conflict.index, conflict.kind) for conflict in conflicts] == [
+        (1, planner.DUPLICATED)
+    ]
+
+
+def test_repeated(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a"])
+    steps, conflicts = planner.plan_renames(get_renames(dir, [("a", "b"), ("a", "c")]))
+
+    assert [step.index for step in steps] == [0]
+    assert [(conflict.index, conflict.kind) for conflict in conflicts] == [
+        (1, planner.REPEATED)
+    ]
+
+
+def test_exists_blocks_chain(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a", "b", "taken"])
+    renames = get_renames(dir, [("a", "b"), ("b", "taken")])
+    steps, conflicts = planner.plan_renames(renames)
+
+    assert steps == []
+    assert [(conflict.index, conflict.kind) for conflict in conflicts] == [
+        (0, planner.BLOCKED),
+        (1, planner.EXISTS),
+    ]
+
+
+def test_contents_before_directory(tmp_path):
+    dir = str(tmp_path)
+    os.mkdir(os.path.join(dir, "a"))
+    make_files(os.path.join(dir, "a"), ["f"])
+    renames = get_renames(dir, [("a", "b"), ("a/f", "a/g")])
+    steps, conflicts = planner.plan_renames(renames)
+
+    assert conflicts == []
+    assert [step.index for step in steps] == [1, 0]
+    rename_all(steps)
+    assert read_files(os.path.join(dir, "b")) == {"g": "f"}
+
+
+def test_temp_name_fits(tmp_path):
+    dir = str(tmp_path)
+    names = ["a" * 250, "b" * 250]
+    make_files(dir, names)
+    renames = get_renames(dir, [(names[0], names[1]), (names[1], names[0])])
+    steps, conflicts = planner.plan_renames(renames)
+
+    assert conflicts == []
+    for step in steps:
+        assert len(os.fsencode(os.path.basename(step.new))) <= planner.NAME_MAX
+    rename_all(steps)
+    assert read_files(dir) == {names[0]: names[1], names[1]: names[0]}
+
+
+def test_temp_name_cuts_whole_characters():
+    name = planner.get_temp_name("ñ" * 200, 7, 20)
+    assert name.startswith(planner.TEMP_PREFIX + "7-")
+    assert len(os.fsencode(name)) <= 20
+    assert name.encode("utf-8").decode("utf-8") == name
+
+
+def test_too_long(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a"])
+    renames = get_renames(dir, [("a", "x" * (planner.NAME_MAX + 1))])
+    steps, conflicts = planner.plan_renames(renames)
+
+    assert steps == []
+    assert [conflict.kind for conflict in conflicts] == [planner.TOO_LONG]
+
+
+def test_invalid(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a", "b"])
+    renames = [
+        (os.path.join(dir, "a"), os.path.join(dir, "x/y")),
+        (os.path.join(dir, "b"), os.path.join(dir, "x\0")),
+    ]
+    steps, conflicts = planner.plan_renames(renames)
+
+    assert steps == []
+    assert [conflict.kind for conflict in conflicts] == [planner.INVALID] * 2
+
+
+class CaseInsensitiveDirs(planner.TargetDirs):
+    """Directories read as if they ignored case, like on FAT or NTFS"""
+
+    def read_dir(self, dir):
+        names = set([name.casefold() for name in os.listdir(dir)])
+        return names, True, planner.NAME_MAX
+
+
+def test_case_insensitive_conflicts(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a", "b", "c", "taken"])
+    renames = get_renames(dir, [("a", "X"), ("b", "x"), ("c", "TAKEN")])
+    steps, conflicts = planner.plan_renames(renames, CaseInsensitiveDirs())
+
+    assert [step.index for step in steps] == [0]
+    assert [(conflict.index, conflict.kind) for conflict in conflicts] == [
+        (1, planner.DUPLICATED),
+        (2, planner.EXISTS),
+    ]
+
+
+def test_case_insensitive_case_change(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["name"])
+    renames = get_renames(dir, [("name", "NAME")])
+    steps, conflicts = planner.plan_renames(renames, CaseInsensitiveDirs())
+
+    # Changing only the case goes through a temporary name
+    assert conflicts == []
+    assert [step.index for step in steps] == [None, 0]
+    rename_all(steps)
+    assert read_files(dir) == {"NAME": "name"}
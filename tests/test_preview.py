@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_preview.py - Tests of the preview of new names of the pyRenamer mass file
+renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Local Imports
+from tools import plan
+from tools import preview
+
+
+PLAN = plan.RenamePlan(capitalization=0)
+
+
+def key(name):
+    return PLAN.cache_key(name, "/d/" + name)
+
+
+def test_evict_by_entries():
+    cache = preview.PreviewCache(max_entries=2)
+    cache.put(key("a"), "A")
+    cache.put(key("b"), "B")
+
+    # Reading an entry makes it the most recently used one
+    assert cache.get(key("a")) == "A"
+    cache.put(key("c"), "C")
+    assert len(cache) == 2
+    assert cache.get(key("b")) is cache.missing
+    assert cache.get(key("a")) == "A"
+    assert cache.get(key("c")) == "C"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_evict_by_bytes():
+    size = preview.PreviewCache().get_size(key("a"), "A")
+    cache = preview.PreviewCache(max_bytes=2 * size)
+    for name in ["a", "b", "c"]:
+        cache.put(key(name), name.upper())
+    assert len(cache) == 2
+    assert cache.bytes == 2 * size
+    assert cache.get(key("a")) is cache.missing
+
+    # A name bigger than the cache pushes out every entry, and itself
+    cache.put(key("d"), "D" * 2 * size)
+    assert len(cache) == 0
+    assert cache.bytes == 0
+
+    # Storing a key again doesn't count it twice
+    cache.put(key("a"), "A")
+    cache.put(key("a"), "A")
+    assert cache.bytes == size
+    cache.clear()
+    assert (len(cache), cache.bytes, cache.hits, cache.misses) == (0, 0, 0, 0)
+
+
+def test_uncacheable_keys():
+    cache = preview.PreviewCache()
+    cache.put(None, "A")
+    assert len(cache) == 0
+    assert cache.get(None) is cache.missing
+
+
+def test_cache_key():
+    # Keys only have what the pattern uses
+    assert PLAN.cache_key("a", "/d/a", 1) == PLAN.cache_key("a", "/e/a", 2)
+    numbered = plan.RenamePlan("{X}", "{1}{num}")
+    assert numbered.cache_key("a", "/d/a", 1) != numbered.cache_key("a", "/d/a", 2)
+    in_dir = plan.RenamePlan("{X}", "{1}{dir}")
+    assert in_dir.cache_key("a", "/d/a") != in_dir.cache_key("a", "/e/a")
+    assert plan.RenamePlan("{X}", "{1}{rand}").cache_key("a", "/d/a") is None
+
+
+def test_iter_preview_cache():
+    cache = preview.PreviewCache()
+    names = ["a", "b", "a"]
+    paths = ["/d/a", "/d/b", "/e/a"]
+    chunks = preview.iter_preview(PLAN, names, paths, chunksize=2, cache=cache)
+    assert list(chunks) == [["A", "B"], ["A"]]
+    assert (len(cache), cache.hits, cache.misses) == (2, 1, 2)
+
+    # Names are read from the cache when they're previewed again
+    chunks = preview.iter_preview(PLAN, names, paths, cache=cache)
+    assert list(chunks) == [["A", "B", "A"]]
+    assert (cache.hits, cache.misses) == (4, 2)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_undo.py - Tests of the undo history of the pyRenamer mass file renamer
+
+Copyright © 2016 Thomas Freeman <tfree87@users.noreply.github.com>
+Copyright © 2006-2008 Adolfo González Blázquez <code@infinicode.org>
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 2 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Global Imports
+import os
+
+# Local Imports
+from tools import planner
+from tools import undo
+
+
+RENAMES = [
+    ("/home/user/photos/IMG_0001.jpg", "/home/user/photos/IMG_0001 - Beach.jpg"),
+    ("/home/user/photos/IMG_0002.jpg", "/home/user/photos/holidays.jpg"),
+    ("/home/user/música/canción.ogg", "/home/user/música/Canción.ogg"),
+    ("/home/user/old", "/home/user/new"),
+    ("/home/user/a", "/home/user/a"),
+    ("/home/user/undecodable-\udcff", "/home/user/decoded"),
+]
+
+
+def make_step(renames=RENAMES):
+    step = undo.UndoStep()
+    for original, renamed in renames:
+        step.add(original, renamed)
+    return step
+
+
+def test_step_keeps_renames():
+    step = make_step()
+    assert len(step) == len(RENAMES)
+    assert list(step) == RENAMES
+    assert len(step.dirs) == 3
+
+
+def test_step_spill():
+    step = make_step()
+    size = step.get_size()
+    assert size > 0
+
+    step.spill()
+    assert step.get_size() == 0
+    assert step.name_data == bytearray()
+
+    # Spilled steps are loaded back when they're read, or added to
+    assert list(step) == RENAMES
+    assert step.get_size() == size
+    step.spill()
+    step.add("/tmp/x", "/tmp/y")
+    assert list(step) == RENAMES + [("/tmp/x", "/tmp/y")]
+    step.close()
+
+
+def test_levels():
+    history = undo.Undo(levels=3)
+    assert not history.can_undo()
+    assert not history.can_redo()
+
+    for level in range(5):
+        history.begin()
+        history.add("/tmp/%d" % level, "/tmp/%d-renamed" % level)
+    assert len(history.history) == 3
+    assert [list(step)[0][0] for step in history.history] == [
+        "/tmp/2",
+        "/tmp/3",
+        "/tmp/4",
+    ]
+    assert history.can_undo()
+    assert not history.can_redo()
+
+
+def test_memory_budget():
+    history = undo.Undo(memory_budget=0)
+    for level in range(3):
+        history.begin()
+        history.add("/tmp/%d" % level, "/tmp/%d-renamed" % level)
+    history.check_memory()
+
+    # Every level but the last one is spilled
+    assert [step.spilled is not None for step in history.history] == [
+        True,
+        True,
+        False,
+    ]
+    history.clean()
+    assert history.history == []
+
+
+def make_files(dir, names):
+    for name in names:
+        with open(os.path.join(dir, name), "w") as file:
+            file.write(name)
+
+
+def read_files(dir):
+    files = {}
+    for name in os.listdir(dir):
+        with open(os.path.join(dir, name)) as file:
+            files[name] = file.read()
+    return files
+
+
+def rename(history, dir, renames):
+    """Rename files of dir on a new level of history"""
+    history.begin()
+    for ori, new in renames:
+        ori = os.path.join(dir, ori)
+        new = os.path.join(dir, new)
+        os.rename(ori, new)
+        history.add(ori, new)
+
+
+def test_undo_redo(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a", "b"])
+    history = undo.Undo()
+    rename(history, dir, [("a", "c")])
+    rename(history, dir, [("b", "d")])
+
+    result = history.undo()
+    assert result == undo.ReplayResult(1, [], [])
+    assert read_files(dir) == {"b": "b", "c": "a"}
+    history.undo()
+    assert read_files(dir) == {"a": "a", "b": "b"}
+    assert not history.can_undo()
+
+    history.redo()
+    assert read_files(dir) == {"b": "b", "c": "a"}
+    assert history.can_redo()
+
+    # A new rename can't be redone over
+    rename(history, dir, [("b", "e")])
+    assert not history.can_redo()
+    history.undo()
+    history.undo()
+    assert read_files(dir) == {"a": "a", "b": "b"}
+
+
+def test_undo_swap(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a", "b"])
+    history = undo.Undo()
+    history.begin()
+    for ori, new in [("a", "b"), ("b", "a")]:
+        history.add(os.path.join(dir, ori), os.path.join(dir, new))
+    os.rename(os.path.join(dir, "a"), os.path.join(dir, "tmp"))
+    os.rename(os.path.join(dir, "b"), os.path.join(dir, "a"))
+    os.rename(os.path.join(dir, "tmp"), os.path.join(dir, "b"))
+
+    assert history.undo() == undo.ReplayResult(2, [], [])
+    assert read_files(dir) == {"a": "a", "b": "b"}
+    assert history.redo() == undo.ReplayResult(2, [], [])
+    assert read_files(dir) == {"a": "b", "b": "a"}
+
+
+def test_invert():
+    renames = [
+        ("/x/a/s/f", "/x/a/s/g"),
+        ("/x/a/s", "/x/a/t"),
+        ("/x/a/h", "/x/a/i"),
+        ("/x/a", "/x/b"),
+    ]
+    assert undo.invert(renames) == [
+        ("/x/b/t/g", "/x/b/t/f"),
+        ("/x/b/t", "/x/b/s"),
+        ("/x/b/i", "/x/b/h"),
+        ("/x/b", "/x/a"),
+    ]
+
+
+def read_tree(dir):
+    """Returns {path: contents} of the files under dir, with paths relative
+    to dir"""
+    files = {}
+    for root, dirs, names in os.walk(dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path) as file:
+                files[os.path.relpath(path, dir)] = file.read()
+    return files
+
+
+def test_undo_directory_and_contents(tmp_path):
+    dir = str(tmp_path)
+    os.makedirs(os.path.join(dir, "a", "s"))
+    make_files(os.path.join(dir, "a"), ["f"])
+    make_files(os.path.join(dir, "a", "s"), ["h"])
+    before = read_tree(dir)
+
+    # Contents are renamed before their directories, and every rename is
+    # kept with the paths files had before the level
+    history = undo.Undo()
+    renames = [("a/s/h", "a/s/i"), ("a/f", "a/g"), ("a/s", "a/t"), ("a", "b")]
+    rename(history, dir, renames)
+    after = read_tree(dir)
+    assert after == {"b/g": "f", "b/t/i": "h"}
+
+    assert history.undo() == undo.ReplayResult(4, [], [])
+    assert read_tree(dir) == before
+    assert history.redo() == undo.ReplayResult(4, [], [])
+    assert read_tree(dir) == after
+
+
+def test_partial_undo(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a", "b"])
+    history = undo.Undo()
+    rename(history, dir, [("a", "c"), ("b", "d")])
+
+    # c can't go back to a while another file has that name, so only d is
+    # undone, and it's recorded as a new level
+    make_files(dir, ["a"])
+    result = history.undo()
+    assert result.renamed == 1
+    assert [conflict.kind for conflict in result.conflicts] == [planner.EXISTS]
+    assert read_files(dir) == {"a": "a", "b": "b", "c": "a"}
+    assert len(history.history) == 2
+    assert history.can_undo()
+    assert not history.can_redo()
+
+    # Undoing the new level, and then the first one, undoes the whole rename
+    os.remove(os.path.join(dir, "a"))
+    assert history.undo() == undo.ReplayResult(1, [], [])
+    assert read_files(dir) == {"c": "a", "d": "b"}
+    assert history.undo() == undo.ReplayResult(2, [], [])
+    assert read_files(dir) == {"a": "a", "b": "b"}
+    assert not history.can_undo()
+
+
+def test_failed_redo_keeps_position(tmp_path):
+    dir = str(tmp_path)
+    make_files(dir, ["a"])
+    history = undo.Undo()
+    rename(history, dir, [("a", "b")])
+    history.undo()
+
+    # Nothing was redone, so the level can still be redone
+    make_files(dir, ["b"])
+    assert history.redo().renamed == 0
+    assert history.can_redo()
+    os.remove(os.path.join(dir, "b"))
+    assert history.redo() == undo.ReplayResult(1, [], [])
+    assert read_files(dir) == {"b": "a"}
+    assert not history.can_redo()